@@ -0,0 +1,166 @@
+import zipfile
+from collections import Counter, deque
+from itertools import islice
+
+from core.config import settings
+from ml.inference import predict_emotions_batch
+from ml.advisor import generate_advice
+from analysis.chat_ingest import text_members, iter_member_lines
+from analysis.chat_parser import parse_chat_lines
+from analysis.chat_timeline import ChatAggregator
+
+# Messages per inference call; also the unit between progress updates
+CHUNK_SIZE = 100
+
+
+class ChatAnalysisError(Exception):
+    """Raised when an uploaded chat export cannot produce a result."""
+
+
+def _noop_progress(progress: int, stage: str = None, partial: dict = None):
+    pass
+
+
+def _iter_archive_messages(zip_file, members, consumed):
+    """
+    Streams ChatMessage records from every text member, in archive order.
+    `consumed[i]` tracks uncompressed bytes read from member i (for progress).
+
+    Members are parsed one after another on the job's thread (see
+    benchmarks/bench_chat_members.py): inflating, the only part threads can
+    overlap, is ~1% of the work, and worker processes pay for pickling every
+    message back while holding whole members in memory.
+    """
+    for index, name in enumerate(members):
+        def on_read(n, index=index):
+            consumed[index] += n
+        # Structured (timestamp, sender, text) records; media and system lines dropped
+        yield from parse_chat_lines(iter_member_lines(zip_file, name, on_read=on_read))
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _partial(aggregator, processed):
+    total = aggregator.total
+    return {
+        "messages_analyzed": processed,
+        "distribution": {k: v / total for k, v in aggregator.totals.items()} if total else {}
+    }
+
+
+def iter_archive_messages(zip_source):
+    """Parsed ChatMessage records of an archive, without classifying them."""
+    zip_file = zipfile.ZipFile(zip_source)
+    members = text_members(zip_file)
+    yield from _iter_archive_messages(zip_file, members, [0] * len(members))
+
+
+def analyze_chat_archive(zip_source, on_progress=_noop_progress, aggregator=None,
+                         skip_messages: int = 0, on_results=None) -> dict:
+    """
+    Parses a zipped chat export and runs batch emotion inference over it.
+
+    Messages are streamed from the archive through the classifier in chunks
+    and folded into running counters plus a small ring buffer for
+    `recent_context`; raw text is discarded once classified, so job memory
+    does not depend on chat length. Setting CHAT_MAX_MESSAGES > 0 restores
+    the old behaviour of analyzing only the most recent messages.
+
+    Args:
+        zip_source: Path or seekable binary file object of the uploaded .zip archive.
+        on_progress: Callback receiving an integer percentage (0-100), plus the
+            current stage and a partial result (running distribution) as keywords.
+        aggregator: ChatAggregator to resume from (incremental re-analysis).
+        skip_messages: Leading messages already folded into `aggregator`; they
+            are parsed but not classified again.
+        on_results: Optional callback receiving (messages, results) per chunk.
+
+    Returns:
+        dict: The chat analysis result (distribution, dominant emotion, advice, ...).
+    """
+    on_progress(5, stage="parsing")
+
+    # 1. Open Zip (members are opened lazily and decoded incrementally)
+    zip_file = zipfile.ZipFile(zip_source)
+    members = text_members(zip_file)
+    total_bytes = sum(zip_file.getinfo(name).file_size for name in members) or 1
+    consumed = [0] * len(members)
+
+    messages = _iter_archive_messages(zip_file, members, consumed)
+    if skip_messages:
+        messages = islice(messages, skip_messages, None)
+    if settings.CHAT_MAX_MESSAGES > 0:
+        # Capped mode: only the tail is analyzed, so only the tail is kept
+        messages = deque(messages, maxlen=settings.CHAT_MAX_MESSAGES)
+        on_progress(20, stage="analyzing")
+
+    def progress_for(processed):
+        if isinstance(messages, deque):
+            return 20 + int((processed / max(len(messages), 1)) * 70)
+        # Streaming: parsing and inference interleave, track input consumed
+        return 5 + int(min(sum(consumed) / total_bytes, 1.0) * 85)
+
+    # 2. Batch Inference, folded into running counters as it goes
+    if aggregator is None:
+        aggregator = ChatAggregator(bucket=settings.CHAT_TIMELINE_BUCKET)
+    processed = 0
+
+    for chunk in _chunks(messages, CHUNK_SIZE):
+        batch_results = predict_emotions_batch([m.text for m in chunk]) # Synchronous batch call, but fast
+        for message, res in zip(chunk, batch_results):
+            aggregator.add(message, res)
+        if on_results is not None:
+            on_results(chunk, batch_results)
+
+        processed += len(chunk)
+        on_progress(progress_for(processed), stage="analyzing", partial=_partial(aggregator, processed))
+
+    if aggregator.messages == 0:
+        raise ChatAnalysisError("No valid messages parsed from text files")
+
+    on_progress(90, stage="aggregating")
+    return build_chat_result(aggregator)
+
+
+def build_chat_result(aggregator) -> dict:
+    """Final chat analysis result from a fully fed ChatAggregator."""
+    # 3. Aggregate Results
+    counts = aggregator.totals
+    total = aggregator.total
+    if not total:
+        raise ChatAnalysisError("No emotions detected in text")
+
+    distribution = {k: v/total for k, v in counts.items()}
+
+    dominant_emotion = counts.most_common(1)[0][0]
+
+    # Last meaningful message emotion
+    last_emotions = [item["emotion"] for item in aggregator.recent if item.get("emotion")]
+    if last_emotions:
+        last_message_emotion = Counter(last_emotions).most_common(1)[0][0]
+    else:
+        last_message_emotion = "neutral"
+
+    # Generate Advice
+    advice = generate_advice(dominant_emotion, last_message_emotion)
+
+    # Final Result Construction
+    return {
+        "total_lines_analyzed": aggregator.messages,
+        "dominant_emotion": dominant_emotion,
+        "last_message_emotion": last_message_emotion,
+        "distribution": distribution,
+        "advice": advice,
+        "recent_context": list(aggregator.recent),
+        "timeline_bucket": aggregator.bucket,
+        "participants": aggregator.participants(),
+        "timeline": aggregator.timeline(),
+        "window_drift": aggregator.window_drift()
+    }
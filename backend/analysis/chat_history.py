@@ -0,0 +1,137 @@
+import hashlib
+import time
+from itertools import islice
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from db.database import engine
+from db.models import EmotionLog
+from db.rollup import apply_events
+from db.drift_state import apply_drift_events
+from core.emotions import code_of
+
+
+def _insert_ignoring_duplicates(conn, rows) -> list:
+    """
+    Multi-row insert that skips rows whose (user_id, source_key) already
+    exists. Returns the rows actually inserted.
+    """
+    if engine.dialect.name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if engine.dialect.name == "sqlite" else postgresql.insert
+        # One multi-row VALUES statement; RETURNING reports only the rows that went in
+        stmt = (
+            dialect_insert(EmotionLog).values(rows)
+            .on_conflict_do_nothing(index_elements=["user_id", "source_key"])
+            .returning(EmotionLog.source_key)
+        )
+        inserted = set(conn.execute(stmt).scalars())
+        return [row for row in rows if row["source_key"] in inserted]
+
+    # Other backends: filter out existing keys first, then a plain executemany
+    keys = [row["source_key"] for row in rows]
+    existing = set(conn.execute(
+        select(EmotionLog.source_key)
+        .where(EmotionLog.user_id == rows[0]["user_id"], EmotionLog.source_key.in_(keys))
+    ).scalars())
+    fresh = [row for row in rows if row["source_key"] not in existing]
+    if fresh:
+        conn.execute(insert(EmotionLog), fresh)
+    return fresh
+
+
+# 8 bound parameters per row; stays under SQLite's legacy 999-variable limit
+MAX_ROWS_PER_INSERT = 100
+
+
+class ChatHistoryWriter:
+    """
+    Writes classified chat messages into `emotion_logs` so uploaded chats
+    feed the dashboard, drift detection and reports.
+
+    Each inference chunk becomes one multi-row INSERT in its own
+    transaction; no ORM objects are built. Rows carry the message's own
+    timestamp and an idempotency key, so re-running the same chat (or a
+    longer export of it) inserts nothing twice. Messages without a parsed
+    timestamp cannot be placed in the history and are skipped.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.written = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+        # Identical messages sent within the same minute are told apart by
+        # their occurrence number; only the current timestamp's counts are kept.
+        self._last_ts = None
+        self._occurrences = {}
+
+    def _source_key(self, message) -> str:
+        if message.timestamp != self._last_ts:
+            self._last_ts = message.timestamp
+            self._occurrences = {}
+        ident = (message.sender, message.text)
+        n = self._occurrences.get(ident, 0)
+        self._occurrences[ident] = n + 1
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{message.timestamp.isoformat()}\x1f{message.sender or ''}\x1f{message.text}\x1f{n}".encode("utf-8"))
+        return "chat:" + digest.hexdigest()
+
+    def write(self, messages, results):
+        rows = []
+        for message, res in zip(messages, results):
+            if message.timestamp is None:
+                continue
+            # Keyed before filtering so occurrence numbers never depend on results
+            source_key = self._source_key(message)
+            if not res:
+                continue
+            rows.append({
+                "user_id": self.user_id,
+                "text": message.text,
+                "emotion": res["emotion"],
+                "emotion_code": code_of(res["emotion"]),
+                "confidence": res.get("confidence"),
+                "created_at": message.timestamp,
+                "source": "chat",
+                "source_key": source_key
+            })
+        if not rows:
+            return
+
+        start = time.perf_counter()
+        inserted = 0
+        with engine.begin() as conn:
+            for i in range(0, len(rows), MAX_ROWS_PER_INSERT):
+                fresh = _insert_ignoring_duplicates(conn, rows[i:i + MAX_ROWS_PER_INSERT])
+                # Core inserts bypass the ORM flush hooks; fold them into the rollup and drift state here
+                events = [
+                    (row["user_id"], row["created_at"], "chat", row["emotion_code"], row["confidence"], 1)
+                    for row in fresh
+                ]
+                apply_events(conn, events)
+                apply_drift_events(conn, events)
+                inserted += len(fresh)
+        self.seconds += time.perf_counter() - start
+        self.written += inserted
+        self.skipped += len(rows) - inserted
+
+    def backfill(self, messages, results, chunk_size: int = MAX_ROWS_PER_INSERT):
+        """Writes messages whose results were stored earlier (no inference)."""
+        pairs = zip(messages, results)
+        while True:
+            chunk = list(islice(pairs, chunk_size))
+            if not chunk:
+                return
+            self.write([m for m, _ in chunk], [r for _, r in chunk])
+
+    def stats(self) -> dict:
+        total = self.written + self.skipped
+        return {
+            "rows_written": self.written,
+            "rows_already_present": self.skipped,
+            "seconds": round(self.seconds, 3),
+            "rows_per_sec": int(total / self.seconds) if self.seconds else None
+        }
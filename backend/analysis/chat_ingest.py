@@ -0,0 +1,82 @@
+import codecs
+import hashlib
+import tempfile
+
+# Read size for both the HTTP upload and zip members. Large enough to keep
+# syscall overhead low, small enough that memory does not track archive size.
+READ_BLOCK_SIZE = 64 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+async def spool_upload(upload, max_bytes: int, chunk_size: int = READ_BLOCK_SIZE):
+    """
+    Copies an UploadFile into an on-disk temp file chunk by chunk, hashing
+    it on the way so duplicate uploads can be recognised without a re-read.
+
+    Args:
+        upload: FastAPI UploadFile.
+        max_bytes: Size cap; exceeding it aborts the copy.
+        chunk_size: Bytes read per iteration.
+
+    Returns:
+        tuple: (temp file positioned at 0, total size in bytes, sha256 hex digest).
+            The caller closes the file.
+    """
+    spooled = tempfile.TemporaryFile(suffix=".zip")
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit")
+            hasher.update(chunk)
+            spooled.write(chunk)
+    except Exception:
+        spooled.close()
+        raise
+
+    spooled.seek(0)
+    return spooled, size, hasher.hexdigest()
+
+
+def text_members(zip_file) -> list:
+    """Names of chat text files in the archive (media and macOS metadata skipped)."""
+    return [
+        name for name in zip_file.namelist()
+        if name.endswith(".txt") and not name.startswith("__MACOSX")
+    ]
+
+
+def iter_member_lines(zip_file, name: str, block_size: int = READ_BLOCK_SIZE, on_read=None):
+    """
+    Yields decoded lines of one archive member without reading it whole.
+
+    Bytes are pulled in fixed blocks through an incremental UTF-8 decoder, so
+    multi-byte characters split across block boundaries decode correctly and
+    only one block plus the current partial line is held in memory.
+    `on_read(n)` is called with the size of every block read.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    pending = ""
+    with zip_file.open(name) as member:
+        while True:
+            block = member.read(block_size)
+            if on_read is not None and block:
+                on_read(len(block))
+            text = decoder.decode(block, final=not block)
+            if text:
+                lines = (pending + text).split("\n")
+                pending = lines.pop()
+                yield from lines
+            if not block:
+                break
+    if pending:
+        yield pending
+
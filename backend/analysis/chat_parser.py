@@ -0,0 +1,204 @@
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional, Iterable, Iterator
+
+
+class ChatMessage(NamedTuple):
+    timestamp: Optional[datetime]
+    sender: Optional[str]
+    text: str
+
+
+# -----------------------------
+# Precompiled export layouts
+# -----------------------------
+# Dates: 10/11/22, 10.11.2022, 2022-11-10 ... Times: 23:24, 23:24:05, 11:24 PM, 11.24 p.m.
+# Every layout captures the same positional groups:
+#   (date1, date2, date3, hour, minute, second, am/pm, rest)
+_DATE = r"(\d{1,4})[./-](\d{1,2})[./-](\d{1,4})"
+_TIME = r"(\d{1,2})[:.](\d{2})(?:[:.](\d{2}))?(?:[\s\u202f\u00a0]?([AaPp])\.?\s?[Mm]\.?)?"
+
+# Android: "10/11/22, 23:24 - Sender: message"
+ANDROID_HEADER = re.compile(r"^\u200e?" + _DATE + r",? " + _TIME + r" [-\u2013] (.*)$")
+# iOS: "[10/11/22, 23:24:05] Sender: message"
+IOS_HEADER = re.compile(r"^\u200e?\[" + _DATE + r",? " + _TIME + r"\] (.*)$")
+
+HEADER_PATTERNS = (ANDROID_HEADER, IOS_HEADER)
+
+MEDIA_PLACEHOLDER = re.compile(
+    r"^\u200e?(?:<Media omitted>|<attached: [^>]*>|(?:image|video|audio|sticker|GIF|document|Contact card) omitted)$"
+)
+
+# Messages buffered while the day/month order of an "auto" export is unknown
+DATE_ORDER_LOOKAHEAD = 500
+
+
+class ChatParser:
+    """
+    Streaming parser for WhatsApp-style chat exports.
+
+    Understands Android ("date, time - sender: text") and iOS
+    ("[date, time] sender: text") layouts, 12h and 24h clocks, and '/', '.'
+    or '-' date separators. Continuation lines are joined onto the message
+    they belong to. Lines that appear before any header (plain text files)
+    are yielded as standalone messages without timestamp or sender.
+
+    Args:
+        date_order: "dmy", "mdy", "ymd" or "auto". In auto mode the order is
+            inferred from the first dates that disambiguate it (a field > 12),
+            falling back to day-first.
+        include_system: Also yield sender-less system lines ("X added you").
+        skip_media: Drop media placeholders such as "<Media omitted>".
+    """
+
+    def __init__(self, date_order: str = "auto", include_system: bool = False, skip_media: bool = True):
+        self.date_order = None if date_order == "auto" else date_order
+        self.include_system = include_system
+        self.skip_media = skip_media
+
+        self._last_key = None
+        self._last_ts = None
+
+    def parse(self, lines: Iterable[str]) -> Iterator[ChatMessage]:
+        patterns = HEADER_PATTERNS
+        lookahead = []
+        seen_header = False
+
+        # Pending message: (header groups, continuation lines)
+        pending = None
+
+        for line in lines:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+
+            match = None
+            for pattern in patterns:
+                match = pattern.match(line)
+                if match:
+                    # Keep the matching layout first; exports do not mix layouts
+                    if pattern is not patterns[0]:
+                        patterns = (pattern,) + tuple(p for p in patterns if p is not pattern)
+                    break
+
+            if match is None:
+                if pending is not None:
+                    pending[1].append(line)
+                elif not seen_header:
+                    text = line.strip()
+                    if text and not self._is_media(text):
+                        yield ChatMessage(None, None, text)
+                continue
+
+            seen_header = True
+            if pending is not None:
+                if self.date_order is not None:
+                    # Fast path once the date layout is known
+                    msg = self._build(pending)
+                    if msg is not None:
+                        yield msg
+                else:
+                    yield from self._emit(pending, lookahead)
+            pending = (match.groups(), [])
+
+        if pending is not None:
+            yield from self._emit(pending, lookahead)
+
+        if lookahead:
+            self.date_order = self.date_order or "dmy"
+            for raw in lookahead:
+                msg = self._build(raw)
+                if msg is not None:
+                    yield msg
+
+    # -----------------------------
+    # Internals
+    # -----------------------------
+    def _emit(self, raw, lookahead):
+        if self.date_order is None:
+            lookahead.append(raw)
+            self.date_order = self._sniff_order(raw[0])
+            if self.date_order is None and len(lookahead) < DATE_ORDER_LOOKAHEAD:
+                return
+            self.date_order = self.date_order or "dmy"
+            for buffered in lookahead:
+                msg = self._build(buffered)
+                if msg is not None:
+                    yield msg
+            lookahead.clear()
+            return
+
+        msg = self._build(raw)
+        if msg is not None:
+            yield msg
+
+    @staticmethod
+    def _sniff_order(groups):
+        a, b = groups[0], groups[1]
+        if len(a) == 4:
+            return "ymd"
+        if int(a) > 12:
+            return "dmy"
+        if int(b) > 12:
+            return "mdy"
+        return None
+
+    def _is_media(self, text):
+        # Every placeholder ends in "omitted" or ">"; skip the regex for everything else
+        return (
+            self.skip_media
+            and (text[-1] == "d" or text[-1] == ">")
+            and MEDIA_PLACEHOLDER.match(text) is not None
+        )
+
+    def _build(self, raw):
+        groups, extra = raw
+        rest = groups[7]
+
+        sender, sep, text = rest.partition(": ")
+        if not sep:
+            if not self.include_system:
+                return None
+            sender, text = None, rest
+
+        if extra:
+            text = "\n".join([text] + extra)
+        text = text.strip()
+        if not text or self._is_media(text):
+            return None
+
+        return ChatMessage(self._timestamp(groups), sender, text)
+
+    def _timestamp(self, groups):
+        # Consecutive messages usually share the same minute; reuse the last parse
+        key = groups[:7]
+        if key == self._last_key:
+            return self._last_ts
+
+        d1, d2, d3, hour, minute, second, ampm = key
+        try:
+            if self.date_order == "ymd":
+                year, month, day = d1, d2, d3
+            elif self.date_order == "mdy":
+                month, day, year = d1, d2, d3
+            else:
+                day, month, year = d1, d2, d3
+            year = int(year)
+            if year < 100:
+                year += 2000
+
+            hour = int(hour)
+            if ampm:
+                hour = hour % 12 + (12 if ampm in "Pp" else 0)
+
+            ts = datetime(year, int(month), int(day), hour, int(minute), int(second or 0))
+        except ValueError:
+            ts = None
+
+        self._last_key, self._last_ts = key, ts
+        return ts
+
+
+def parse_chat_lines(lines: Iterable[str], date_order: str = "auto", **options) -> Iterator[ChatMessage]:
+    """Convenience wrapper: yields ChatMessage records for an iterable of raw lines."""
+    return ChatParser(date_order=date_order, **options).parse(lines)
@@ -0,0 +1,359 @@
+import hashlib
+from datetime import datetime, timedelta
+from itertools import islice
+
+from sqlalchemy import select, delete, insert, update, func, literal, or_, and_
+
+from db.database import SessionLocal
+from db.models import ChatAnalysis, ChatMessageResult
+from core.config import settings
+from core.emotions import EMOTIONS, code_of
+from analysis.chat_analysis import iter_archive_messages, analyze_chat_archive, _noop_progress
+from analysis.chat_timeline import ChatAggregator
+from analysis.chat_history import ChatHistoryWriter
+
+# One byte per message in chat_message_results.emotions (core.emotions
+# codes); 0 = no result
+
+# Previously analyzed chats checked for a shared prefix on every upload
+MAX_PREFIX_CANDIDATES = 20
+
+# Retired analyses (and rows of jobs that died mid-run) are kept this long,
+# so jobs still reading a superseded chat's results see them whole
+RETIRED_ANALYSIS_GRACE = timedelta(hours=24)
+
+
+def encode_results(results) -> tuple:
+    """(emotion codes, confidences quantized to 0-255) as two byte strings."""
+    emotions = bytearray(len(results))
+    confidences = bytearray(len(results))
+    for i, res in enumerate(results):
+        if not res:
+            continue
+        emotions[i] = code_of(res.get("emotion"))
+        confidences[i] = max(0, min(255, round(res.get("confidence", 0.0) * 255)))
+    return bytes(emotions), bytes(confidences)
+
+
+def decode_results(emotions: bytes, confidences: bytes) -> list:
+    return [
+        {"emotion": EMOTIONS[code], "confidence": conf / 255} if code else None
+        for code, conf in zip(emotions, confidences)
+    ]
+
+
+def _update_fingerprint(hasher, message):
+    ts = message.timestamp.isoformat() if message.timestamp else ""
+    hasher.update(f"{ts}\x1f{message.sender or ''}\x1f{message.text}\x1e".encode("utf-8"))
+
+
+# -----------------------------
+# Lookups
+# -----------------------------
+def find_identical_analysis(db, user_id: int, content_hash: str):
+    """A completed analysis of a byte-identical archive uploaded earlier by this user."""
+    return (
+        db.query(ChatAnalysis)
+        .filter(
+            ChatAnalysis.user_id == user_id,
+            ChatAnalysis.content_hash == content_hash,
+            ChatAnalysis.result.isnot(None),
+            ChatAnalysis.retired_at.is_(None)
+        )
+        .order_by(ChatAnalysis.updated_at.desc())
+        .first()
+    )
+
+
+class ReusePlan:
+    """
+    Outcome of fingerprinting an archive against the user's stored analyses.
+
+    analysis_id/state/skip describe the longest stored chat that is a prefix
+    of this archive (None/None/0 when there is none); message_count and
+    prefix_hash describe the archive itself.
+    """
+
+    def __init__(self, message_count, prefix_hash, analysis_id=None, state=None, skip=0, result=None):
+        self.message_count = message_count
+        self.prefix_hash = prefix_hash
+        self.analysis_id = analysis_id
+        self.state = state
+        self.skip = skip
+        self.result = result
+
+    @property
+    def unchanged(self) -> bool:
+        return self.analysis_id is not None and self.skip == self.message_count
+
+
+def plan_reuse(user_id: int, zip_source, bucket: str) -> ReusePlan:
+    """
+    Parses the archive once (no inference) while extending a rolling SHA-256
+    over its messages, and compares the digest at each stored analysis's
+    message_count with that analysis's prefix_hash.
+
+    Parsing is cheap next to classification, so one extra parse pass buys
+    skipping every message that was already classified.
+    """
+    db = SessionLocal()
+    try:
+        candidates = (
+            db.query(ChatAnalysis.id, ChatAnalysis.message_count, ChatAnalysis.prefix_hash)
+            .filter(ChatAnalysis.user_id == user_id, ChatAnalysis.prefix_hash.isnot(None))
+            .order_by(ChatAnalysis.updated_at.desc())
+            .limit(MAX_PREFIX_CANDIDATES)
+            .all()
+        )
+    finally:
+        db.close()
+
+    checkpoints = {}  # message_count -> [(analysis_id, prefix_hash)]
+    for analysis_id, count, prefix_hash in candidates:
+        if count:
+            checkpoints.setdefault(count, []).append((analysis_id, prefix_hash))
+
+    hasher = hashlib.sha256()
+    count = 0
+    best = None  # (analysis_id, message_count) of the longest matching prefix
+    for message in iter_archive_messages(zip_source):
+        _update_fingerprint(hasher, message)
+        count += 1
+        if count in checkpoints:
+            digest = hasher.hexdigest()
+            for analysis_id, prefix_hash in checkpoints[count]:
+                if prefix_hash == digest:
+                    best = (analysis_id, count)
+                    break
+
+    plan = ReusePlan(count, hasher.hexdigest())
+    if best is None:
+        return plan
+
+    db = SessionLocal()
+    try:
+        analysis = db.query(ChatAnalysis).filter(ChatAnalysis.id == best[0]).first()
+        # Windows of a different width cannot be merged; analyze from scratch
+        if analysis is None or not analysis.state or analysis.state.get("bucket") != bucket:
+            return plan
+        plan.analysis_id, plan.state, plan.skip = analysis.id, analysis.state, best[1]
+        plan.result = analysis.result
+        return plan
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Writers (job runners)
+# -----------------------------
+class AnalysisRecorder:
+    """
+    Persists one job's analysis into a ChatAnalysis row of its own.
+
+    An extension never writes to the stored chat it extends: the stored
+    prefix's per-message results are copied into the job's new row up front
+    (INSERT ... SELECT), new results are appended to it chunk by chunk, and
+    finish() publishes it and retires the extended row in one transaction.
+    Concurrent extensions of the same chat therefore each build a complete,
+    consistent row, and discard() only ever removes the job's own.
+    """
+
+    def __init__(self, user_id: int, plan: ReusePlan):
+        self.plan = plan
+        self.extends = plan.analysis_id
+
+        db = SessionLocal()
+        try:
+            # Not a lookup candidate until finish() sets prefix_hash
+            analysis = ChatAnalysis(user_id=user_id, message_count=0)
+            db.add(analysis)
+            db.flush()
+            self.analysis_id = analysis.id
+
+            if self.extends is not None:
+                db.execute(insert(ChatMessageResult).from_select(
+                    ["analysis_id", "seq_start", "emotions", "confidences"],
+                    select(
+                        literal(self.analysis_id), ChatMessageResult.seq_start,
+                        ChatMessageResult.emotions, ChatMessageResult.confidences
+                    ).where(ChatMessageResult.analysis_id == self.extends, ChatMessageResult.seq_start < plan.skip)
+                ))
+                copied = db.execute(
+                    select(func.coalesce(func.sum(func.length(ChatMessageResult.emotions)), 0))
+                    .where(ChatMessageResult.analysis_id == self.analysis_id)
+                ).scalar()
+                if copied != plan.skip:
+                    # The stored chat was purged since planning: analyze from scratch
+                    db.execute(delete(ChatMessageResult).where(ChatMessageResult.analysis_id == self.analysis_id))
+                    plan.analysis_id, plan.state, plan.skip, plan.result = None, None, 0, None
+                    self.extends = None
+            db.commit()
+        finally:
+            db.close()
+        self.seq = plan.skip
+
+    def aggregator(self, bucket: str):
+        if self.plan.state:
+            return ChatAggregator.from_state(self.plan.state)
+        return ChatAggregator(bucket=bucket)
+
+    def on_results(self, messages, results):
+        emotions, confidences = encode_results(results)
+        db = SessionLocal()
+        try:
+            db.execute(insert(ChatMessageResult).values(
+                analysis_id=self.analysis_id,
+                seq_start=self.seq,
+                emotions=emotions,
+                confidences=confidences
+            ))
+            db.commit()
+        finally:
+            db.close()
+        self.seq += len(messages)
+
+    def finish(self, content_hash: str, state: dict, result: dict):
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(ChatAnalysis).where(ChatAnalysis.id == self.analysis_id).values(
+                    content_hash=content_hash,
+                    message_count=self.plan.message_count,
+                    prefix_hash=self.plan.prefix_hash,
+                    state=state,
+                    result=result,
+                    updated_at=now
+                )
+            )
+            if self.extends is not None:
+                # Out of the candidate set; its rows stay readable until purged
+                db.execute(
+                    update(ChatAnalysis)
+                    .where(ChatAnalysis.id == self.extends, ChatAnalysis.retired_at.is_(None))
+                    .values(prefix_hash=None, retired_at=now)
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    def discard(self):
+        db = SessionLocal()
+        try:
+            db.execute(delete(ChatMessageResult).where(ChatMessageResult.analysis_id == self.analysis_id))
+            db.execute(delete(ChatAnalysis).where(ChatAnalysis.id == self.analysis_id))
+            db.commit()
+        finally:
+            db.close()
+
+
+def purge_retired_analyses(now: datetime = None) -> int:
+    """
+    Deletes analyses retired more than RETIRED_ANALYSIS_GRACE ago, and rows
+    of jobs that died before finish() or discard(), with their results.
+    """
+    cutoff = (now or datetime.utcnow()) - RETIRED_ANALYSIS_GRACE
+    stale = select(ChatAnalysis.id).where(or_(
+        ChatAnalysis.retired_at < cutoff,
+        and_(ChatAnalysis.retired_at.is_(None), ChatAnalysis.prefix_hash.is_(None), ChatAnalysis.created_at < cutoff)
+    ))
+    db = SessionLocal()
+    try:
+        ids = list(db.execute(stale).scalars())
+        if ids:
+            db.execute(delete(ChatMessageResult).where(ChatMessageResult.analysis_id.in_(ids)))
+            db.execute(delete(ChatAnalysis).where(ChatAnalysis.id.in_(ids)))
+            db.commit()
+        return len(ids)
+    finally:
+        db.close()
+
+
+def analyze_chat_with_reuse(user_id: int, content_hash: str, zip_source, on_progress=_noop_progress,
+                            persist_history: bool = False) -> dict:
+    """
+    analyze_chat_archive() backed by the user's stored analyses.
+
+    If the archive's messages are exactly those of a stored chat, its result
+    is returned without inference. If they extend one, only the appended
+    messages are classified and folded into the stored aggregator state.
+    Otherwise the chat is analyzed in full and stored for next time.
+    `zip_source` must be seekable; it is read more than once.
+
+    With persist_history, every timestamped message is also written to
+    `emotion_logs`; reused messages are written from their stored results.
+    """
+    history = ChatHistoryWriter(user_id) if persist_history else None
+
+    bucket = settings.CHAT_TIMELINE_BUCKET
+    if not settings.CHAT_REUSE_ANALYSES or settings.CHAT_MAX_MESSAGES > 0:
+        # Capped mode analyzes a moving tail, which cannot be resumed
+        result = analyze_chat_archive(zip_source, on_progress, on_results=history.write if history else None)
+        return _with_history_stats(result, history)
+
+    on_progress(2, stage="fingerprinting")
+    plan = plan_reuse(user_id, zip_source, bucket)
+    zip_source.seek(0)
+
+    if plan.unchanged and plan.result:
+        if history is not None:
+            on_progress(3, stage="saving history")
+            _backfill_history(history, zip_source, plan.analysis_id, plan.skip)
+        return _with_history_stats({**plan.result, "reused_messages": plan.skip}, history)
+
+    recorder = AnalysisRecorder(user_id, plan)
+    aggregator = recorder.aggregator(bucket)
+
+    def on_results(messages, results):
+        recorder.on_results(messages, results)
+        if history is not None:
+            history.write(messages, results)
+
+    try:
+        if history is not None and plan.skip:
+            # From the job's own copy, which cannot be purged under it
+            on_progress(3, stage="saving history")
+            _backfill_history(history, zip_source, recorder.analysis_id, plan.skip)
+            zip_source.seek(0)
+
+        result = analyze_chat_archive(
+            zip_source, on_progress,
+            aggregator=aggregator,
+            skip_messages=plan.skip,
+            on_results=on_results
+        )
+    except BaseException:
+        recorder.discard()
+        raise
+
+    result["reused_messages"] = plan.skip
+    recorder.finish(content_hash, aggregator.to_state(), result)
+    return _with_history_stats(result, history)
+
+
+def _backfill_history(history, zip_source, analysis_id: int, count: int):
+    db = SessionLocal()
+    try:
+        messages = islice(iter_archive_messages(zip_source), count)
+        history.backfill(messages, load_message_results(db, analysis_id))
+    finally:
+        db.close()
+
+
+def _with_history_stats(result, history):
+    # Kept out of the stored result: it describes this run, not the chat
+    if history is None:
+        return result
+    return {**result, "history": history.stats()}
+
+
+def load_message_results(db, analysis_id: int):
+    """Yields the stored per-message results of an analysis, in message order."""
+    rows = (
+        db.query(ChatMessageResult.emotions, ChatMessageResult.confidences)
+        .filter(ChatMessageResult.analysis_id == analysis_id)
+        .order_by(ChatMessageResult.seq_start.asc())
+        .yield_per(50)
+    )
+    for emotions, confidences in rows:
+        yield from decode_results(emotions, confidences)
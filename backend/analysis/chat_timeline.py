@@ -0,0 +1,123 @@
+from collections import Counter, defaultdict, deque
+from datetime import date, timedelta
+
+from analysis.drift import detect_distribution_drift
+
+# Windows with fewer classified messages are shown on the timeline but not
+# compared for drift; a handful of lines says little about a change in mood.
+MIN_DRIFT_WINDOW_MESSAGES = 5
+RECENT_CONTEXT_SIZE = 5
+
+
+def bucket_start(ts, bucket: str):
+    """Start date of the fixed-width window ("day", "week" or "month") containing ts."""
+    day = ts.date()
+    if bucket == "day":
+        return day
+    if bucket == "month":
+        return day.replace(day=1)
+    return day - timedelta(days=day.weekday())
+
+
+def _summarize(counts: Counter) -> dict:
+    total = sum(counts.values())
+    return {
+        "messages": total,
+        "dominant": counts.most_common(1)[0][0] if counts else None,
+        "distribution": {k: v / total for k, v in counts.items()} if total else {}
+    }
+
+
+class ChatAggregator:
+    """
+    Folds classified chat messages into running counters in a single pass.
+
+    Keeps a global emotion Counter, one Counter per participant and one per
+    time window, so memory grows with participants x windows, not with the
+    number of messages. Only the last few messages are retained verbatim,
+    in a ring buffer for `recent_context`.
+
+    The state round-trips through to_state()/from_state(), so a later upload
+    of the same chat can resume aggregation instead of starting over.
+    """
+
+    def __init__(self, bucket: str = "week"):
+        self.bucket = bucket
+        self.messages = 0
+        self.totals = Counter()
+        self.by_sender = defaultdict(Counter)
+        self.by_window = defaultdict(Counter)
+        self.recent = deque(maxlen=RECENT_CONTEXT_SIZE)
+
+    def add(self, message, result):
+        """
+        Args:
+            message: ChatMessage (timestamp and sender may be None).
+            result: Inference output dict with an "emotion" key.
+        """
+        self.messages += 1
+        if result:
+            self.recent.append({"text": message.text, "sender": message.sender, "emotion": result["emotion"]})
+
+        emotion = result.get("emotion") if result else None
+        if not emotion or emotion == "unknown":
+            return
+
+        self.totals[emotion] += 1
+        self.by_sender[message.sender or "unknown"][emotion] += 1
+        if message.timestamp is not None:
+            self.by_window[bucket_start(message.timestamp, self.bucket)][emotion] += 1
+
+    @property
+    def total(self) -> int:
+        return sum(self.totals.values())
+
+    def participants(self) -> dict:
+        return {sender: _summarize(counts) for sender, counts in self.by_sender.items()}
+
+    def timeline(self) -> list:
+        return [
+            {"window": window.isoformat(), "counts": dict(counts), **_summarize(counts)}
+            for window, counts in sorted(self.by_window.items())
+        ]
+
+    def window_drift(self) -> list:
+        """Drift between each pair of consecutive, sufficiently populated windows."""
+        windows = [
+            (window, counts) for window, counts in sorted(self.by_window.items())
+            if sum(counts.values()) >= MIN_DRIFT_WINDOW_MESSAGES
+        ]
+        drift = []
+        for (prev_window, prev_counts), (window, counts) in zip(windows, windows[1:]):
+            result = detect_distribution_drift(prev_counts, counts)
+            drift.append({
+                "from_window": prev_window.isoformat(),
+                "to_window": window.isoformat(),
+                **result
+            })
+        return drift
+
+    # -----------------------------
+    # Persistence
+    # -----------------------------
+    def to_state(self) -> dict:
+        return {
+            "bucket": self.bucket,
+            "messages": self.messages,
+            "totals": dict(self.totals),
+            "by_sender": {sender: dict(counts) for sender, counts in self.by_sender.items()},
+            "by_window": {window.isoformat(): dict(counts) for window, counts in self.by_window.items()},
+            "recent": list(self.recent)
+        }
+
+    @classmethod
+    def from_state(cls, state: dict):
+        aggregator = cls(bucket=state["bucket"])
+        aggregator.messages = state.get("messages", 0)
+        aggregator.totals.update(state.get("totals", {}))
+        for sender, counts in state.get("by_sender", {}).items():
+            aggregator.by_sender[sender].update(counts)
+        for window, counts in state.get("by_window", {}).items():
+            aggregator.by_window[date.fromisoformat(window)].update(counts)
+        aggregator.recent.extend(state.get("recent", []))
+        return aggregator
@@ -0,0 +1,107 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+from db.rollup import hour_of, hour_start
+
+# Named bucket widths accepted by the timeline endpoints, in hours.
+# "auto" picks the narrowest width that fits the point budget.
+BUCKET_HOURS = {"hour": 1, "day": 24, "week": 168, "auto": 1}
+
+
+def bucket_width_hours(first_hour: int, end_hour: int, max_points: int, minimum: int = 1) -> int:
+    """
+    Smallest multiple of `minimum` hours whose epoch-aligned buckets cover
+    [first_hour, end_hour] in at most max_points buckets.
+    """
+    max_points = max(max_points, 1)
+    span = max(end_hour - first_hour + 1, 1)
+    width = minimum * max(1, math.ceil(span / (max_points * minimum)))
+    # Alignment can straddle one extra bucket at either end
+    while end_hour // width - first_hour // width + 1 > max_points:
+        width += minimum
+    return width
+
+
+def resolve_bucket(bucket: str, since, until, first_hour, max_points: int, n_sources: int = 1):
+    """
+    Width in hours for a bucketed timeline over [since, until], widened when
+    the requested bucket would exceed max_points points (per source).
+    Returns None for an unknown bucket name.
+    """
+    minimum = BUCKET_HOURS.get(bucket)
+    if minimum is None:
+        return None
+    start = hour_of(until) if first_hour is None else max(first_hour, hour_of(since))
+    return bucket_width_hours(start, hour_of(until), max_points // max(n_sources, 1), minimum)
+
+
+def dominant_points(rows) -> list:
+    """
+    Collapses bucketed_counts_stmt() rows into one point per (bucket, source):
+    dominant emotion, mean confidence and event count, in time order.
+    """
+    points = {}
+    for bucket, source, emotion, count, confidence_sum in rows:
+        point = points.setdefault((bucket, source), {"counts": Counter(), "confidence_sum": 0.0})
+        point["counts"][emotion] += count
+        point["confidence_sum"] += confidence_sum or 0.0
+
+    result = []
+    for (bucket, source), point in sorted(points.items()):
+        total = sum(point["counts"].values())
+        result.append({
+            "timestamp": hour_start(bucket),
+            "source": source,
+            "emotion": point["counts"].most_common(1)[0][0],
+            "confidence": point["confidence_sum"] / total,
+            "count": total
+        })
+    return result
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points from the
+    series (x ascending) that keep its visual shape. The first and last
+    points are always kept; each bucket in between contributes the point
+    forming the largest triangle with the previous pick and the next
+    bucket's mean. Series already within the threshold come back whole.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+
+    # threshold - 2 buckets over the points between first and last
+    edges = (np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_events(events: list, max_points: int) -> list:
+    """
+    LTTB over confidence for time-ordered event dicts with "timestamp" and
+    "confidence" keys; returns at most max_points of them.
+    """
+    if len(events) <= max_points:
+        return events
+    x = [e["timestamp"].timestamp() for e in events]
+    y = [e["confidence"] if e["confidence"] is not None else np.nan for e in events]
+    return [events[i] for i in lttb_indices(x, y, max_points)]
@@ -1,16 +1,42 @@
 from collections import Counter
+import numpy as np
 from sqlalchemy.orm import Session
-from db.models import EmotionLog, DriftAlert
+from db.models import DriftAlert
+from analysis.emotion_queries import emotion_counts_stmt
+from analysis.drift_metrics import pairwise_distances
+from db.archive import archive_horizon_stmt
 
 
-def distribution_distance(dist1, dist2):
-    emotions = set(dist1.keys()).union(dist2.keys())
-    total = sum(abs(dist1.get(e, 0) - dist2.get(e, 0)) for e in emotions)
-    return total / 2
+def distribution_distance(dist1, dist2, metric: str = "tv"):
+    """
+    Distance between two emotion -> count (or probability) mappings, by
+    any analysis.drift_metrics metric; total variation by default.
+    """
+    emotions = sorted(set(dist1.keys()).union(dist2.keys()))
+    if not emotions:
+        return 0.0
+    p = [dist1.get(e, 0) for e in emotions]
+    q = [dist2.get(e, 0) for e in emotions]
+    return float(pairwise_distances(p, q, metrics=(metric,))[metric][0])
+
+
+# Total variation above which a shift counts as drift even if the dominant emotion held
+SEVERITY_THRESHOLD = 0.3
 
 
 def detect_emotion_drift(emotions_old, emotions_new):
-    if not emotions_old or not emotions_new:
+    return detect_distribution_drift(Counter(emotions_old), Counter(emotions_new))
+
+
+def detect_distribution_drift(old_count, new_count):
+    """
+    Same drift rule as detect_emotion_drift, but on emotion -> count mappings,
+    so callers holding running counters do not have to expand them into lists.
+    """
+    old_total = sum(old_count.values())
+    new_total = sum(new_count.values())
+
+    if not old_total or not new_total:
         return {
             "drift": False,
             "severity": 0.0,
@@ -18,12 +44,6 @@ def detect_emotion_drift(emotions_old, emotions_new):
             "to": None
         }
 
-    old_count = Counter(emotions_old)
-    new_count = Counter(emotions_new)
-
-    old_total = sum(old_count.values())
-    new_total = sum(new_count.values())
-
     old_dist = {k: v / old_total for k, v in old_count.items()}
     new_dist = {k: v / new_total for k, v in new_count.items()}
 
@@ -31,7 +51,7 @@ def detect_emotion_drift(emotions_old, emotions_new):
     dominant_new = max(new_dist, key=new_dist.get)
 
     severity = distribution_distance(old_dist, new_dist)
-    drift = dominant_old != dominant_new or severity > 0.3
+    drift = dominant_old != dominant_new or severity > SEVERITY_THRESHOLD
 
     return {
         "drift": drift,
@@ -41,22 +61,45 @@ def detect_emotion_drift(emotions_old, emotions_new):
     }
 
 
+def detect_distribution_drift_batch(old_counts, new_counts):
+    """
+    detect_distribution_drift() for many users at once: row i of the
+    (users x emotions) count matrices is one user's older / newest events,
+    columns indexed by emotion code. Ties for the dominant emotion go to the
+    lower code.
+
+    Returns:
+        tuple: (drift flags, dominant old codes, dominant new codes, severities),
+            one entry per row; rows with an empty side never drift.
+    """
+    old_counts = np.asarray(old_counts, dtype=np.float64)
+    new_counts = np.asarray(new_counts, dtype=np.float64)
+    severity = np.round(pairwise_distances(old_counts, new_counts, metrics=("tv",))["tv"], 3)
+    dominant_old = old_counts.argmax(axis=1)
+    dominant_new = new_counts.argmax(axis=1)
+    filled = (old_counts.sum(axis=1) > 0) & (new_counts.sum(axis=1) > 0)
+    drift = filled & ((dominant_old != dominant_new) | (np.nan_to_num(severity) > SEVERITY_THRESHOLD))
+    return drift, dominant_old, dominant_new, np.nan_to_num(severity)
+
+
 def get_emotion_stats(
     db: Session,
     user_id: str,
     start,
     end
 ):
-    logs = db.query(EmotionLog).filter(
-        EmotionLog.user_id == user_id,
-        EmotionLog.created_at.between(start, end)
+    # Served from the hourly rollup (raw rows only for the partial edge hours
+    # that are still in the database)
+    horizon = db.execute(archive_horizon_stmt(user_id)).scalar()
+    rows = db.execute(
+        emotion_counts_stmt(user_id, start, end, sources=("text",), exclude_unknown=False, archived_before=horizon)
     ).all()
 
-    emotions = [l.emotion for l in logs]
-    counts = Counter(emotions)
-    
-    total_logs = len(logs)
-    avg_confidence = sum(l.confidence for l in logs) / total_logs if total_logs > 0 else 0.0
+    counts = Counter({row.emotion: row.count for row in rows})
+
+    total_logs = sum(counts.values())
+    confidence_sum = sum((row.avg_confidence or 0.0) * row.count for row in rows)
+    avg_confidence = confidence_sum / total_logs if total_logs > 0 else 0.0
 
     # Fetch Alerts
     alerts = db.query(DriftAlert).filter(
@@ -69,6 +112,5 @@ def get_emotion_stats(
         "dominant": counts.most_common(1)[0][0] if counts else "N/A",
         "total_logs": total_logs,
         "average_confidence": round(avg_confidence, 2),
-        "logs": logs,
         "alerts": alerts
     }
@@ -0,0 +1,157 @@
+import warnings
+
+import numpy as np
+
+# Vectorized distances between emotion distributions. Inputs are
+# (windows x emotions) count (or probability) matrices; every metric is
+# computed for all rows in one pass, so scoring 100k windows costs a few
+# array operations instead of 100k Python-level calls.
+METRICS = ("js", "tv", "hellinger", "kl", "chi2")
+
+# Pseudo-count added to every cell before KL, which is infinite wherever
+# the reference has a zero the other window does not
+KL_SMOOTHING = 0.5
+
+
+def _as_matrix(counts) -> np.ndarray:
+    matrix = np.asarray(counts, dtype=np.float64)
+    return matrix.reshape(1, -1) if matrix.ndim == 1 else matrix
+
+
+def normalize_rows(counts) -> np.ndarray:
+    """Rows scaled to sum to 1; all-zero rows become NaN."""
+    counts = _as_matrix(counts)
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts / totals, np.nan)
+
+
+def _xlogy_ratio(x, y) -> np.ndarray:
+    # x * log(x / y), taken as 0 where x == 0 (scipy.special.rel_entr)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(x > 0, x * np.log(x / y), 0.0)
+
+
+def pairwise_distances(p, q, metrics=METRICS, base: float = None) -> dict:
+    """
+    Row-wise distances between count matrices `p` and `q` (same shape, or
+    `q` a single row broadcast against every row of `p`).
+
+    Metrics:
+        js: Jensen-Shannon distance, equal to scipy's jensenshannon(p, q, base).
+        tv: Total variation, half the L1 distance.
+        hellinger: Hellinger distance, in [0, 1].
+        kl: KL divergence of p from q after adding KL_SMOOTHING to every count.
+        chi2: Symmetric chi-square distance, 0.5 * sum((p - q)^2 / (p + q)).
+
+    Returns:
+        dict: metric -> float64 array with one entry per row; NaN where
+            either row has no events.
+    """
+    unknown = set(metrics) - set(METRICS)
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+    p_counts, q_counts = _as_matrix(p), _as_matrix(q)
+    p_dist, q_dist = normalize_rows(p_counts), normalize_rows(q_counts)
+
+    result = {}
+    if "js" in metrics:
+        m = (p_dist + q_dist) / 2
+        js = (_xlogy_ratio(p_dist, m).sum(axis=1) + _xlogy_ratio(q_dist, m).sum(axis=1)) / 2
+        js = np.sqrt(np.maximum(js, 0.0))
+        result["js"] = js / np.sqrt(np.log(base)) if base else js
+    if "tv" in metrics:
+        result["tv"] = np.abs(p_dist - q_dist).sum(axis=1) / 2
+    if "hellinger" in metrics:
+        squared = ((np.sqrt(p_dist) - np.sqrt(q_dist)) ** 2).sum(axis=1) / 2
+        result["hellinger"] = np.sqrt(np.minimum(squared, 1.0))
+    if "kl" in metrics:
+        p_smooth = normalize_rows(p_counts + KL_SMOOTHING)
+        q_smooth = normalize_rows(q_counts + KL_SMOOTHING)
+        kl = _xlogy_ratio(p_smooth, q_smooth).sum(axis=1)
+        result["kl"] = kl
+    if "chi2" in metrics:
+        total = p_dist + q_dist
+        with np.errstate(invalid="ignore", divide="ignore"):
+            terms = np.where(total > 0, (p_dist - q_dist) ** 2 / total, 0.0)
+        result["chi2"] = terms.sum(axis=1) / 2
+
+    empty = np.isnan(p_dist[:, 0]) | np.isnan(q_dist[:, 0])
+    if empty.any():
+        for metric in result:
+            result[metric] = np.where(empty, np.nan, result[metric])
+    return result
+
+
+def window_distances(counts, baseline=None, metrics=METRICS, base: float = None) -> dict:
+    """
+    Distances for a (windows x emotions) count matrix.
+
+    Args:
+        baseline: None compares each window with the previous one (n - 1
+            scores, for windows 1..n-1); an int compares every window with
+            that row; an emotion count vector compares every window with it.
+    """
+    counts = _as_matrix(counts)
+    if baseline is None:
+        return pairwise_distances(counts[1:], counts[:-1], metrics, base)
+    reference = counts[baseline] if isinstance(baseline, (int, np.integer)) else _as_matrix(baseline)
+    return pairwise_distances(counts, reference, metrics, base)
+
+
+def adaptive_thresholds(scores, k: float = 1.0, lookback: int = None, robust: bool = False) -> np.ndarray:
+    """
+    Per-score drift thresholds: center + k * spread of the scores.
+
+    Center and spread are mean and sample std, or median and 1.4826 * MAD
+    when `robust`. Without a lookback they come from the whole series (the
+    offline pipeline's mean + std rule); with one, from the `lookback`
+    scores before each position, so the threshold follows a changing
+    baseline and a score is never judged against itself. Positions with
+    fewer than two usable scores to learn from get NaN (never flagged).
+    NaN scores are ignored.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    if lookback is None:
+        valid = scores[~np.isnan(scores)]
+        if len(valid) < 2:
+            return np.full(n, np.nan)
+        if robust:
+            center = np.median(valid)
+            spread = 1.4826 * np.median(np.abs(valid - center))
+        else:
+            center, spread = valid.mean(), valid.std(ddof=1)
+        return np.full(n, center + k * spread)
+
+    if robust:
+        padded = np.concatenate([np.full(lookback, np.nan), scores[:-1] if n else scores])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, lookback)[:n]
+        with warnings.catch_warnings():
+            # All-NaN rows (the first positions) warn and yield NaN, as intended
+            warnings.simplefilter("ignore", RuntimeWarning)
+            center = np.nanmedian(windows, axis=1)
+            spread = 1.4826 * np.nanmedian(np.abs(windows - center[:, None]), axis=1)
+        usable = (~np.isnan(windows)).sum(axis=1)
+    else:
+        # Trailing sums via cumulative sums: O(n) regardless of lookback
+        valid = ~np.isnan(scores)
+        filled = np.where(valid, scores, 0.0)
+        sums = np.concatenate([[0.0], np.cumsum(filled)])
+        squares = np.concatenate([[0.0], np.cumsum(filled ** 2)])
+        counts = np.concatenate([[0], np.cumsum(valid)])
+        end = np.arange(n)
+        start = np.maximum(end - lookback, 0)
+        usable = counts[end] - counts[start]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            center = (sums[end] - sums[start]) / usable
+            variance = ((squares[end] - squares[start]) - usable * center ** 2) / (usable - 1)
+        spread = np.sqrt(np.maximum(variance, 0.0))
+    return np.where(usable >= 2, center + k * spread, np.nan)
+
+
+def detect(scores, thresholds) -> np.ndarray:
+    """Boolean drift flags: score above its threshold (NaN never drifts)."""
+    with np.errstate(invalid="ignore"):
+        return np.asarray(scores) > np.asarray(thresholds)
+
@@ -0,0 +1,207 @@
+from sqlalchemy import select, func, case, literal, union_all
+
+from core.emotions import EMOTIONS, UNKNOWN
+from db.models import EmotionLog, FaceEmotionLog, EmotionRollup
+from db.rollup import hour_of, hour_start
+
+# Statement builders only: callers execute them on a sync Session or an
+# async connection alike, and get grouped rows instead of ORM objects.
+# Grouping and filtering run on emotion codes; labels are attached last.
+
+# Rollup sources backing each raw table
+ROLLUP_SOURCES = {"text": ("text", "chat"), "face": ("face",)}
+
+
+def emotion_label(code_column):
+    """SQL equivalent of core.emotions.label_of(code)."""
+    return case(dict(enumerate(EMOTIONS)), value=code_column, else_=EMOTIONS[UNKNOWN])
+
+
+def _text_events(user_id, since=None, until=None, exclude_unknown=True):
+    stmt = select(
+        EmotionLog.emotion_code.label("emotion_code"),
+        EmotionLog.confidence.label("confidence"),
+        EmotionLog.created_at.label("ts"),
+        literal("text").label("source")
+    ).where(EmotionLog.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(EmotionLog.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(EmotionLog.created_at < until)
+    if exclude_unknown:
+        stmt = stmt.where(EmotionLog.emotion_code != UNKNOWN)
+    return stmt
+
+
+def _face_events(user_id, since=None, until=None, exclude_unknown=True):
+    stmt = select(
+        FaceEmotionLog.emotion_code.label("emotion_code"),
+        FaceEmotionLog.confidence.label("confidence"),
+        FaceEmotionLog.timestamp.label("ts"),
+        literal("face").label("source")
+    ).where(FaceEmotionLog.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(FaceEmotionLog.timestamp >= since)
+    if until is not None:
+        stmt = stmt.where(FaceEmotionLog.timestamp < until)
+    if exclude_unknown:
+        stmt = stmt.where(FaceEmotionLog.emotion_code != UNKNOWN)
+    return stmt
+
+
+def emotion_events(user_id, since=None, until=None, sources=("text", "face"), exclude_unknown=True):
+    """
+    Subquery of (emotion_code, confidence, ts, source) over the text and face
+    logs, combined with UNION ALL. Each branch keeps its own
+    (user_id, time) index range scan.
+    """
+    branches = []
+    if "text" in sources:
+        branches.append(_text_events(user_id, since, until, exclude_unknown))
+    if "face" in sources:
+        branches.append(_face_events(user_id, since, until, exclude_unknown))
+    stmt = branches[0] if len(branches) == 1 else union_all(*branches)
+    return stmt.subquery("events")
+
+
+def _raw_grouped(source, user_id, since, until, exclude_unknown):
+    branch = _text_events if source == "text" else _face_events
+    events = branch(user_id, since, until, exclude_unknown).subquery()
+    return select(
+        events.c.emotion_code,
+        func.count().label("n"),
+        func.sum(events.c.confidence).label("confidence_sum"),
+        func.count(events.c.confidence).label("confidence_n")
+    ).group_by(events.c.emotion_code)
+
+
+def _rollup_grouped(user_id, first_hour, end_hour, sources, exclude_unknown):
+    rollup_sources = [s for source in sources for s in ROLLUP_SOURCES[source]]
+    stmt = select(
+        EmotionRollup.emotion_code,
+        func.sum(EmotionRollup.count).label("n"),
+        func.sum(EmotionRollup.confidence_sum).label("confidence_sum"),
+        func.sum(EmotionRollup.count).label("confidence_n")
+    ).where(EmotionRollup.user_id == user_id, EmotionRollup.source.in_(rollup_sources))
+    if first_hour is not None:
+        stmt = stmt.where(EmotionRollup.hour >= first_hour)
+    if end_hour is not None:
+        stmt = stmt.where(EmotionRollup.hour < end_hour)
+    if exclude_unknown:
+        stmt = stmt.where(EmotionRollup.emotion_code != UNKNOWN)
+    return stmt.group_by(EmotionRollup.emotion_code)
+
+
+def _grouped_branches(user_id, since, until, sources, exclude_unknown, archived_before=None) -> list:
+    """
+    Per-emotion partial counts covering [since, until): whole hours from the
+    rollup, the partial hours at either edge from the raw tables. Query cost
+    follows the number of hours in range, not the number of events.
+
+    Raw rows before `archived_before` may have moved to cold storage
+    (db/archive.py), so edges before it are widened to whole rollup hours.
+    """
+    if archived_before is not None:
+        if since is not None and since < archived_before:
+            since = hour_start(hour_of(since))
+        if until is not None and until < archived_before:
+            until = hour_start(hour_of(until) + (hour_start(hour_of(until)) < until))
+
+    first_hour = None if since is None else hour_of(since) + (hour_start(hour_of(since)) < since)
+    end_hour = None if until is None else hour_of(until)
+
+    if first_hour is not None and end_hour is not None and first_hour > end_hour:
+        # Range inside a single hour: raw rows only
+        return [_raw_grouped(source, user_id, since, until, exclude_unknown) for source in sources]
+
+    branches = [_rollup_grouped(user_id, first_hour, end_hour, sources, exclude_unknown)]
+    for source in sources:
+        if since is not None and hour_start(first_hour) > since:
+            branches.append(_raw_grouped(source, user_id, since, hour_start(first_hour), exclude_unknown))
+        if until is not None and hour_start(end_hour) < until:
+            branches.append(_raw_grouped(source, user_id, hour_start(end_hour), until, exclude_unknown))
+    return branches
+
+
+def emotion_counts_stmt(user_id, since=None, until=None, sources=("text", "face"), exclude_unknown=True,
+                        archived_before=None):
+    """
+    SELECT emotion, COUNT(*), AVG(confidence) over [since, until) for the
+    given sources (None = unbounded; an open upper bound reads the rollup
+    through the present). Pass the user's archive horizon as
+    `archived_before` when an edge may fall in an archived month.
+
+    Partial counts from the rollup and the raw edge hours are combined with
+    UNION ALL and grouped by code; the label CASE only sees one row per emotion.
+    """
+    branches = _grouped_branches(user_id, since, until, sources, exclude_unknown, archived_before)
+    grouped = (branches[0] if len(branches) == 1 else union_all(*branches)).subquery("grouped")
+
+    count = func.sum(grouped.c.n)
+    return (
+        select(
+            emotion_label(grouped.c.emotion_code).label("emotion"),
+            count.label("count"),
+            (func.sum(grouped.c.confidence_sum) / func.nullif(func.sum(grouped.c.confidence_n), 0)).label("avg_confidence")
+        )
+        .group_by(grouped.c.emotion_code)
+        .order_by(count.desc(), grouped.c.emotion_code)
+    )
+
+
+def period_counts_stmt(user_id, start_previous, start_current, until=None, sources=("text",),
+                       exclude_unknown=False):
+    """
+    Emotion counts for two adjacent periods, labelled by a "period" column:
+    [start_previous, start_current) as "previous" and [start_current, until) as "current".
+    """
+    previous = emotion_counts_stmt(
+        user_id, start_previous, start_current, sources, exclude_unknown
+    ).subquery("previous")
+    current = emotion_counts_stmt(
+        user_id, start_current, until, sources, exclude_unknown
+    ).subquery("current")
+    return union_all(
+        select(literal("previous").label("period"), previous.c.emotion, previous.c["count"]),
+        select(literal("current").label("period"), current.c.emotion, current.c["count"])
+    )
+
+
+def bucketed_counts_stmt(user_id, width_hours: int, since=None, until=None, sources=("text", "face"),
+                         exclude_unknown=True):
+    """
+    (bucket, source, emotion, count, confidence_sum) per fixed-width bucket,
+    grouped in SQL over the rollup. `bucket` is the first hour of the bucket;
+    buckets are aligned to the epoch, so width 24 gives UTC days. Chat rows
+    are reported as "text".
+    """
+    rollup_sources = [s for source in sources for s in ROLLUP_SOURCES[source]]
+    bucket = (EmotionRollup.hour // width_hours) * width_hours
+    source = case((EmotionRollup.source == "face", "face"), else_="text")
+    stmt = select(
+        bucket.label("bucket"),
+        source.label("source"),
+        emotion_label(EmotionRollup.emotion_code).label("emotion"),
+        func.sum(EmotionRollup.count).label("count"),
+        func.sum(EmotionRollup.confidence_sum).label("confidence_sum")
+    ).where(EmotionRollup.user_id == user_id, EmotionRollup.source.in_(rollup_sources))
+    if since is not None:
+        stmt = stmt.where(EmotionRollup.hour >= hour_of(since))
+    if until is not None:
+        stmt = stmt.where(EmotionRollup.hour <= hour_of(until))
+    if exclude_unknown:
+        stmt = stmt.where(EmotionRollup.emotion_code != UNKNOWN)
+    return stmt.group_by(bucket, source, EmotionRollup.emotion_code).order_by(bucket)
+
+
+def first_hour_stmt(user_id, sources=("text", "face")):
+    """Earliest rollup hour for the user (NULL without data); a primary-key seek."""
+    rollup_sources = [s for source in sources for s in ROLLUP_SOURCES[source]]
+    return select(func.min(EmotionRollup.hour)).where(
+        EmotionRollup.user_id == user_id, EmotionRollup.source.in_(rollup_sources)
+    )
+
+
+def counts_to_dict(rows) -> dict:
+    """{emotion: count} from emotion_counts_stmt() rows."""
+    return {row.emotion: row.count for row in rows}
@@ -1,7 +1,18 @@
 from datetime import datetime, timedelta
-from collections import Counter
 import numpy as np
 
+from core.emotions import EMOTIONS, CODE_OF, NEGATIVE, UNKNOWN
+
+
+def _distribution(codes) -> np.ndarray:
+    counts = np.bincount(codes, minlength=len(EMOTIONS))
+    return counts / counts.sum()
+
+
+def _count_dict(codes) -> dict:
+    counts = np.bincount(codes, minlength=len(EMOTIONS))
+    return {EMOTIONS[c]: int(n) for c, n in enumerate(counts) if n}
+
 def analyze_fusion(text_logs, face_logs, range_days=7):
     """
     Analyzes the alignment between text and face emotions.
@@ -24,25 +35,11 @@ def analyze_fusion(text_logs, face_logs, range_days=7):
     recent_text = [l for l in text_logs if l.created_at >= cutoff]
     recent_face = [l for l in face_logs if l.timestamp >= cutoff]
 
-    # Normalize logic
-    EMOTION_MAP = {
-        "angry": "anger",
-        "disgust": "anger", 
-        "sad": "sadness",
-        "joy": "happy",
-        "happines": "happy"
-    }
-    
-    # In-place normalization for analysis (create copies if needed to avoid mutating objects? 
-    # Actually modifying the objects in memory for this scope is fine or just map when extracting)
-    # Better to map when extracting attributes.
-    
-    # Helper to get emotion
-    def get_norm_emotion(log):
-        e = log.emotion
-        if e: e = e.lower()
-        return EMOTION_MAP.get(e, e)
-        
+    # Labels are normalized at insert time into emotion_code (core.emotions),
+    # so the analysis below works on small integer arrays.
+    def codes(logs):
+        return np.array([UNKNOWN if l.emotion_code is None else l.emotion_code for l in logs], dtype=np.int64)
+
     if not recent_text or not recent_face:
         return {
             "alignment_score": 0.0,
@@ -53,28 +50,23 @@ def analyze_fusion(text_logs, face_logs, range_days=7):
         
     # 2. Emotional Alignment Score
     # Compare the top emotions in both modalities
-    text_emotions = [get_norm_emotion(l) for l in recent_text if get_norm_emotion(l) != 'neutral']
-    face_emotions = [get_norm_emotion(l) for l in recent_face if get_norm_emotion(l) != 'neutral']
+    text_codes = codes(recent_text)
+    face_codes = codes(recent_face)
+    neutral = CODE_OF['neutral']
+    text_emotions = text_codes[text_codes != neutral]
+    face_emotions = face_codes[face_codes != neutral]
     
     # Fallback if only neutral
-    if not text_emotions: text_emotions = ['neutral']
-    if not face_emotions: face_emotions = ['neutral']
+    if not text_emotions.size: text_emotions = np.array([neutral])
+    if not face_emotions.size: face_emotions = np.array([neutral])
     
-    text_counts = Counter(text_emotions)
-    face_counts = Counter(face_emotions)
-    
-    # Get distributions
-    def get_dist(counts):
-        total = sum(counts.values())
-        return {k: v/total for k, v in counts.items()}
-        
-    text_dist = get_dist(text_counts)
-    face_dist = get_dist(face_counts)
+    # Get distributions (indexed by emotion code)
+    text_dist = _distribution(text_emotions)
+    face_dist = _distribution(face_emotions)
     
     # Calculate overlap (Bhattacharyya coefficient or simple intersection)
     # Simple overlap: sum of min(p1, p2)
-    emotions = set(text_dist.keys()) | set(face_dist.keys())
-    alignment_score = sum(min(text_dist.get(e, 0), face_dist.get(e, 0)) for e in emotions)
+    alignment_score = float(np.minimum(text_dist, face_dist).sum())
     
     # 3. Masking Detection
     # Logic: High frequency of "Sad/Anger/Fear" in Face but "Happy/Neutral" in Text
@@ -83,11 +75,11 @@ def analyze_fusion(text_logs, face_logs, range_days=7):
     masking_flag = False
     details = []
     
-    negative_emotions = {'sadness', 'anger', 'fear', 'disgust'}
-    positive_neutral = {'happy', 'joy', 'neutral', 'love', 'surprise'}
+    negative_emotions = sorted(NEGATIVE)
+    positive_neutral = [CODE_OF[e] for e in ('happy', 'neutral', 'love', 'surprise')]
     
-    face_neg_score = sum(face_dist.get(e, 0) for e in negative_emotions)
-    text_pos_score = sum(text_dist.get(e, 0) for e in positive_neutral)
+    face_neg_score = face_dist[negative_emotions].sum()
+    text_pos_score = text_dist[positive_neutral].sum()
     
     # If face is > 40% negative but text is > 80% positive/neutral -> Masking?
     if face_neg_score > 0.4 and text_pos_score > 0.8:
@@ -98,40 +90,26 @@ def analyze_fusion(text_logs, face_logs, range_days=7):
     # Combined volatility. 1.0 = stable, 0.0 = volatile
     # We can measure how often the dominant emotion switches in the combined stream
     
-    all_events = []
-    all_events = []
-    for l in recent_text:
-        all_events.append({'t': l.created_at, 'e': get_norm_emotion(l)})
-    for l in recent_face:
-        all_events.append({'t': l.timestamp, 'e': get_norm_emotion(l)})
-    
-    all_events.sort(key=lambda x: x['t'])
+    times = [l.created_at for l in recent_text] + [l.timestamp for l in recent_face]
+    order = sorted(range(len(times)), key=times.__getitem__)
+    sorted_codes = np.concatenate([text_codes, face_codes])[order]
     
-    switches = 0
-    if len(all_events) > 1:
-        for i in range(1, len(all_events)):
-            if all_events[i]['e'] != all_events[i-1]['e']:
-                switches += 1
+    switches = int(np.count_nonzero(np.diff(sorted_codes)))
                 
     # Normalize switches by number of events (switch rate)
-    switch_rate = switches / (len(all_events) - 1) if len(all_events) > 1 else 0
+    switch_rate = switches / (len(sorted_codes) - 1) if len(sorted_codes) > 1 else 0
     stability_score = max(0.0, 1.0 - switch_rate)
     
     # ... (existing imports) ...
     
     # 5. Severity & Risk Analysis
-    # Combine streams for drift analysis (Already normalized in all_events, but for clarity let's use list)
-    combined_emotions = [get_norm_emotion(l) for l in recent_text] + [get_norm_emotion(l) for l in recent_face]
-    # To do a proper drift, we ideally need time-ordered, but for now we'll just split the combined set
-    # Better: use the timestamps from all_events
-    sorted_emotions = [x['e'] for x in all_events]
-    
-    mid_point = len(sorted_emotions) // 2
-    old_emotions = sorted_emotions[:mid_point]
-    new_emotions = sorted_emotions[mid_point:]
-    
-    from analysis.drift import detect_emotion_drift
-    drift_result = detect_emotion_drift(old_emotions, new_emotions)
+    # Combine streams for drift analysis, split in time order
+    mid_point = len(sorted_codes) // 2
+    old_emotions = sorted_codes[:mid_point]
+    new_emotions = sorted_codes[mid_point:]
+    
+    from analysis.drift import detect_distribution_drift
+    drift_result = detect_distribution_drift(_count_dict(old_emotions), _count_dict(new_emotions))
     
     # Volatility is inverse of stability
     volatility_score = 1.0 - stability_score
@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+
+from sqlalchemy import select, literal, func
+
+from core.emotions import label_of
+from db.archive import ARCHIVED_TABLES, SOURCE_TABLES, archive_parts_stmt, iter_part_rows
+from db.models import EmotionLog
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Exportable columns, in the order of the rows produced by _batches()
+EXPORT_COLUMNS = ("id", "timestamp", "source", "emotion", "raw_emotion", "confidence", "text")
+DEFAULT_COLUMNS = ("timestamp", "source", "emotion", "confidence", "text")
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+}
+
+
+def _db_batches(db, source: str, user_id: int, since, until, batch_rows: int):
+    model, ts_column, _ = ARCHIVED_TABLES[SOURCE_TABLES[source]]
+    if model is EmotionLog:
+        row_source, text = func.coalesce(EmotionLog.source, "text"), EmotionLog.text
+    else:
+        row_source, text = literal("face"), literal(None)
+    stmt = select(
+        model.id, ts_column, row_source, model.emotion_code, model.emotion, model.confidence, text
+    ).where(model.user_id == user_id)
+    if since is not None:
+        stmt = stmt.where(ts_column >= since)
+    if until is not None:
+        stmt = stmt.where(ts_column < until)
+
+    # Server-side cursor (psycopg2 named cursor); rows arrive batch_rows at a time
+    result = db.execute(stmt.order_by(ts_column).execution_options(yield_per=batch_rows))
+    for partition in result.partitions():
+        yield partition
+
+
+def _batches(db, user_id: int, since, until, sources, batch_rows: int):
+    """
+    Lists of at most ~batch_rows (id, ts, source, emotion_code, emotion,
+    confidence, text) rows: per source, archived months first (one part at
+    a time, in month order), then the rows still in the database in time order.
+    """
+    for source in sources:
+        parts = db.execute(archive_parts_stmt(user_id, since, until, (source,))).all()
+        for table, relpath in parts:
+            yield from iter_part_rows(table, relpath, since, until, batch_rows)
+        yield from _db_batches(db, source, user_id, since, until, batch_rows)
+
+
+def _project(batch, columns, iso_timestamps: bool):
+    rows = []
+    for row_id, ts, source, code, emotion, confidence, text in batch:
+        values = {
+            "id": row_id,
+            "timestamp": ts.isoformat() if iso_timestamps and ts is not None else ts,
+            "source": source,
+            "emotion": label_of(code),
+            "raw_emotion": emotion,
+            "confidence": confidence,
+            "text": text,
+        }
+        rows.append([values[c] for c in columns])
+    return rows
+
+
+# -----------------------------
+# Serializers
+# -----------------------------
+def _csv_chunks(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(_project(batch, columns, iso_timestamps=True))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(batches, columns):
+    for batch in batches:
+        rows = _project(batch, columns, iso_timestamps=True)
+        yield "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+
+def _arrow_schema(columns):
+    types = {
+        "id": pa.int64(),
+        "timestamp": pa.timestamp("us"),
+        "source": pa.string(),
+        "emotion": pa.string(),
+        "raw_emotion": pa.string(),
+        "confidence": pa.float64(),
+        "text": pa.string(),
+    }
+    return pa.schema([(c, types[c]) for c in columns])
+
+
+def _arrow_chunks(batches, columns):
+    # Arrow IPC stream: the schema message, then one record batch per chunk
+    schema = _arrow_schema(columns)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for batch in batches:
+            rows = _project(batch, columns, iso_timestamps=False)
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema
+            ))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+
+def export_stream(session_factory, user_id: int, fmt: str, columns, since=None, until=None,
+                  sources=("text", "face"), batch_rows: int = 5000):
+    """
+    Generator of CSV / NDJSON text or Arrow IPC bytes for the user's logs.
+    Memory stays bounded by batch_rows whatever the history size: rows are
+    fetched, serialized and handed to the response one batch at a time.
+    The session is opened on first iteration and closed when the stream
+    ends or the client disconnects.
+    """
+    serializer = {"csv": _csv_chunks, "ndjson": _ndjson_chunks, "arrow": _arrow_chunks}[fmt]
+    db = session_factory()
+    try:
+        yield from serializer(_batches(db, user_id, since, until, sources, batch_rows), list(columns))
+    finally:
+        db.close()
+
+
+def arrow_available() -> bool:
+    return pa is not None
@@ -1,11 +1,16 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
+from sqlalchemy import select, event, inspect
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
 
 from db.database import SessionLocal
+from db.async_database import AsyncSessionLocal
 from db.models import User
+from core.cache import TTLCache
+from core.config import settings
 from core.security import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -17,28 +22,135 @@ def get_db():
     finally:
         db.close()
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    """
+    The token's user. Cache hits (see UserCache) return without opening a
+    database session; misses load the user on a short-lived one.
+    """
+    email = _token_email(token)
+    if email == TEST_USER_EMAIL:
+        return _test_user()
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).first()
+        return _remember(email, user)
+    finally:
+        db.close()
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme)):
+    """get_current_user for async endpoints; misses load the user on an AsyncSession."""
+    email = _token_email(token)
+    if email == TEST_USER_EMAIL:
+        return _test_user()
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+
+    async with AsyncSessionLocal() as db:
+        user = (await db.execute(select(User).where(User.email == email))).scalars().first()
+        return _remember(email, user)
+
+def resolve_user(token: str, db: Session):
+    """
+    Decodes a bearer token and loads its user. Shared by the header-based
+    dependency and endpoints that must accept the token elsewhere (e.g. SSE,
+    where EventSource cannot set an Authorization header).
+    """
+    email = _token_email(token)
+    
+    # --- TEST USER IMPLEMENTATION ---
+    if email == TEST_USER_EMAIL:
+        return _test_user()
+    # --------------------------------
+    
+    user = user_cache.get(email)
+    if user is not None:
+        return user
+    user = db.query(User).filter(User.email == email).first()
+    return _remember(email, user)
+
+TEST_USER_EMAIL = "test@example.com"
+
+def _test_user():
+    # Return a mock user object that satisfies the User model interface
+    # We create a dummy User instance without adding it to the DB session
+    return User(id=1, email=TEST_USER_EMAIL, is_active=True, hashed_password="dummy")
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_email(token: str) -> str:
+    """The token's subject (email); 401 for a missing, invalid or subject-less token."""
+    if not token:
+        raise _credentials_exception()
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
-    
-    # --- TEST USER IMPLEMENTATION ---
-    if email == "test@example.com":
-        # Return a mock user object that satisfies the User model interface
-        # We create a dummy User instance without adding it to the DB session
-        return User(id=1, email="test@example.com", is_active=True, hashed_password="dummy")
-    # --------------------------------
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    if email is None:
+        raise _credentials_exception()
+    return email
+
+
+# -----------------------------
+# Resolved-user cache
+# -----------------------------
+class UserCache:
+    """
+    TTL + LRU cache of resolved users, keyed by token subject (email).
+
+    Entries hold column values, not ORM instances: every hit builds a fresh
+    detached User, so requests never share (or lazy-load through) one
+    object. Invalidation is per process; with several web workers the TTL
+    bounds how long another worker may keep serving a changed user.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self._cache = TTLCache(ttl, max_size)
+
+    def get(self, email: str):
+        values = self._cache.get(email)
+        return None if values is None else User(**values)
+
+    def put(self, user: User):
+        self._cache.put(user.email, {
+            "id": user.id, "email": user.email, "is_active": user.is_active, "created_at": user.created_at
+        })
+
+    def invalidate(self, email: str = None):
+        """Drops one user, or everyone when `email` is None."""
+        self._cache.invalidate(email)
+
+
+user_cache = UserCache(settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CACHE_SIZE)
+
+
+def invalidate_user(email: str):
+    user_cache.invalidate(email)
+
+
+def _remember(email: str, user):
+    """Caches a freshly loaded user; 401 for unknown or deactivated accounts."""
+    if user is None or user.is_active is False:
+        user_cache.invalidate(email)
+        raise _credentials_exception()
+    user_cache.put(user)
     return user
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    # Any flushed change (password, deactivation, deletion) drops the cached
+    # copy, under the previous email too when that changed
+    for email in {target.email, *inspect(target).attrs.email.history.deleted}:
+        user_cache.invalidate(email)
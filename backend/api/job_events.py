@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import settings
+from db.database import SessionLocal
+from db.models import ChatJob
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+
+def job_snapshot(job) -> dict:
+    """Client-facing view of a chat job, shared by the SSE stream and polling."""
+    snapshot = {
+        "job_id": job.job_id,
+        "status": job.status,
+        "progress": job.progress or 0,
+        "stage": job.stage,
+        "partial": job.partial,
+        "error": job.error
+    }
+    if job.status == "completed":
+        snapshot["result"] = job.result
+    return snapshot
+
+
+class _Subscriber:
+    def __init__(self, seq: int):
+        self.seq = seq
+        self.snapshot = None
+        self.changed = asyncio.Event()
+
+
+class JobEventHub:
+    """
+    Fans chat-job changes out to open SSE streams.
+
+    One background task polls the `chat_jobs` table for every watched job in a
+    single query per SSE_POLL_INTERVAL, whatever the number of connected
+    clients, and wakes only the subscribers whose job's event_seq moved.
+    The task stops itself when the last subscriber leaves.
+    """
+
+    def __init__(self, poll_interval: float = None):
+        self.poll_interval = poll_interval or settings.SSE_POLL_INTERVAL
+        self._subscribers = {}  # job_id -> set of _Subscriber
+        self._task = None
+
+    def subscribe(self, job_id: str, seq: int) -> _Subscriber:
+        sub = _Subscriber(seq)
+        self._subscribers.setdefault(job_id, set()).add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll_loop())
+        return sub
+
+    def unsubscribe(self, job_id: str, sub: _Subscriber):
+        subs = self._subscribers.get(job_id)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[job_id]
+
+    async def _poll_loop(self):
+        while self._subscribers:
+            await asyncio.sleep(self.poll_interval)
+            # Lowest seq any subscriber of each job has seen
+            known = {job_id: min(sub.seq for sub in subs) for job_id, subs in self._subscribers.items() if subs}
+            if not known:
+                break
+            try:
+                jobs = await run_in_threadpool(_load_changed_jobs, known)
+            except Exception as e:
+                print(f"SSE job poll failed: {e}")
+                continue
+
+            for job_id, (seq, snapshot) in jobs.items():
+                for sub in self._subscribers.get(job_id, ()):
+                    if seq > sub.seq:
+                        sub.seq = seq
+                        sub.snapshot = snapshot
+                        sub.changed.set()
+
+
+def _load_changed_jobs(known: dict) -> dict:
+    """
+    (event_seq, snapshot) for the watched jobs whose event_seq passed
+    `known[job_id]`. Every poll reads only the small status columns; the
+    partial / result JSON is loaded just for jobs that changed.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(
+            ChatJob.job_id, ChatJob.status, ChatJob.progress, ChatJob.stage, ChatJob.event_seq, ChatJob.error
+        ).filter(ChatJob.job_id.in_(list(known))).all()
+        changed = {row.job_id: row for row in rows if (row.event_seq or 0) > known[row.job_id]}
+        if not changed:
+            return {}
+
+        payloads = {
+            job_id: (partial, result)
+            for job_id, partial, result in db.query(ChatJob.job_id, ChatJob.partial, ChatJob.result)
+            .filter(ChatJob.job_id.in_(list(changed)))
+        }
+        jobs = {}
+        for job_id, row in changed.items():
+            partial, result = payloads.get(job_id, (None, None))
+            snapshot = {
+                "job_id": job_id,
+                "status": row.status,
+                "progress": row.progress or 0,
+                "stage": row.stage,
+                "partial": partial,
+                "error": row.error
+            }
+            if row.status == "completed":
+                snapshot["result"] = result
+            jobs[job_id] = (row.event_seq or 0, snapshot)
+        return jobs
+    finally:
+        db.close()
+
+
+hub = JobEventHub()
+
+
+def format_event(seq: int, snapshot: dict) -> str:
+    status = snapshot["status"]
+    event = status if status in TERMINAL_STATUSES else "progress"
+    return f"id: {seq}\nevent: {event}\ndata: {json.dumps(snapshot, default=str)}\n\n"
+
+
+async def job_event_stream(request, job_id: str, seq: int, snapshot: dict, last_event_id: int):
+    """
+    Server-Sent Events generator for one job.
+
+    Progress is state, not a log: on (re)connect the client receives the
+    current snapshot if it is newer than Last-Event-ID, then every later
+    change. A comment line is sent every SSE_HEARTBEAT_INTERVAL so proxies
+    keep idle connections open. The stream ends after a terminal event.
+    """
+    yield f"retry: {settings.SSE_RETRY_MS}\n\n"
+
+    if seq > last_event_id:
+        yield format_event(seq, snapshot)
+    if snapshot["status"] in TERMINAL_STATUSES:
+        return
+
+    sub = hub.subscribe(job_id, max(seq, last_event_id))
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(sub.changed.wait(), timeout=settings.SSE_HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+
+            sub.changed.clear()
+            yield format_event(sub.seq, sub.snapshot)
+            if sub.snapshot["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        hub.unsubscribe(job_id, sub)
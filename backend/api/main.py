@@ -1,6 +1,8 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Query, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from collections import Counter
 from datetime import datetime, timedelta
 
@@ -8,10 +10,24 @@ from routes.report_routes import router as report_router
 from api.routes import auth
 from ml.inference import predict_emotion
 from db.database import SessionLocal
+from db.async_database import get_async_db
+from db.log_writer import (
+    LogQueueFull, start_log_writer, stop_log_writer, write_log, flush_logs, flush_logs_async
+)
 from db.models import EmotionLog, FaceEmotionLog, DriftAlert, User
 from db.init_db import init_db
-from analysis.drift import detect_emotion_drift
-from api.deps import get_current_user
+from db.archive import archived_events, archived_events_async
+from db.drift_state import load_drift_counts
+from analysis.drift import detect_distribution_drift
+from analysis.emotion_queries import (
+    emotion_counts_stmt, period_counts_stmt, bucketed_counts_stmt, first_hour_stmt, emotion_events, counts_to_dict
+)
+from core.emotions import label_of
+from analysis.downsample import resolve_bucket, dominant_points, downsample_events
+from api.deps import get_current_user, get_current_user_async
+from core.security import stop_password_pool
+from core.http import close_http_clients
+from worker.runner import start_inline_runner, stop_inline_runner
 
 
 # -----------------------------
@@ -29,6 +45,8 @@ from routes import fusion_routes
 app.include_router(fusion_routes.router)
 from api.routes import support_routes
 app.include_router(support_routes.router)
+from api.routes import export_routes
+app.include_router(export_routes.router)
 
 from core.config import settings
 
@@ -54,6 +72,17 @@ class TextRequest(BaseModel):
 @app.on_event("startup")
 def startup():
     init_db()
+    start_log_writer()
+    start_inline_runner()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    stop_inline_runner()
+    # Drains queued log rows before the process exits
+    stop_log_writer()
+    stop_password_pool()
+    close_http_clients()
 
 
 # -----------------------------
@@ -71,16 +100,17 @@ def health():
 def predict(req: TextRequest, current_user: User = Depends(get_current_user)):
     result = predict_emotion(req.text)
 
-    db = SessionLocal()
-    log = EmotionLog(
-        user_id=current_user.id,
-        text=req.text,
-        emotion=result["emotion"],
-        confidence=result["confidence"]
-    )
-    db.add(log)
-    db.commit()
-    db.close()
+    try:
+        write_log(
+            EmotionLog,
+            user_id=current_user.id,
+            text=req.text,
+            emotion=result["emotion"],
+            confidence=result["confidence"],
+            created_at=datetime.utcnow()
+        )
+    except LogQueueFull:
+        raise HTTPException(status_code=503, detail="Too many pending writes, retry shortly", headers={"Retry-After": "1"})
 
     return result
 
@@ -88,131 +118,125 @@ def predict(req: TextRequest, current_user: User = Depends(get_current_user)):
 # -----------------------------
 # Timeline
 # -----------------------------
-# Helper for normalization
-EMOTION_MAP = {
-    "angry": "anger",
-    "disgust": "anger",
-    "sad": "sadness",
-    "joy": "happy",
-    "happines": "happy"
-}
-
-def get_norm_emotion(raw_emotion):
-    if not raw_emotion: return "unknown"
-    e = raw_emotion.lower()
-    return EMOTION_MAP.get(e, e)
+def timeline_arrays(points: list) -> dict:
+    return {
+        "timestamps": [p["timestamp"].isoformat() + "Z" for p in points],
+        "emotions": [p["emotion"] for p in points],
+        "confidences": [p["confidence"] for p in points],
+        "sources": [p["source"] for p in points]
+    }
+
 
 @app.get("/visualization/timeline")
-def timeline(range: str = "24h", current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
+async def timeline(
+    range: str = "24h",
+    bucket: str = None,
+    max_points: int = Query(None, ge=3),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Events in range, at most max_points of them (capped by
+    TIMELINE_MAX_POINTS).
+
+    Without a bucket, raw events are LTTB-downsampled over confidence once
+    they exceed the budget. With bucket=hour|day|week|auto, one point per
+    fixed-width bucket and source (dominant emotion, mean confidence,
+    count) is grouped in SQL from the hourly rollup; the width is widened
+    when the requested one would exceed the budget.
+    """
+    await flush_logs_async(current_user.id)
     now = datetime.utcnow()
+    max_points = min(max_points or settings.TIMELINE_MAX_POINTS, settings.TIMELINE_MAX_POINTS)
 
     delta_map = {
         "1h": timedelta(hours=1),
         "24h": timedelta(hours=24),
         "7d": timedelta(days=7),
+        "30d": timedelta(days=30),
     }
 
-    delta = delta_map.get(range, timedelta(hours=24))
-    start_time = now - delta
-
-    # Text Logs
-    text_logs = (
-        db.query(EmotionLog)
-        .filter(
-            EmotionLog.user_id == current_user.id,
-            EmotionLog.created_at >= start_time,
-            EmotionLog.emotion != "unknown"
-        )
-        .all()
-    )
-
-    # Face Logs
-    face_logs = (
-        db.query(FaceEmotionLog)
-        .filter(
-            FaceEmotionLog.user_id == current_user.id,
-            FaceEmotionLog.timestamp >= start_time,
-            FaceEmotionLog.emotion != "unknown"
-        )
-        .all()
-    )
-    
-    db.close()
-
-    # Combine
-    combined = []
-    for l in text_logs:
-        e = get_norm_emotion(l.emotion)
-        combined.append({
-            "timestamp": l.created_at,
-            "emotion": e,
-            "confidence": l.confidence,
-            "source": "text"
-        })
-    for l in face_logs:
-        e = get_norm_emotion(l.emotion)
-        combined.append({
-            "timestamp": l.timestamp,
-            "emotion": e,
-            "confidence": l.confidence,
-            "source": "face"
-        })
-
-    # Sort by timestamp
-    combined.sort(key=lambda x: x["timestamp"])
-
-    return {
-        "timestamps": [x["timestamp"].isoformat() + "Z" for x in combined],
-        "emotions": [x["emotion"] for x in combined],
-        "confidences": [x["confidence"] for x in combined],
-        "sources": [x["source"] for x in combined]
-    }
+    start_time = datetime.min if range == "all" else now - delta_map.get(range, timedelta(hours=24))
+
+    if bucket is not None:
+        first_hour = (await db.execute(first_hour_stmt(current_user.id))).scalar()
+        width = resolve_bucket(bucket, start_time, now, first_hour, max_points, n_sources=2)
+        if width is None:
+            raise HTTPException(status_code=400, detail="bucket must be one of: hour, day, week, auto")
+        rows = (await db.execute(bucketed_counts_stmt(current_user.id, width, start_time, now))).all()
+        points = dominant_points(rows)
+        result = timeline_arrays(points)
+        result["counts"] = [p["count"] for p in points]
+        result["bucket_hours"] = width
+        return result
+
+    events = (await db.execute(
+        select(emotion_events(current_user.id, start_time)).order_by("ts")
+    )).all()
+    # Ranges reaching past the hot window also scan the user's archive files
+    archived = await archived_events_async(db, current_user.id, start_time)
+    if archived:
+        events = sorted(archived + list(events), key=lambda event: event[2])
+
+    combined = [
+        {
+            "timestamp": ts,
+            "emotion": label_of(emotion_code),
+            "confidence": confidence,
+            "source": source
+        }
+        for emotion_code, confidence, ts, source in events
+    ]
+    return timeline_arrays(downsample_events(combined, max_points))
 
 # -----------------------------
 # Distribution
 # -----------------------------
 @app.get("/visualization/distribution")
-def distribution(current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
-    text_logs = db.query(EmotionLog).filter(EmotionLog.user_id == current_user.id, EmotionLog.emotion != "unknown").all()
-    face_logs = db.query(FaceEmotionLog).filter(FaceEmotionLog.user_id == current_user.id, FaceEmotionLog.emotion != "unknown").all()
-    db.close()
-
-    all_emotions = []
-    
-    for l in text_logs + face_logs:
-        e = l.emotion
-        # Apply normalization
-        norm_e = EMOTION_MAP.get(e, e)
-        all_emotions.append(norm_e)
-    
-    return dict(Counter(all_emotions))
+async def distribution(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    await flush_logs_async(current_user.id)
+    # Counted in SQL from the rollup, grouped by emotion code
+    rows = (await db.execute(emotion_counts_stmt(current_user.id))).all()
+    return counts_to_dict(rows)
 
 
 # -----------------------------
 # Drift
 # -----------------------------
+def _drift_counts_from_logs(db, user_id: int, window: int):
+    # Holistic (text + face) counts over all time come from the rollup,
+    # which still covers archived months; only the latest `window`
+    # events are read row by row
+    totals = Counter(counts_to_dict(db.execute(emotion_counts_stmt(user_id)).all()))
+    recent = []
+    for source in ("text", "face"):
+        events = emotion_events(user_id, sources=(source,))
+        recent += db.execute(select(events).order_by(events.c.ts.desc()).limit(window)).all()
+    if len(recent) < window:
+        recent += archived_events(db, user_id)
+
+    recent.sort(key=lambda event: event[2])
+    new = Counter(label_of(emotion_code) for emotion_code, _, _, _ in recent[-window:])
+    return totals - new, new
+
+
 @app.get("/drift")
 def drift(window: int = 5, current_user: User = Depends(get_current_user)):
+    flush_logs(current_user.id)
     db = SessionLocal()
-    # Fetch both for holistic drift
-    text_logs = db.query(EmotionLog).filter(EmotionLog.user_id == current_user.id, EmotionLog.emotion != "unknown").all()
-    face_logs = db.query(FaceEmotionLog).filter(FaceEmotionLog.user_id == current_user.id, FaceEmotionLog.emotion != "unknown").all()
-    
-    # Combine and Sort
-    combined = []
-    for l in text_logs:
-        e = EMOTION_MAP.get(l.emotion, l.emotion)
-        combined.append({"t": l.created_at, "e": e})
-    for l in face_logs:
-        e = EMOTION_MAP.get(l.emotion, l.emotion)
-        combined.append({"t": l.timestamp, "e": e})
-    
-    combined.sort(key=lambda x: x["t"])
-
-    if len(combined) < window * 2:
+    try:
+        # One drift_states row answers windows up to DRIFT_RECENT_CAPACITY;
+        # larger windows still read the logs
+        state = load_drift_counts(db, current_user.id)
+        split = state.split(window) if state is not None else None
+        old, new = split if split is not None else _drift_counts_from_logs(db, current_user.id, window)
+    finally:
         db.close()
+
+    if sum(old.values()) + sum(new.values()) < window * 2:
         return {
             "drift": False,
             "details": {
@@ -222,11 +246,8 @@ def drift(window: int = 5, current_user: User = Depends(get_current_user)):
             }
         }
 
-    emotions = [x["e"] for x in combined]
-    old, new = emotions[:-window], emotions[-window:]
-    result = detect_emotion_drift(old, new)
+    result = detect_distribution_drift(old, new)
 
-    db.close()
     return result
 
 
@@ -234,8 +255,10 @@ def drift(window: int = 5, current_user: User = Depends(get_current_user)):
 # Alerts
 # -----------------------------
 @app.get("/alerts")
-def get_alerts(current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
+async def get_alerts(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
     # Check last 50 logs for significant drift
     # logs is unused but kept for reference if needed later
     # logs = (
@@ -249,12 +272,11 @@ def get_alerts(current_user: User = Depends(get_current_user)):
     alerts = []
     
     try:
-         persisted_alerts = (
-            db.query(DriftAlert)
-            .filter(DriftAlert.user_id == current_user.id)
+         persisted_alerts = (await db.execute(
+            select(DriftAlert)
+            .where(DriftAlert.user_id == current_user.id)
             .order_by(DriftAlert.created_at.desc())
-            .all()
-        )
+        )).scalars().all()
          alerts = [
              {"severity": a.severity, "created_at": a.created_at, "message": "Drift detected"} 
              for a in persisted_alerts
@@ -262,7 +284,6 @@ def get_alerts(current_user: User = Depends(get_current_user)):
     except Exception:
         pass
 
-    db.close()
     return alerts
 
 
@@ -270,8 +291,12 @@ def get_alerts(current_user: User = Depends(get_current_user)):
 # Comparison
 # -----------------------------
 @app.get("/compare")
-def compare(range: str = "24h", current_user: User = Depends(get_current_user)):
-    db = SessionLocal()
+async def compare(
+    range: str = "24h",
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    await flush_logs_async(current_user.id)
     now = datetime.utcnow()
     
     delta_map = {
@@ -281,40 +306,26 @@ def compare(range: str = "24h", current_user: User = Depends(get_current_user)):
     }
     period = delta_map.get(range, timedelta(hours=24))
     
-    # Current period
+    # Current period and the previous period of equal length, grouped in one scan
     start_current = now - period
-    current_logs = (
-        db.query(EmotionLog)
-        .filter(EmotionLog.user_id == current_user.id, EmotionLog.created_at >= start_current)
-        .all()
-    )
-    
-    # Previous period
     start_prev = start_current - period
-    prev_logs = (
-        db.query(EmotionLog)
-        .filter(
-            EmotionLog.user_id == current_user.id, 
-            EmotionLog.created_at >= start_prev,
-            EmotionLog.created_at < start_current
-        )
-        .all()
-    )
-    
-    db.close()
-    
-    def get_dist(data):
-        if not data:
+    rows = (await db.execute(period_counts_stmt(current_user.id, start_prev, start_current))).all()
+
+    counts = {"current": Counter(), "previous": Counter()}
+    for row in rows:
+        counts[row.period][row.emotion] += row.count
+
+    def get_dist(counter):
+        total = sum(counter.values())
+        if not total:
             return {}
-        counts = Counter([l.emotion for l in data])
-        total = len(data)
-        return {k: v / total for k, v in counts.items()}
+        return {k: v / total for k, v in counter.items()}
 
     return {
-        "current": get_dist(current_logs),
-        "previous": get_dist(prev_logs),
+        "current": get_dist(counts["current"]),
+        "previous": get_dist(counts["previous"]),
         "meta": {
-            "current_count": len(current_logs),
-            "previous_count": len(prev_logs)
+            "current_count": sum(counts["current"].values()),
+            "previous_count": sum(counts["previous"].values())
         }
     }
@@ -1,13 +1,24 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
+import hashlib
 import requests
 import secrets
 
 from db.models import User
-from core.security import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
-from api.deps import get_db
+from db.async_database import get_async_db
+from core.cache import TTLCache
+from core.config import settings
+from core.http import http_client, UpstreamUnavailable
+from core.security import (
+    verify_password_async, get_password_hash_async, password_needs_rehash, PasswordHashBusy,
+    create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+)
+from api.deps import get_db, invalidate_user
 from pydantic import BaseModel
 
 class GoogleLoginRequest(BaseModel):
@@ -15,18 +26,44 @@ class GoogleLoginRequest(BaseModel):
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+
+def _hash_busy():
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many sign-in requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _user_by_email(db: AsyncSession, email: str):
+    return (await db.execute(select(User).where(User.email == email))).scalars().first()
+
+
+# Verified Google access tokens (by SHA-256, the token itself is not kept) -> user info
+_google_tokens = TTLCache(settings.GOOGLE_TOKEN_CACHE_TTL, settings.GOOGLE_TOKEN_CACHE_SIZE)
+
+
+def _google_user_info(access_token: str) -> dict:
+    key = hashlib.sha256(access_token.encode("utf-8")).hexdigest()
+    user_info = _google_tokens.get(key)
+    if user_info is None:
+        res = http_client("google").get(settings.GOOGLE_USERINFO_URL, params={"access_token": access_token})
+        res.raise_for_status()
+        user_info = res.json()
+        _google_tokens.put(key, user_info)
+    return user_info
+
+
 @router.post("/google", response_model=dict)
-def google_login(payload: GoogleLoginRequest, db: Session = Depends(get_db)):
+async def google_login(payload: GoogleLoginRequest, db: AsyncSession = Depends(get_async_db)):
     print(f"Received Google login request") # Debug logging
     # Verify token with Google
     try:
-        res = requests.get(
-            "https://www.googleapis.com/oauth2/v3/userinfo",
-            params={"access_token": payload.access_token}
-        )
-        res.raise_for_status()
-        user_info = res.json()
+        user_info = await run_in_threadpool(_google_user_info, payload.access_token)
         print("Google user info retrieved")
+    except UpstreamUnavailable as e:
+        print(f"Google API unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Google sign-in is temporarily unavailable")
     except requests.RequestException as e:
         print(f"Google API Error: {e}")
         raise HTTPException(status_code=400, detail="Invalid Google token")
@@ -36,7 +73,7 @@ def google_login(payload: GoogleLoginRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Google account has no email")
     
     # Check if user exists
-    user = db.query(User).filter(User.email == email).first()
+    user = await _user_by_email(db, email)
     if not user:
         print(f"Creating new user for {email}")
         # Create user with random password
@@ -50,15 +87,16 @@ def google_login(payload: GoogleLoginRequest, db: Session = Depends(get_db)):
             random_password = random_password[:50]
             
         try:
-            hashed_password = get_password_hash(random_password)
+            hashed_password = await get_password_hash_async(random_password)
+        except PasswordHashBusy:
+            raise _hash_busy()
         except Exception as e:
             print(f"Hashing failed: {e}")
             raise HTTPException(status_code=500, detail=f"Hashing failed: {str(e)}")
 
         user = User(email=email, hashed_password=hashed_password)
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -71,19 +109,22 @@ class SignupRequest(BaseModel):
     password: str
 
 @router.post("/signup", response_model=dict)
-def signup(payload: SignupRequest, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == payload.email).first()
+async def signup(payload: SignupRequest, db: AsyncSession = Depends(get_async_db)):
+    db_user = await _user_by_email(db, payload.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(payload.password)
+    try:
+        hashed_password = await get_password_hash_async(payload.password)
+    except PasswordHashBusy:
+        raise _hash_busy()
     new_user = User(email=payload.email, hashed_password=hashed_password)
     db.add(new_user)
-    db.commit()
+    await db.commit()
     return {"msg": "User created successfully"}
 
 @router.post("/token", response_model=dict)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     # --- DEBUGGING ---
     print(f"Login Attempt: username='{form_data.username}', password_len={len(form_data.password)}")
     # -----------------
@@ -97,13 +138,25 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         return {"access_token": access_token, "token_type": "bearer", "user_id": 1, "email": "test@example.com"}
     # --------------------------------
 
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    user = await _user_by_email(db, form_data.username)
+    try:
+        valid = user is not None and await verify_password_async(form_data.password, user.hashed_password)
+    except PasswordHashBusy:
+        raise _hash_busy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Upgrade hashes made at an older cost factor while the password is at hand
+    if password_needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await get_password_hash_async(form_data.password)
+            await db.commit()
+        except PasswordHashBusy:
+            pass # the login already succeeded; retry the upgrade next time
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -151,8 +204,7 @@ def forgot_password(payload: ForgotPasswordRequest, db: Session = Depends(get_db
     return {"msg": "Reset code sent to console (simulated email)"}
 
 @router.post("/reset-password")
-def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db)):
-    from core.security import verify_token_data # You might need to import or reuse decoding logic
+async def reset_password(payload: ResetPasswordRequest, db: AsyncSession = Depends(get_async_db)):
     from jose import jwt, JWTError
     from core.security import SECRET_KEY, ALGORITHM
     
@@ -165,13 +217,19 @@ def reset_password(payload: ResetPasswordRequest, db: Session = Depends(get_db))
         if email is None or token_type != "reset":
             raise HTTPException(status_code=400, detail="Invalid token")
             
-        user = db.query(User).filter(User.email == email).first()
+        user = await _user_by_email(db, email)
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
             
         # Update password
-        user.hashed_password = get_password_hash(payload.new_password)
-        db.commit()
+        try:
+            user.hashed_password = await get_password_hash_async(payload.new_password)
+        except PasswordHashBusy:
+            raise _hash_busy()
+        await db.commit()
+        # The flush hook already dropped it; this also covers a request that
+        # re-cached the old row between flush and commit
+        invalidate_user(email)
         
         return {"msg": "Password updated successfully"}
         
@@ -1,177 +1,142 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
-from typing import List, Dict
-import zipfile
-import io
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Request, Header
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+from typing import Optional
 import uuid
-import asyncio
-from collections import Counter
-from datetime import datetime
 
-from api.deps import get_current_user
+from api.deps import get_current_user, get_db, resolve_user
+from api.job_events import job_snapshot, job_event_stream
+from core.config import settings
+from db.database import SessionLocal
 from db.models import User
-from ml.inference import predict_emotion, predict_emotions_batch
-from ml.advisor import generate_advice
+from analysis.chat_ingest import spool_upload, UploadTooLarge
+from analysis.chat_store import find_identical_analysis
+from worker.job_queue import enqueue_chat_job, record_reused_job, get_chat_job, request_cancel, queue_metrics
 
 router = APIRouter(prefix="/analyze", tags=["Analysis"])
 
-# In-memory job storage (in production utilize Redis/DB)
-# Structure: { job_id: { status: "queued"|"processing"|"completed"|"failed", progress: int, result: dict, error: str } }
-jobs = {}
+# EventSource cannot send headers, so the SSE endpoint also takes ?token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token", auto_error=False)
 
-def process_chat_job(job_id: str, file_content: bytes):
-    try:
-        jobs[job_id]["status"] = "processing"
-        jobs[job_id]["progress"] = 5
-        
-        # 1. Parse Zip
-        zip_file = zipfile.ZipFile(io.BytesIO(file_content))
-        all_lines = []
-        import re
-        
-        # Iteration through files
-        file_list = zip_file.namelist()
-        total_files = len(file_list)
-        
-        for i, filename in enumerate(file_list):
-            if filename.endswith(".txt") and not filename.startswith("__MACOSX"):
-                with zip_file.open(filename) as f:
-                    text_content = f.read().decode("utf-8", errors="ignore")
-                    raw_lines = text_content.split('\n')
-                    
-                    for l in raw_lines:
-                        l = l.strip()
-                        if not l: continue
-                        
-                        # WhatsApp Regex: date, time - sender: message
-                        match = re.match(r'^.*? - .*?: (.*)$', l)
-                        if match:
-                            clean_l = match.group(1)
-                            if "<Media omitted>" in clean_l: continue
-                            all_lines.append(clean_l)
-                        else:
-                            if "omitted" not in l and len(l) > 1:
-                                all_lines.append(l)
-            
-            # Update progress during parsing (5% to 15%)
-            if total_files > 0:
-                jobs[job_id]["progress"] = 5 + int((i / total_files) * 10)
-
-        jobs[job_id]["progress"] = 15
-
-        if not all_lines:
-             jobs[job_id]["status"] = "failed"
-             jobs[job_id]["error"] = "No valid messages parsed from text files"
-             return
-             
-        # Limit lines if needed but keep high limit
-        if len(all_lines) > 5000:
-            analysis_lines = all_lines[-5000:]
-        else:
-            analysis_lines = all_lines
-            
-        jobs[job_id]["progress"] = 20
-        
-        # 2. Batch Inference
-        # Process in chunks to update progress smoothly
-        total_lines = len(analysis_lines)
-        chunk_size = 100
-        results = []
-        
-        for i in range(0, total_lines, chunk_size):
-            chunk = analysis_lines[i:i+chunk_size]
-            batch_results = predict_emotions_batch(chunk) # Synchronous batch call, but fast
-            results.extend(batch_results)
-            
-            # Progress from 20% to 90%
-            current_processed = i + len(chunk)
-            progress_percent = 20 + int((current_processed / total_lines) * 70)
-            jobs[job_id]["progress"] = progress_percent
-            
-            # No await sleep needed in sync threadpool execution unless explicitly yielding
-            # await asyncio.sleep(0)  
-
-        jobs[job_id]["progress"] = 90
-
-        # 3. Aggregate Results
-        emotions = [r["emotion"] for r in results if r and r.get("emotion") and r["emotion"] != "unknown"]
-        if not emotions:
-             jobs[job_id]["status"] = "failed"
-             jobs[job_id]["error"] = "No emotions detected in text"
-             return
-             
-        counts = Counter(emotions)
-        total = len(emotions)
-        distribution = {k: v/total for k, v in counts.items()}
-        
-        dominant_emotion = counts.most_common(1)[0][0]
-        
-        # Last meaningful message emotion
-        last_results = results[-5:]
-        last_emotions = [r["emotion"] for r in last_results if r and r.get("emotion")]
-        if last_emotions:
-            last_message_emotion = Counter(last_emotions).most_common(1)[0][0]
-        else:
-            last_message_emotion = "neutral"
-
-        # Generate Advice
-        advice = generate_advice(dominant_emotion, last_message_emotion)
-        
-        # Final Result Construction
-        final_result = {
-            "total_lines_analyzed": len(analysis_lines),
-            "dominant_emotion": dominant_emotion,
-            "last_message_emotion": last_message_emotion,
-            "distribution": distribution,
-            "advice": advice,
-            "recent_context": [
-                {"text": line, "emotion": res["emotion"]} 
-                for line, res in zip(analysis_lines[-5:], last_results) if res
-            ]
-        }
-        
-        jobs[job_id]["result"] = final_result
-        jobs[job_id]["status"] = "completed"
-        jobs[job_id]["progress"] = 100
-
-    except Exception as e:
-        print(f"Job {job_id} failed: {e}")
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
+# Jobs live in the `chat_jobs` table and are executed by a JobRunner, either
+# inline in the web process or in the standalone worker (`python -m worker`).
+# Structure: status "queued"|"processing"|"completed"|"failed"|"cancelled", progress: int, result: dict, error: str
 
 
 @router.post("/chat")
 async def analyze_chat_upload(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    persist: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
+    """
+    Queues a zipped chat export for analysis. With ?persist=true the analyzed
+    messages are also saved to the user's emotion history.
+    """
     if not file.filename.endswith(".zip"):
         raise HTTPException(status_code=400, detail="Only .zip files are allowed")
 
-    content = await file.read()
-    
+    # Stream the body to disk in chunks instead of buffering the whole zip
+    try:
+        spooled, size, content_hash = await spool_upload(file, settings.CHAT_UPLOAD_MAX_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
     job_id = str(uuid.uuid4())
-    jobs[job_id] = {
-        "status": "queued",
-        "progress": 0,
-        "submitted_at": datetime.utcnow()
-    }
-    
-    background_tasks.add_task(process_chat_job, job_id, content)
-    
-    return {"job_id": job_id}
+    with spooled:
+        # Same archive as before: answer from the stored analysis, no job run.
+        # Persisting still goes through a runner, which writes stored results.
+        if settings.CHAT_REUSE_ANALYSES and not persist:
+            previous = find_identical_analysis(db, current_user.id, content_hash)
+            if previous is not None:
+                result = {**previous.result, "reused_messages": previous.message_count}
+                record_reused_job(db, job_id, current_user.id, size, content_hash, result)
+                return {"job_id": job_id, "reused": True}
+
+        # The runner may live in another process or machine, so the upload is
+        # handed over through the database
+        enqueue_chat_job(db, job_id, current_user.id, spooled, size, content_hash, persist_history=persist)
+
+    return {"job_id": job_id, "reused": False}
 
 
 @router.get("/chat/status/{job_id}")
-async def get_chat_analysis_status(job_id: str, current_user: User = Depends(get_current_user)):
-    job = jobs.get(job_id)
-    if not job:
+def get_chat_analysis_status(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = get_chat_job(db, job_id)
+    if not job or job.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Job not found")
-        
+
     return {
-        "job_id": job_id,
-        "status": job["status"],
-        "progress": job.get("progress", 0),
-        "result": job.get("result"),
-        "error": job.get("error")
+        **job_snapshot(job),
+        "result": job.result
     }
+
+
+@router.post("/chat/cancel/{job_id}")
+def cancel_chat_analysis(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Cancels a queued job, or stops a running one after its current inference chunk."""
+    job = get_chat_job(db, job_id)
+    if not job or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    status = request_cancel(db, job_id)
+    if status not in ("cancelled", "cancelling"):
+        raise HTTPException(status_code=409, detail=f"Job already {status}")
+    return {"job_id": job_id, "status": status}
+
+
+@router.get("/chat/metrics")
+def chat_queue_metrics(
+    window_hours: int = 24,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Queue depth and queue-wait statistics per priority class, for the caller's own jobs."""
+    return queue_metrics(db, current_user.id, window_hours)
+
+
+@router.get("/chat/events/{job_id}")
+def stream_chat_analysis_events(
+    job_id: str,
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: Optional[int] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    header_token: Optional[str] = Depends(optional_oauth2_scheme)
+):
+    """
+    Server-Sent Events stream of a chat job's progress, stage and running
+    distribution. Authenticated once per connection; reconnecting clients
+    resume via the Last-Event-ID header (or ?last_event_id=).
+    """
+    # Short-lived session: a request-scoped one would stay checked out for
+    # the whole stream and a few open dashboards would drain the pool
+    db = SessionLocal()
+    try:
+        current_user = resolve_user(token or header_token, db)
+        job = get_chat_job(db, job_id)
+        if not job or job.user_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Job not found")
+        seq, snapshot = job.event_seq or 0, job_snapshot(job)
+    finally:
+        db.close()
+
+    resume_from = last_event_id or 0
+    if last_event_id_header and last_event_id_header.isdigit():
+        resume_from = int(last_event_id_header)
+
+    return StreamingResponse(
+        job_event_stream(request, job_id, seq, snapshot, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
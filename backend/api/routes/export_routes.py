@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+
+from api.deps import get_current_user
+from core.config import settings
+from db.database import SessionLocal
+from db.log_writer import flush_logs
+from db.models import User
+from analysis.log_export import EXPORT_COLUMNS, DEFAULT_COLUMNS, EXPORT_FORMATS, export_stream, arrow_available
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+SOURCES = {"all": ("text", "face"), "text": ("text",), "face": ("face",)}
+
+
+@router.get("/logs")
+def export_logs(
+    format: str = "csv",
+    source: str = "all",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    columns: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streams the user's text and face logs in [since, until) as chunked CSV,
+    NDJSON or an Arrow IPC stream. `columns` is a comma-separated subset of
+    id, timestamp, source, emotion, raw_emotion, confidence, text.
+
+    Rows are grouped by source (text, then face); within a source archived
+    months come first, then the database rows in time order. Archived months
+    are included, so the export covers the full history.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "arrow" and not arrow_available():
+        raise HTTPException(status_code=400, detail="Arrow export is not available on this server")
+    if source not in SOURCES:
+        raise HTTPException(status_code=400, detail="source must be one of: all, text, face")
+
+    selected = DEFAULT_COLUMNS
+    if columns:
+        selected = [c.strip() for c in columns.split(",") if c.strip()]
+        unknown = [c for c in selected if c not in EXPORT_COLUMNS]
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(EXPORT_COLUMNS)}"
+            )
+
+    flush_logs(current_user.id)
+    media_type, extension = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_stream(
+            SessionLocal, current_user.id, format, selected, since, until,
+            sources=SOURCES[source], batch_rows=settings.EXPORT_BATCH_ROWS
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="emotion_logs.{extension}"'}
+    )
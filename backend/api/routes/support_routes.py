@@ -1,10 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+import math
 
 from db.database import get_db
 from db.models import User, EmotionLog, FaceEmotionLog
 from api.deps import get_current_user
+from core.config import settings
+from core.http import http_client
 from analysis.fusion import analyze_fusion
 
 router = APIRouter(prefix="/support-insights", tags=["support"])
@@ -98,7 +101,6 @@ def fetch_nearby_places(lat, lon):
     try:
         # Overpass API
         # Find nodes with amenity=doctors, healthcare=psychotherapist, or amenity=clinic within 5000m
-        overpass_url = "https://overpass-api.de/api/interpreter"
         overpass_query = f"""
         [out:json];
         (
@@ -109,7 +111,7 @@ def fetch_nearby_places(lat, lon):
         out body;
         """
         
-        response = requests.get(overpass_url, params={'data': overpass_query}, timeout=10)
+        response = http_client("overpass").get(settings.OVERPASS_URL, params={'data': overpass_query})
         response.raise_for_status()
         data = response.json()
         
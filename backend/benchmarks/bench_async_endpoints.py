@@ -0,0 +1,140 @@
+"""
+Sync vs async request throughput for the read-heavy analytics queries.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_async_endpoints [--rows 100000] [--requests 2000]
+        [--concurrency 1 16 64] [--database-url URL]
+
+Seeds one user (see bench_emotion_aggregation), then serves the same query
+from two routes on a throwaway FastAPI app: a `def` route on the sync
+SessionLocal path (run in the threadpool) and an `async def` route on an
+AsyncSession. Each is hit with `requests` in-process HTTP requests at every
+concurrency level and requests/second is printed. Defaults to a throwaway
+SQLite file; pass the Postgres URL (sync form) to compare asyncpg with
+psycopg2.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from db.database import Base
+from db import models
+from db.async_database import async_url
+from db.migrations import run_migrations
+from db.rollup import rebuild_rollup
+from analysis.emotion_queries import emotion_counts_stmt, period_counts_stmt, counts_to_dict
+from benchmarks.bench_emotion_aggregation import seed, USER_ID
+
+from datetime import datetime, timedelta
+
+
+def build_app(sync_engine, async_engine) -> FastAPI:
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    def compare_stmt():
+        start_current = datetime.utcnow() - timedelta(days=7)
+        return period_counts_stmt(USER_ID, start_current - timedelta(days=7), start_current)
+
+    app = FastAPI()
+
+    @app.get("/sync/distribution")
+    def sync_distribution(db=Depends(get_db)):
+        return counts_to_dict(db.execute(emotion_counts_stmt(USER_ID)).all())
+
+    @app.get("/async/distribution")
+    async def async_distribution(db=Depends(get_async_db)):
+        return counts_to_dict((await db.execute(emotion_counts_stmt(USER_ID))).all())
+
+    @app.get("/sync/compare")
+    def sync_compare(db=Depends(get_db)):
+        return len(db.execute(compare_stmt()).all())
+
+    @app.get("/async/compare")
+    async def async_compare(db=Depends(get_async_db)):
+        return len((await db.execute(compare_stmt())).all())
+
+    return app
+
+
+async def hammer(app, path: str, requests: int, concurrency: int) -> float:
+    """Requests per second for `requests` GETs with `concurrency` in flight."""
+    transport = httpx.ASGITransport(app=app)
+    remaining = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path)
+                response.raise_for_status()
+
+        await client.get(path) # warm up pools and statement caches
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        return requests / (time.perf_counter() - start)
+
+
+async def run(app, args):
+    for endpoint in ("distribution", "compare"):
+        print(f"/{endpoint}")
+        print(f"  {'concurrency':>11} {'sync req/s':>12} {'async req/s':>12}")
+        for concurrency in args.concurrency:
+            sync_rps = await hammer(app, f"/sync/{endpoint}", args.requests, concurrency)
+            async_rps = await hammer(app, f"/async/{endpoint}", args.requests, concurrency)
+            print(f"  {concurrency:>11} {sync_rps:>12.0f} {async_rps:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    sync_engine = create_engine(url, pool_size=20, max_overflow=50)
+    async_engine = create_async_engine(async_url(url), pool_size=20, max_overflow=50)
+    Base.metadata.create_all(bind=sync_engine)
+    run_migrations(sync_engine)
+
+    try:
+        print(f"Seeding {args.rows:,} rows ...")
+        seed(sync_engine, args.rows)
+        with sync_engine.begin() as conn:
+            rebuild_rollup(conn)
+        asyncio.run(run(build_app(sync_engine, async_engine), args))
+    finally:
+        asyncio.run(async_engine.dispose())
+        sync_engine.dispose()
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Per-request authentication overhead, before and after the resolved-user cache.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_auth_overhead [--requests 3000] [--database-url URL]
+
+Serves a trivial endpoint from a throwaway FastAPI app behind three
+dependencies: none (baseline), the previous get_current_user (request
+session + user query on every call) and the cached get_current_user /
+get_current_user_async. Prints mean microseconds per request and the
+overhead over the baseline. DATABASE_URL is pointed at a throwaway SQLite
+file (or --database-url) before the app modules are imported.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+def build_app():
+    from fastapi import FastAPI, Depends
+    from sqlalchemy import select
+
+    from api.deps import get_db, oauth2_scheme, get_current_user, get_current_user_async, _token_email
+    from db.async_database import get_async_db
+    from db.models import User
+
+    def uncached_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
+        # get_current_user before the cache
+        return db.query(User).filter(User.email == _token_email(token)).first()
+
+    async def uncached_user_async(token: str = Depends(oauth2_scheme), db=Depends(get_async_db)):
+        return (await db.execute(select(User).where(User.email == _token_email(token)))).scalars().first()
+
+    app = FastAPI()
+
+    @app.get("/none")
+    def no_auth():
+        return 1
+
+    @app.get("/sync/before")
+    def sync_before(user=Depends(uncached_user)):
+        return user.id
+
+    @app.get("/sync/after")
+    def sync_after(user=Depends(get_current_user)):
+        return user.id
+
+    @app.get("/async/before")
+    async def async_before(user=Depends(uncached_user_async)):
+        return user.id
+
+    @app.get("/async/after")
+    async def async_after(user=Depends(get_current_user_async)):
+        return user.id
+
+    return app
+
+
+async def time_route(app, path: str, token: str, requests: int) -> float:
+    """Mean microseconds per sequential request."""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Authorization": f"Bearer {token}"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers) as client:
+        (await client.get(path)).raise_for_status() # warm up pools and the cache
+        start = time.perf_counter()
+        for _ in range(requests):
+            (await client.get(path)).raise_for_status()
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+async def run(app, token: str, requests: int):
+    baseline = await time_route(app, "/none", token, requests)
+    print(f"  {'route':<14} {'us/request':>11} {'auth us':>9}")
+    print(f"  {'no auth':<14} {baseline:>11.0f} {'-':>9}")
+    for path in ("/sync/before", "/sync/after", "/async/before", "/async/after"):
+        us = await time_route(app, path, token, requests)
+        print(f"  {path:<14} {us:>11.0f} {us - baseline:>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+
+    from datetime import timedelta
+    from sqlalchemy import insert, delete
+    from db.database import engine, Base
+    from db.async_database import async_engine
+    from db.models import User
+    from core.security import create_access_token
+
+    email = "bench-auth@example.com"
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(delete(User).where(User.email == email))
+        conn.execute(insert(User).values(email=email, hashed_password="x", is_active=True))
+    token = create_access_token({"sub": email}, timedelta(hours=1))
+
+    try:
+        print(f"{args.requests} sequential requests per route")
+        asyncio.run(run(build_app(), token, args.requests))
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(User).where(User.email == email))
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+        if path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    main()
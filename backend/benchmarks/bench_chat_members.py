@@ -0,0 +1,114 @@
+"""
+Sequential vs parallel parsing of multi-member chat archives.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_chat_members [--members 8] [--lines 50000] [--workers 4]
+
+Builds a deflated .zip with `--members` text files, each `--lines` lines of
+`datasets/WhatsApp Chat with Group Study.txt` repeated, and parses every
+member with:
+
+- sequential : analysis.chat_analysis.iter_archive_messages (what jobs run)
+- threads    : one member per thread, `--workers` threads (the removed
+               iter_members_parallel); zlib releases the GIL while inflating
+- processes  : one member per process, `--workers` processes, messages
+               pickled back to the job
+
+"inflate only" reads the members without parsing them: it is the share of
+the work threads could overlap at best. "unpickle only" loads the parsed
+messages the way the job process receives them from worker processes: it
+stays serial however many cores parse. Results depend on the core count,
+which is printed with them.
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from analysis.chat_analysis import iter_archive_messages
+from analysis.chat_ingest import text_members, iter_member_lines, READ_BLOCK_SIZE
+from analysis.chat_parser import parse_chat_lines
+from benchmarks.bench_chat_parser import DATASET, best_of
+
+
+def build_archive(path, members, lines_per_member):
+    with open(DATASET, encoding="utf-8") as f:
+        base = f.read().splitlines()
+    text = "\n".join((base * (lines_per_member // len(base) + 1))[:lines_per_member])
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for i in range(members):
+            zf.writestr(f"WhatsApp Chat {i}.txt", text)
+
+
+def inflate_only(path):
+    with zipfile.ZipFile(path) as zf:
+        total = 0
+        for name in text_members(zf):
+            with zf.open(name) as member:
+                while block := member.read(READ_BLOCK_SIZE):
+                    total += len(block)
+        return total
+
+
+def parse_member(path, name):
+    with zipfile.ZipFile(path) as zf:
+        return list(parse_chat_lines(iter_member_lines(zf, name)))
+
+
+def unpickle_only(payloads):
+    return sum(len(pickle.loads(payload)) for payload in payloads)
+
+
+def sequential(path):
+    with open(path, "rb") as f:
+        return sum(1 for _ in iter_archive_messages(f))
+
+
+def parallel(path, pool):
+    with zipfile.ZipFile(path) as zf:
+        names = text_members(zf)
+    # Results are consumed in member order, like the job loop does
+    return sum(len(messages) for messages in pool.map(parse_member, [path] * len(names), names))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--members", type=int, default=8)
+    parser.add_argument("--lines", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, "chat.zip")
+    try:
+        build_archive(path, args.members, args.lines)
+        inflate_time, _ = best_of(lambda: inflate_only(path), args.repeat)
+        seq_time, count = best_of(lambda: sequential(path), args.repeat)
+        with zipfile.ZipFile(path) as zf:
+            payloads = [pickle.dumps(parse_member(path, name)) for name in text_members(zf)]
+        unpickle_time, _ = best_of(lambda: unpickle_only(payloads), args.repeat)
+        with ThreadPoolExecutor(args.workers) as threads:
+            thread_time, thread_count = best_of(lambda: parallel(path, threads), args.repeat)
+        with ProcessPoolExecutor(args.workers) as processes:
+            parallel(path, processes)  # start the workers outside the timing
+            process_time, process_count = best_of(lambda: parallel(path, processes), args.repeat)
+        assert count == thread_count == process_count, (count, thread_count, process_count)
+
+        print(f"Input: {args.members} members x {args.lines:,} lines, {os.path.getsize(path) / 1e6:.1f} MB zipped, "
+              f"{count:,} messages; {os.cpu_count()} CPU(s), {args.workers} workers")
+        print(f"inflate only          : {inflate_time * 1000:8.1f} ms  ({inflate_time / seq_time:.0%} of sequential)")
+        print(f"unpickle only         : {unpickle_time * 1000:8.1f} ms  ({unpickle_time / seq_time:.0%} of sequential)")
+        for label, seconds in (("sequential", seq_time), ("threads", thread_time), ("processes", process_time)):
+            print(f"{label:<22}: {seconds * 1000:8.1f} ms  x{seq_time / seconds:.2f}")
+        print(f"sequential per message: {seq_time / count * 1e6:8.1f} us")
+    finally:
+        os.remove(path)
+        os.rmdir(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Chat export parser benchmark.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_chat_parser [--lines 100000]
+
+Repeats `datasets/WhatsApp Chat with Group Study.txt` up to the requested
+line count and compares the structured ChatParser against the legacy
+per-line `re.match` loop that used to live in process_chat_job.
+"""
+import argparse
+import os
+import re
+import time
+
+from analysis.chat_parser import parse_chat_lines
+
+DATASET = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "datasets", "WhatsApp Chat with Group Study.txt"
+)
+
+
+def legacy_parse(lines):
+    out = []
+    for l in lines:
+        l = l.strip()
+        if not l: continue
+        match = re.match(r'^.*? - .*?: (.*)$', l)
+        if match:
+            clean_l = match.group(1)
+            if "<Media omitted>" in clean_l: continue
+            out.append(clean_l)
+        else:
+            if "omitted" not in l and len(l) > 1:
+                out.append(l)
+    return out
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(DATASET, encoding="utf-8") as f:
+        base = f.read().splitlines()
+    lines = (base * (args.lines // len(base) + 1))[:args.lines]
+
+    legacy_time, legacy = best_of(lambda: legacy_parse(lines), args.repeat)
+    parser_time, messages = best_of(lambda: list(parse_chat_lines(lines)), args.repeat)
+
+    senders = {m.sender for m in messages}
+    print(f"Input: {len(lines):,} lines ({os.path.basename(DATASET)} repeated)")
+    print(f"legacy re.match loop : {legacy_time * 1000:8.1f} ms  -> {len(legacy):,} lines (no sender/timestamp)")
+    print(f"ChatParser           : {parser_time * 1000:8.1f} ms  -> {len(messages):,} messages, {len(senders)} senders")
+    print(f"throughput           : {len(lines) / parser_time:,.0f} lines/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Concurrent write throughput with and without the engine profile.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_concurrent_writers [--writers 4] [--rows 500]
+        [--readers 2] [--database-url URL]
+
+For each profile ("default": the old bare engine, "tuned": engine_options()
++ install_profile(), i.e. WAL, synchronous=NORMAL, busy_timeout and mmap on
+SQLite), `writers` threads each commit `rows` emotion logs one per
+transaction, as /predict does (rollup hook included), while `readers`
+threads keep running the dashboard distribution query. "write-behind" runs
+the tuned engine with the writers queueing rows on a LogWriter instead;
+its time includes the final flush, its latency is the time to queue a row.
+Prints rows/second, latency percentiles and "database is locked" failures.
+Defaults to a fresh SQLite file per profile.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from db.database import Base
+from db import models
+from db.models import User, EmotionLog
+from db.engine_profile import engine_options, install_profile, enable_wal
+from db.log_writer import LogWriter
+from core.emotions import code_of
+from db.migrations import run_migrations
+from analysis.emotion_queries import emotion_counts_stmt
+
+USER_ID = 1
+
+
+def make_engine(url: str, profile: str):
+    if profile == "default":
+        return create_engine(url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+    engine = create_engine(url, **engine_options(url))
+    install_profile(engine)
+    enable_wal(engine)
+    return engine
+
+
+def run_profile(url: str, profile: str, writers: int, rows: int, readers: int) -> dict:
+    engine = make_engine(url, profile)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=USER_ID, email="bench@example.com"))
+    Session = sessionmaker(bind=engine)
+    log_writer = None
+    if profile == "write-behind":
+        log_writer = LogWriter(engine=engine)
+        log_writer.start()
+
+    latencies, failures, reads = [], [0], [0]
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def writer(n):
+        mine, failed = [], 0
+        for i in range(rows):
+            start = time.perf_counter()
+            if log_writer is not None:
+                log_writer.submit(EmotionLog, {
+                    "user_id": USER_ID, "text": f"w{n}-{i}", "emotion": "happy", "emotion_code": code_of("happy"),
+                    "confidence": 0.5, "created_at": datetime.utcnow(), "source": "text"
+                })
+                mine.append(time.perf_counter() - start)
+                continue
+            db = Session()
+            try:
+                db.add(EmotionLog(user_id=USER_ID, text=f"w{n}-{i}", emotion="happy", confidence=0.5,
+                                  created_at=datetime.utcnow()))
+                db.commit()
+                mine.append(time.perf_counter() - start)
+            except OperationalError:
+                db.rollback()
+                failed += 1
+            finally:
+                db.close()
+        with lock:
+            latencies.extend(mine)
+            failures[0] += failed
+
+    def reader():
+        while not done.is_set():
+            db = Session()
+            try:
+                db.execute(emotion_counts_stmt(USER_ID)).all()
+                with lock:
+                    reads[0] += 1
+            except OperationalError:
+                pass
+            finally:
+                db.close()
+
+    reader_threads = [threading.Thread(target=reader) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for t in reader_threads:
+        t.start()
+    start = time.perf_counter()
+    for t in writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    if log_writer is not None:
+        log_writer.stop()
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in reader_threads:
+        t.join()
+    engine.dispose()
+
+    latencies.sort()
+    return {
+        "rows_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else None,
+        "failures": failures[0],
+        "reads_per_sec": reads[0] / elapsed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.rows} commits, {args.readers} readers")
+    print(f"  {'profile':<12} {'rows/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'locked':>7} {'reads/s':>8}")
+    for profile in ("default", "tuned", "write-behind"):
+        path = None
+        url = args.database_url
+        if url is None:
+            fd, path = tempfile.mkstemp(suffix=".db")
+            os.close(fd)
+            url = f"sqlite:///{path}"
+        try:
+            r = run_profile(url, profile, args.writers, args.rows, args.readers)
+        finally:
+            if path:
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+        print(f"  {profile:<12} {r['rows_per_sec']:>8.0f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['failures']:>7} {r['reads_per_sec']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
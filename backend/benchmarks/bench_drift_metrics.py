@@ -0,0 +1,100 @@
+"""
+Drift scoring: the per-window scipy loop vs the vectorized engine.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_drift_metrics [--windows 100000] [--emotions 8] [--loop-windows 5000]
+
+Builds a (windows x emotions) matrix of random counts (some windows empty)
+and times:
+  - the previous src/drift.py loop (DataFrame.iloc row pairs + scipy
+    jensenshannon), on the first `loop_windows` windows and extrapolated,
+  - analysis.drift_metrics.window_distances for JS alone and for all five
+    metrics, consecutive and against a baseline,
+  - adaptive_thresholds, global and trailing (mean/std and median/MAD).
+Checks the vectorized JS against scipy on the looped windows. scipy is
+only needed for the loop and the check.
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.drift_metrics import METRICS, window_distances, adaptive_thresholds
+
+try:
+    from scipy.spatial.distance import jensenshannon
+except ImportError:
+    jensenshannon = None
+
+
+def timed(call, repeat: int = 3):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def scipy_loop(distribution_df):
+    # src/drift.py before the engine
+    scores = []
+    for i in range(1, len(distribution_df)):
+        p = distribution_df.iloc[i - 1].values
+        q = distribution_df.iloc[i].values
+        scores.append(jensenshannon(p, q))
+    return np.array(scores)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--windows", type=int, default=100_000)
+    parser.add_argument("--emotions", type=int, default=8)
+    parser.add_argument("--loop-windows", type=int, default=5_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    counts = rng.poisson(rng.gamma(2.0, 3.0, size=(args.windows, args.emotions))).astype(np.float64)
+    counts[rng.random(args.windows) < 0.01] = 0  # windows with no events
+    frame = pd.DataFrame(counts)
+
+    print(f"{args.windows} windows x {args.emotions} emotions")
+    print(f"  {'step':<40} {'ms':>9} {'us/window':>10}")
+
+    def row(name, seconds, windows=args.windows):
+        print(f"  {name:<40} {seconds * 1000:>9.1f} {seconds / windows * 1e6:>10.3f}")
+
+    if jensenshannon is not None:
+        loop_frame = frame.iloc[:args.loop_windows]
+        with np.errstate(invalid="ignore"):
+            seconds, expected = timed(lambda: scipy_loop(loop_frame), repeat=1)
+        row(f"scipy loop, JS ({args.loop_windows} windows)", seconds, args.loop_windows)
+        row("scipy loop, JS (extrapolated)", seconds / args.loop_windows * args.windows)
+        actual = window_distances(counts[:args.loop_windows], metrics=("js",))["js"]
+        same_nan = np.array_equal(np.isnan(actual), np.isnan(expected))
+        print(f"  max |engine - scipy| = {np.nanmax(np.abs(actual - expected)):.2e}, NaN positions match: {same_nan}")
+    else:
+        print("  (scipy not installed: loop baseline skipped)")
+
+    seconds, scores = timed(lambda: window_distances(counts, metrics=("js",)))
+    row("engine, JS, consecutive", seconds)
+    seconds, _ = timed(lambda: window_distances(counts))
+    row(f"engine, {len(METRICS)} metrics, consecutive", seconds)
+    seconds, _ = timed(lambda: window_distances(counts, baseline=0))
+    row(f"engine, {len(METRICS)} metrics, vs baseline", seconds)
+
+    js = scores["js"]
+    for name, options in (
+        ("thresholds, global mean + std", {}),
+        ("thresholds, trailing 50 mean + std", {"lookback": 50}),
+        ("thresholds, global median + MAD", {"robust": True}),
+        ("thresholds, trailing 50 median + MAD", {"lookback": 50, "robust": True}),
+    ):
+        seconds, _ = timed(lambda: adaptive_thresholds(js, **options))
+        row(name, seconds)
+
+
+if __name__ == "__main__":
+    main()
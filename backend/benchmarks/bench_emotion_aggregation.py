@@ -0,0 +1,152 @@
+"""
+Dashboard aggregation benchmark: SQL GROUP BY vs loading ORM rows.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_emotion_aggregation [--rows 1000000] [--database-url URL]
+
+Seeds one user with `rows` emotion events (70% text, 30% face) spread over
+the last 30 days (bulk-inserted, then folded into the hourly rollup with
+rebuild_rollup), then times /visualization/distribution, /compare and
+get_emotion_stats against the legacy ORM-row versions and checks the results
+match. Defaults to a throwaway SQLite file.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from db.database import Base
+from db import models
+from db.models import User, EmotionLog, FaceEmotionLog
+from db.migrations import run_migrations
+from db.rollup import rebuild_rollup
+from analysis.drift import get_emotion_stats
+from analysis.emotion_queries import emotion_counts_stmt, period_counts_stmt, counts_to_dict
+from core.emotions import code_of, normalize
+
+RAW_EMOTIONS = ["happy", "joy", "sadness", "sad", "anger", "angry", "fear", "surprise", "neutral", "unknown"]
+USER_ID = 1
+
+
+def seed(engine, rows: int):
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(id=USER_ID, email="bench@example.com"))
+    batch = 10_000
+    for start in range(0, rows, batch):
+        text_rows, face_rows = [], []
+        for _ in range(min(batch, rows - start)):
+            ts = now - timedelta(seconds=rng.randint(0, 30 * 86400))
+            emotion = rng.choice(RAW_EMOTIONS)
+            row = {"user_id": USER_ID, "emotion": emotion, "emotion_code": code_of(emotion), "confidence": rng.random()}
+            if rng.random() < 0.7:
+                text_rows.append({**row, "text": "x", "created_at": ts})
+            else:
+                face_rows.append({**row, "timestamp": ts})
+        with engine.begin() as conn:
+            if text_rows:
+                conn.execute(insert(EmotionLog), text_rows)
+            if face_rows:
+                conn.execute(insert(FaceEmotionLog), face_rows)
+
+
+# -----------------------------
+# Legacy implementations (ORM rows + Counter on normalized labels)
+# -----------------------------
+def legacy_distribution(db):
+    text_logs = db.query(EmotionLog).filter(EmotionLog.user_id == USER_ID, EmotionLog.emotion != "unknown").all()
+    face_logs = db.query(FaceEmotionLog).filter(FaceEmotionLog.user_id == USER_ID, FaceEmotionLog.emotion != "unknown").all()
+    return dict(Counter(normalize(l.emotion) for l in text_logs + face_logs))
+
+
+def legacy_compare(db, start_prev, start_current):
+    current = db.query(EmotionLog).filter(EmotionLog.user_id == USER_ID, EmotionLog.created_at >= start_current).all()
+    prev = db.query(EmotionLog).filter(
+        EmotionLog.user_id == USER_ID, EmotionLog.created_at >= start_prev, EmotionLog.created_at < start_current
+    ).all()
+    return dict(Counter(normalize(l.emotion) for l in current)), dict(Counter(normalize(l.emotion) for l in prev))
+
+
+def legacy_stats(db, start, end):
+    logs = db.query(EmotionLog).filter(EmotionLog.user_id == USER_ID, EmotionLog.created_at.between(start, end)).all()
+    return dict(Counter(normalize(l.emotion) for l in logs)), len(logs)
+
+
+def sql_compare(db, start_prev, start_current):
+    counts = {"current": Counter(), "previous": Counter()}
+    for row in db.execute(period_counts_stmt(USER_ID, start_prev, start_current)).all():
+        counts[row.period][row.emotion] += row.count
+    return dict(counts["current"]), dict(counts["previous"])
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"  {label:<14} {time.perf_counter() - start:8.3f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    url = args.database_url
+    if url is None:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        url = f"sqlite:///{path}"
+
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    Session = sessionmaker(bind=engine)
+
+    try:
+        print(f"Seeding {args.rows:,} rows ...")
+        seed(engine, args.rows)
+        with engine.begin() as conn:
+            timed("rollup rebuild", lambda: rebuild_rollup(conn))
+        now = datetime.utcnow()
+        start_current = now - timedelta(days=7)
+        start_prev = start_current - timedelta(days=7)
+
+        db = Session()
+        try:
+            print("/visualization/distribution")
+            legacy = timed("legacy", lambda: legacy_distribution(db))
+            db.expunge_all()
+            sql = timed("sql", lambda: counts_to_dict(db.execute(emotion_counts_stmt(USER_ID)).all()))
+            assert legacy == sql, (legacy, sql)
+
+            print("/compare (7d)")
+            legacy = timed("legacy", lambda: legacy_compare(db, start_prev, start_current))
+            db.expunge_all()
+            sql = timed("sql", lambda: sql_compare(db, start_prev, start_current))
+            assert legacy == sql, (legacy, sql)
+
+            print("get_emotion_stats (30d)")
+            legacy = timed("legacy", lambda: legacy_stats(db, now - timedelta(days=30), now))
+            db.expunge_all()
+            stats = timed("sql", lambda: get_emotion_stats(db, USER_ID, now - timedelta(days=30), now))
+            assert legacy == (stats["distribution"], stats["total_logs"])
+            print("Results match.")
+        finally:
+            db.close()
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
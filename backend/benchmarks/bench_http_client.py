@@ -0,0 +1,120 @@
+"""
+Outbound HTTP client (core/http.py) against a local stub server.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_http_client [--requests 500] [--flaky-rate 0.3]
+
+Starts a keep-alive HTTP/1.1 stub on localhost and measures:
+  - latency of a fresh requests.get() per call (the old pattern) vs the
+    pooled HttpClient,
+  - success rate on an endpoint failing `flaky_rate` of the time, with and
+    without retries,
+  - time to give up on a dead upstream, before and after the circuit opens.
+The same stub can back the app: point GOOGLE_USERINFO_URL at
+http://127.0.0.1:<port>/userinfo to exercise /auth/google offline.
+"""
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from core.http import HttpClient, CircuitBreaker, UpstreamUnavailable
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    # One write per response: headers and body in separate segments stall
+    # keep-alive clients on Nagle + delayed ACK (~40 ms per request)
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+    flaky_rate = 0.0
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/down" or (path == "/flaky" and random.random() < self.flaky_rate):
+            self._send(503, {"error": "unavailable"})
+        elif path == "/userinfo":
+            self._send(200, {"email": "stub-user@example.com", "email_verified": True})
+        else:
+            self._send(200, {"ok": True})
+
+    def _send(self, status: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(flaky_rate: float):
+    StubHandler.flaky_rate = flaky_rate
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def latency_ms(call, requests_: int) -> tuple:
+    samples = []
+    for _ in range(requests_):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[int(len(samples) * 0.95)]
+
+
+def success_rate(client: HttpClient, url: str, requests_: int) -> float:
+    ok = 0
+    for _ in range(requests_):
+        try:
+            ok += client.get(url).status_code == 200
+        except UpstreamUnavailable:
+            pass
+    return ok / requests_
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--flaky-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server, base = start_stub(args.flaky_rate)
+    try:
+        pooled = HttpClient("bench")
+        fresh = latency_ms(lambda: requests.get(f"{base}/ok", timeout=10).json(), args.requests)
+        reused = latency_ms(lambda: pooled.get(f"{base}/ok").json(), args.requests)
+        print(f"{args.requests} sequential GETs")
+        print(f"  {'client':<22} {'mean ms':>8} {'p95 ms':>8}")
+        print(f"  {'requests.get (fresh)':<22} {fresh[0]:>8.2f} {fresh[1]:>8.2f}")
+        print(f"  {'HttpClient (pooled)':<22} {reused[0]:>8.2f} {reused[1]:>8.2f}")
+
+        no_retry = HttpClient("no-retry", retries=0, breaker=CircuitBreaker(10 ** 9, 0))
+        retrying = HttpClient("retry", backoff_base=0.01, breaker=CircuitBreaker(10 ** 9, 0))
+        print(f"Upstream failing {args.flaky_rate:.0%} of requests")
+        print(f"  without retries: {success_rate(no_retry, f'{base}/flaky', args.requests):.1%} succeeded")
+        print(f"  with {retrying.retries} retries:  {success_rate(retrying, f'{base}/flaky', args.requests):.1%} succeeded")
+
+        breaker = HttpClient("down", backoff_base=0.05, breaker=CircuitBreaker(3, 30))
+        print("Dead upstream (circuit opens after 3 failed calls)")
+        for i in range(5):
+            start = time.perf_counter()
+            try:
+                breaker.get(f"{base}/down")
+            except UpstreamUnavailable as e:
+                print(f"  call {i + 1}: {(time.perf_counter() - start) * 1000:6.1f} ms  {e}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
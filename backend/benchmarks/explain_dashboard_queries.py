@@ -0,0 +1,98 @@
+"""
+EXPLAIN check for the dashboard's hot queries.
+
+Usage (from the backend directory):
+    python -m benchmarks.explain_dashboard_queries [--database-url URL]
+
+Brings the database up to date (create_all + migrations), then prints the
+query plan of each per-user time-range query and checks it uses the
+composite (user_id, time) index. Exits non-zero if any plan does not.
+Defaults to an in-memory SQLite database; pass the production URL to check
+a real Postgres plan (sequential scans are disabled for the check, since
+the planner prefers them on near-empty tables).
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, select, text
+
+from db.database import Base
+from db import models
+from db.models import EmotionLog, FaceEmotionLog, DriftAlert
+from db.migrations import run_migrations
+
+
+def dashboard_queries(user_id: int, since: datetime) -> list:
+    """(label, statement, expected index) mirroring the dashboard endpoints."""
+    return [
+        (
+            "timeline: text logs in range",
+            select(EmotionLog).where(
+                EmotionLog.user_id == user_id, EmotionLog.created_at >= since, EmotionLog.emotion != "unknown"
+            ),
+            "ix_emotion_logs_user_created"
+        ),
+        (
+            "timeline: face logs in range",
+            select(FaceEmotionLog).where(
+                FaceEmotionLog.user_id == user_id, FaceEmotionLog.timestamp >= since, FaceEmotionLog.emotion != "unknown"
+            ),
+            "ix_face_emotion_logs_user_timestamp"
+        ),
+        (
+            "self-emotion history: face logs sorted",
+            select(FaceEmotionLog)
+            .where(FaceEmotionLog.user_id == user_id, FaceEmotionLog.timestamp >= since)
+            .order_by(FaceEmotionLog.timestamp.asc()),
+            "ix_face_emotion_logs_user_timestamp"
+        ),
+        (
+            "compare: text logs in window",
+            select(EmotionLog).where(
+                EmotionLog.user_id == user_id, EmotionLog.created_at >= since, EmotionLog.created_at < datetime.utcnow()
+            ),
+            "ix_emotion_logs_user_created"
+        ),
+        (
+            "alerts: latest first",
+            select(DriftAlert).where(DriftAlert.user_id == user_id).order_by(DriftAlert.created_at.desc()).limit(20),
+            "ix_drift_alerts_user_created"
+        ),
+    ]
+
+
+def explain(conn, stmt) -> str:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return "\n".join(row[-1] for row in rows)
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return "\n".join(row[0] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database-url", default="sqlite://")
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+
+    failures = 0
+    with engine.connect() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("SET enable_seqscan = off"))
+        for label, stmt, index in dashboard_queries(1, datetime.utcnow() - timedelta(days=7)):
+            plan = explain(conn, stmt)
+            ok = index in plan
+            failures += not ok
+            print(f"[{'ok' if ok else 'MISSING'}] {label} (expects {index})")
+            print("    " + plan.replace("\n", "\n    "))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,10 +9,98 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "dummy_secret_key_change_me_in_prod"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440 # 24 hours
+    AUTH_USER_CACHE_TTL: float = 60.0 # seconds a resolved user is reused without a query; 0 disables
+    AUTH_USER_CACHE_SIZE: int = 1024
+    # Password hashing runs in a process pool per web process
+    BCRYPT_ROUNDS: int = 12 # cost factor for new hashes; older hashes are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 1 # 0 hashes on the request thread pool instead
+    PASSWORD_HASH_MAX_PENDING: int = 8 # queued + running hashes before /auth answers 429
     
     # DATABASE
     DATABASE_URL: str = "sqlite:///./storage/emotion.db"
+    ASYNC_DATABASE_URL: str = "" # empty derives it from DATABASE_URL (aiosqlite / asyncpg)
+    # SQLite profile (PRAGMAs applied on every new connection; WAL once, by init_db)
+    DB_SQLITE_WAL: bool = True # journal_mode=WAL + synchronous=NORMAL
+    DB_SQLITE_BUSY_TIMEOUT_MS: int = 5000 # wait this long for the write lock before "database is locked"
+    DB_SQLITE_MMAP_BYTES: int = 256 * 1024 * 1024
+    # Postgres profile (per engine; the web app has a sync and an async engine per process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_RECYCLE: int = 1800 # seconds; replaces connections before server/proxy idle cutoffs
+    DB_STATEMENT_TIMEOUT_MS: int = 30000 # 0 disables; migrations run without it
+
+    # WRITE-BEHIND LOG WRITER (/predict, /self-emotion/capture)
+    # Off: one commit per request. On: rows are queued and committed in
+    # batches; read-your-writes holds within a process (dashboard reads flush first).
+    LOG_WRITE_BEHIND: bool = False
+    LOG_WRITER_BATCH_SIZE: int = 200 # rows per transaction; a full batch flushes immediately
+    LOG_WRITER_FLUSH_MS: int = 200 # max time a row waits in memory
+    LOG_WRITER_MAX_QUEUE: int = 10000
+    LOG_WRITER_BLOCK_SECONDS: float = 2.0 # producers wait this long on a full queue, then get 503
     
+    # CHAT ANALYSIS JOBS
+    # "inline" runs the job runner inside the web process,
+    # "external" only enqueues and leaves the work to `python -m worker`.
+    CHAT_WORKER_MODE: str = "inline"
+    CHAT_UPLOAD_CHUNK_SIZE: int = 1024 * 1024 # bytes per stored upload chunk
+    CHAT_UPLOAD_MAX_BYTES: int = 200 * 1024 * 1024
+    CHAT_TIMELINE_BUCKET: str = "week" # "day" | "week" | "month"
+    CHAT_MAX_MESSAGES: int = 0 # 0 streams the whole chat; N > 0 analyzes only the last N messages
+    CHAT_REUSE_ANALYSES: bool = True # skip re-uploads, analyze only messages appended since the last upload
+    CHAT_INTERACTIVE_MAX_BYTES: int = 5 * 1024 * 1024 # larger uploads are scheduled as "bulk"
+    CHAT_BULK_AGING_SECONDS: int = 600 # bulk jobs waiting this long compete as interactive
+    WORKER_CONCURRENCY: int = 2
+    WORKER_POLL_INTERVAL: float = 1.0 # seconds between queue polls when idle
+    WORKER_HEARTBEAT_TIMEOUT: int = 60 # seconds before a claimed job counts as abandoned
+    WORKER_MAX_ATTEMPTS: int = 3
+    WORKER_SHUTDOWN_GRACE: float = 30.0 # seconds to let running jobs finish on shutdown
+    WORKER_TORCH_THREADS: int = 0 # 0 keeps the torch default
+
+    # CHAT JOB PROGRESS STREAM (SSE)
+    SSE_POLL_INTERVAL: float = 1.0 # one job-table query per interval for all open streams
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    SSE_RETRY_MS: int = 3000
+
+    # DASHBOARD TIMELINES
+    TIMELINE_MAX_POINTS: int = 1000 # upper bound on points per timeline/history response
+
+    # COLD STORAGE (python -m db.archive, or the job runner every ARCHIVE_INTERVAL_HOURS)
+    # Whole months of logs older than ARCHIVE_AFTER_DAYS move to per-user, per-month
+    # Parquet files; the rollup keeps their counts. 0 disables the periodic job.
+    ARCHIVE_AFTER_DAYS: int = 0
+    ARCHIVE_INTERVAL_HOURS: float = 24.0
+    ARCHIVE_DIR: str = "./storage/archive"
+    ARCHIVE_COMPRESSION: str = "zstd"
+    ARCHIVE_BATCH_ROWS: int = 5000 # rows fetched (server-side cursor) and written per Parquet row group
+
+    # LOG EXPORT (/export/logs)
+    EXPORT_BATCH_ROWS: int = 5000 # rows fetched (server-side cursor) and serialized per chunk
+
+    # INCREMENTAL DRIFT (db/drift_state.py)
+    DRIFT_RECENT_CAPACITY: int = 50 # newest events kept per user; /drift windows up to this size skip the log tables
+
+    # DRIFT MONITOR (worker/drift_monitor.py; runs in the standalone job runner, writes drift_alerts)
+    DRIFT_MONITOR_INTERVAL: float = 5.0 # seconds between checks of drift_states for new events; 0 disables the monitor
+    DRIFT_MONITOR_INLINE: bool = False # also run it in inline-mode web processes (one monitor per web worker)
+    DRIFT_MONITOR_WINDOW: int = 10 # newest events compared with the rest of the history (<= DRIFT_RECENT_CAPACITY)
+    DRIFT_MONITOR_BATCH_SIZE: int = 500 # users claimed and evaluated per transaction
+    DRIFT_MONITOR_WORKERS: int = 2 # batches evaluated in parallel
+    DRIFT_ALERT_COOLDOWN_MINUTES: float = 360.0 # no repeat alert for the same user and shift within this time
+
+    # OUTBOUND HTTP (core/http.py; one pooled client per upstream and process)
+    HTTP_CONNECT_TIMEOUT: float = 3.0
+    HTTP_READ_TIMEOUT: float = 10.0
+    HTTP_MAX_RETRIES: int = 2 # extra attempts for idempotent requests on connection errors, timeouts, 429/5xx
+    HTTP_BACKOFF_BASE: float = 0.2 # seconds; full jitter, doubling per attempt
+    HTTP_BACKOFF_MAX: float = 2.0
+    HTTP_POOL_SIZE: int = 10 # keep-alive connections per upstream
+    HTTP_BREAKER_FAILURES: int = 5 # consecutive failed calls before the circuit opens
+    HTTP_BREAKER_RESET_SECONDS: float = 30.0 # open time before a probe call is let through
+    GOOGLE_USERINFO_URL: str = "https://www.googleapis.com/oauth2/v3/userinfo"
+    GOOGLE_TOKEN_CACHE_TTL: float = 300.0 # seconds a verified access token maps to its user info; 0 disables
+    GOOGLE_TOKEN_CACHE_SIZE: int = 1024
+    OVERPASS_URL: str = "https://overpass-api.de/api/interpreter"
+
     # CORS
     CORS_ORIGINS: List[str] = [
         "http://localhost:5173",
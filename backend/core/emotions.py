@@ -0,0 +1,37 @@
+# Canonical emotion labels. A label's position is its code, stored in the
+# emotion_code columns, the rollup and chat_message_results, so labels may
+# only ever be appended.
+EMOTIONS = ("unknown", "neutral", "happy", "sadness", "anger", "fear", "surprise", "love")
+UNKNOWN = 0
+
+# Raw labels that differ between the text model, the face model and old rows
+ALIASES = {
+    "angry": "anger",
+    "disgust": "anger",
+    "sad": "sadness",
+    "joy": "happy",
+    "happines": "happy"
+}
+
+CODE_OF = {label: code for code, label in enumerate(EMOTIONS)}
+CODE_OF.update({raw: CODE_OF[label] for raw, label in ALIASES.items()})
+
+NEGATIVE = frozenset(CODE_OF[e] for e in ("sadness", "anger", "fear"))
+
+
+def code_of(raw) -> int:
+    """Code for a raw model label (case-insensitive, aliases resolved); unknown labels map to 0."""
+    if not raw:
+        return UNKNOWN
+    return CODE_OF.get(raw.strip().lower(), UNKNOWN)
+
+
+def label_of(code) -> str:
+    if code is None or not 0 <= code < len(EMOTIONS):
+        return EMOTIONS[UNKNOWN]
+    return EMOTIONS[code]
+
+
+def normalize(raw) -> str:
+    """Canonical label for a raw model label."""
+    return EMOTIONS[code_of(raw)]
@@ -0,0 +1,153 @@
+"""
+Outbound HTTP for third-party APIs (Google userinfo, Overpass).
+
+One HttpClient per upstream and process keeps a pooled keep-alive
+requests.Session, bounded timeouts, retries with full jitter for transient
+failures, and a circuit breaker that fails fast while the upstream is down.
+Upstream URLs come from settings, so a local stub server can stand in for
+them.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.config import settings
+
+# Statuses worth retrying: throttling and gateway / availability errors
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamUnavailable(requests.RequestException):
+    """The upstream is failing (retries exhausted) or its circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed: calls pass. After `failure_threshold` consecutive failed calls
+    the circuit opens and calls are refused for `reset_seconds`; then one
+    probe call is let through (half-open) and its outcome closes or re-opens
+    the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if self._probing else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class HttpClient:
+    """
+    Pooled client for one upstream.
+
+    request() retries connection errors, timeouts and RETRY_STATUSES up to
+    `retries` times (idempotent methods only), sleeping a random time in
+    [0, min(backoff_max, backoff_base * 2**attempt)] between attempts. Other
+    responses, 4xx included, are returned for the caller to check.
+
+    Raises:
+        UpstreamUnavailable: The circuit is open, or every attempt failed.
+    """
+
+    def __init__(self, name: str, timeout: tuple = None, retries: int = None, backoff_base: float = None,
+                 backoff_max: float = None, pool_size: int = None, breaker: CircuitBreaker = None):
+        self.name = name
+        self.timeout = timeout or (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+        self.retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+        self.backoff_base = settings.HTTP_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.HTTP_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.breaker = breaker or CircuitBreaker(settings.HTTP_BREAKER_FAILURES, settings.HTTP_BREAKER_RESET_SECONDS)
+
+        pool_size = pool_size or settings.HTTP_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            raise UpstreamUnavailable(f"{self.name}: circuit open")
+
+        kwargs.setdefault("timeout", self.timeout)
+        attempts = 1 + (self.retries if method.upper() in ("GET", "HEAD", "OPTIONS") else 0)
+        error = None
+        for attempt in range(attempts):
+            if attempt:
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1))))
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                continue
+            if response.status_code in RETRY_STATUSES:
+                error = f"HTTP {response.status_code}"
+                response.close()
+                continue
+            self.breaker.record_success()
+            return response
+
+        self.breaker.record_failure()
+        raise UpstreamUnavailable(f"{self.name}: {error} after {attempts} attempt(s)")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+# -----------------------------
+# Process-wide clients
+# -----------------------------
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def http_client(name: str, **options) -> HttpClient:
+    """The shared client for upstream `name`, created with `options` on first use."""
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = HttpClient(name, **options)
+        return client
+
+
+def close_http_clients():
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
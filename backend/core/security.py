@@ -1,7 +1,12 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
+import asyncio
 import bcrypt
+import multiprocessing
+import threading
 
 from core.config import settings
 
@@ -18,10 +23,109 @@ def verify_password(plain_password, hashed_password):
         hashed_password = hashed_password.encode('utf-8')
     return bcrypt.checkpw(plain_password, hashed_password)
 
-def get_password_hash(password):
+def get_password_hash(password, rounds: int = None):
     if isinstance(password, str):
         password = password.encode('utf-8')
-    return bcrypt.hashpw(password, bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds or settings.BCRYPT_ROUNDS)).decode('utf-8')
+
+def password_needs_rehash(hashed_password) -> bool:
+    """True when the hash was made with a cost factor other than BCRYPT_ROUNDS."""
+    if isinstance(hashed_password, bytes):
+        hashed_password = hashed_password.decode('utf-8')
+    parts = (hashed_password or "").split("$")
+    return len(parts) < 4 or not parts[2].isdigit() or int(parts[2]) != settings.BCRYPT_ROUNDS
+
+
+# -----------------------------
+# Password hashing pool
+# -----------------------------
+# bcrypt is ~100+ ms of CPU per call. Request handlers await these wrappers
+# instead: the work runs in a small process pool, off the request threads
+# and the GIL, and admission is capped so a login burst gets fast 429s
+# instead of an ever-growing queue.
+class PasswordHashBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashes are already queued or running (map to 429)."""
+
+
+_pool = None
+_pending = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # spawn: forking the web process would copy the loaded model and its threads
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+
+def _release(_future=None):
+    global _pending
+    with _pool_lock:
+        _pending -= 1
+
+
+async def _run_hash(fn, *args):
+    global _pending
+    with _pool_lock:
+        if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHashBusy(f"{_pending} password hashes in progress")
+        _pending += 1
+
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        # No pool: hash on the default thread pool, still behind admission control
+        try:
+            return await asyncio.to_thread(fn, *args)
+        finally:
+            _release()
+
+    with _pool_lock:
+        pool = _get_pool()
+    try:
+        future = pool.submit(fn, *args)
+    except BrokenProcessPool:
+        _release()
+        _discard(pool)
+        raise
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool:
+        _discard(pool)
+        raise
+
+
+def _discard(pool):
+    # A dead worker breaks the whole executor; later calls start a fresh one
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """verify_password() on the hashing pool. Raises PasswordHashBusy when saturated."""
+    return await _run_hash(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password) -> str:
+    """get_password_hash() at BCRYPT_ROUNDS on the hashing pool. Raises PasswordHashBusy when saturated."""
+    return await _run_hash(get_password_hash, password, settings.BCRYPT_ROUNDS)
+
+
+def stop_password_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
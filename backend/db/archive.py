@@ -0,0 +1,331 @@
+"""
+Cold storage for old emotion logs.
+
+Usage (from the backend directory):
+    python -m db.archive [--older-than-days N] [--user-id ID]
+
+Whole months of emotion_logs / face_emotion_logs rows older than
+ARCHIVE_AFTER_DAYS are written to compressed Parquet files under
+ARCHIVE_DIR (user_<id>/<table>/<YYYY-MM>-<part>.parquet) and deleted from
+the database. Their counts stay in emotion_rollups, so aggregate queries
+never need the files; raw-event reads (timelines, /drift) merge them back
+in through archived_events() when a range reaches past the hot window.
+
+Imported chat messages (source="chat") stay in the database: their
+source_key is what keeps chat imports idempotent.
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from heapq import nlargest
+from itertools import groupby, repeat
+
+from sqlalchemy import select, insert, delete, func, or_
+
+from core.config import settings
+from core.emotions import UNKNOWN
+from db.database import engine as default_engine
+from db.models import EmotionLog, FaceEmotionLog, LogArchive
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Log table -> (model, timestamp column, event source)
+ARCHIVED_TABLES = {
+    "emotion_logs": (EmotionLog, EmotionLog.created_at, "text"),
+    "face_emotion_logs": (FaceEmotionLog, FaceEmotionLog.timestamp, "face"),
+}
+SOURCE_TABLES = {"text": "emotion_logs", "face": "face_emotion_logs"}
+
+# Ids per DELETE ... WHERE id IN (...)
+DELETE_CHUNK = 500
+
+
+def _require_pyarrow():
+    if pq is None:
+        raise RuntimeError("pyarrow is required to read or write log archives (pip install pyarrow)")
+
+
+def month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def next_month(ts: datetime) -> datetime:
+    return datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+
+
+def _columns(table: str) -> list:
+    model, ts_column, _ = ARCHIVED_TABLES[table]
+    columns = [model.id, ts_column.label("ts"), model.emotion, model.emotion_code, model.confidence]
+    if model is EmotionLog:
+        columns += [EmotionLog.text, EmotionLog.source, EmotionLog.source_key]
+    return columns
+
+
+def _schema(table: str):
+    fields = [
+        ("id", pa.int64()),
+        ("ts", pa.timestamp("us")),
+        ("emotion", pa.string()),
+        ("emotion_code", pa.int16()),
+        ("confidence", pa.float64()),
+    ]
+    if table == "emotion_logs":
+        fields += [("text", pa.string()), ("source", pa.string()), ("source_key", pa.string())]
+    return pa.schema(fields)
+
+
+def _archivable(table: str, before: datetime, user_id: int = None) -> list:
+    model, ts_column, _ = ARCHIVED_TABLES[table]
+    where = [ts_column < before, model.user_id.isnot(None)]
+    if user_id is not None:
+        where.append(model.user_id == user_id)
+    if model is EmotionLog:
+        where.append(or_(EmotionLog.source.is_(None), EmotionLog.source != "chat"))
+    return where
+
+
+# -----------------------------
+# Archival job
+# -----------------------------
+def archive_logs(older_than_days: int = None, user_id: int = None, now: datetime = None, engine=None) -> list:
+    """
+    Moves every whole month that ended `older_than_days` (default
+    ARCHIVE_AFTER_DAYS) before `now` into Parquet, one part per user, table
+    and month. Rows that reach an already archived month later (late writes)
+    end up in an extra part on the next run.
+
+    Returns:
+        One dict per part written (user_id, source_table, period_start, path, row_count).
+    """
+    _require_pyarrow()
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    if days <= 0:
+        raise ValueError("older_than_days must be positive")
+    engine = engine or default_engine
+    cutoff = month_start((now or datetime.utcnow()) - timedelta(days=days))
+
+    written = []
+    for table, (model, ts_column, _) in ARCHIVED_TABLES.items():
+        with engine.connect() as conn:
+            firsts = conn.execute(
+                select(model.user_id, func.min(ts_column))
+                .where(*_archivable(table, cutoff, user_id))
+                .group_by(model.user_id)
+            ).all()
+        for uid, first in firsts:
+            month = month_start(first)
+            while month < cutoff:
+                part = _archive_month(engine, table, uid, month)
+                if part:
+                    written.append(part)
+                month = next_month(month)
+    return written
+
+
+def _archive_month(engine, table: str, user_id: int, month: datetime):
+    model, ts_column, _ = ARCHIVED_TABLES[table]
+    end = next_month(month)
+    relpath = os.path.join(f"user_{user_id}", table, f"{month:%Y-%m}-{uuid.uuid4().hex[:8]}.parquet")
+    path = os.path.join(settings.ARCHIVE_DIR, relpath)
+    schema = _schema(table)
+
+    # Rows stream from a server-side cursor into one Parquet row group per
+    # batch, so memory follows ARCHIVE_BATCH_ROWS rather than the month's size
+    ids, writer = [], None
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(
+                select(*_columns(table))
+                .where(*_archivable(table, end, user_id), ts_column >= month)
+                .order_by(ts_column)
+                .execution_options(yield_per=settings.ARCHIVE_BATCH_ROWS)
+            )
+            for rows in result.partitions():
+                if writer is None:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    writer = pq.ParquetWriter(path, schema, compression=settings.ARCHIVE_COMPRESSION)
+                writer.write_table(pa.Table.from_arrays(
+                    [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema
+                ))
+                ids.extend(row.id for row in rows)
+        if writer is None:
+            return None
+        writer.close()
+
+        part = {
+            "user_id": user_id, "source_table": table, "period_start": month, "period_end": end,
+            "path": relpath, "row_count": len(ids)
+        }
+        # Catalog the file and drop its rows together. Core deletes skip the
+        # ORM rollup hook, so the archived counts stay in the rollup.
+        with engine.begin() as conn:
+            conn.execute(insert(LogArchive).values(**part))
+            deleted = 0
+            for i in range(0, len(ids), DELETE_CHUNK):
+                deleted += conn.execute(delete(model).where(model.id.in_(ids[i:i + DELETE_CHUNK]))).rowcount
+            if deleted != len(ids):
+                # Another archiver got here first; its part already holds these rows
+                raise RuntimeError(f"{table} rows for user {user_id}, {month:%Y-%m} changed during archival")
+    except Exception:
+        if writer is not None:
+            writer.close()
+            os.remove(path)
+        raise
+    return part
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def archive_parts_stmt(user_id, since=None, until=None, sources=("text", "face")):
+    """(source_table, path) of the user's parts overlapping [since, until)."""
+    stmt = select(LogArchive.source_table, LogArchive.path).where(
+        LogArchive.user_id == user_id,
+        LogArchive.source_table.in_([SOURCE_TABLES[s] for s in sources])
+    )
+    if since is not None:
+        stmt = stmt.where(LogArchive.period_end > since)
+    if until is not None:
+        stmt = stmt.where(LogArchive.period_start < until)
+    return stmt.order_by(LogArchive.period_start)
+
+
+def archive_horizon_stmt(user_id):
+    """End of the user's latest archived month (NULL without archives)."""
+    return select(func.max(LogArchive.period_end)).where(LogArchive.user_id == user_id)
+
+
+def read_parts(parts, since=None, until=None, exclude_unknown=True) -> list:
+    """
+    (emotion_code, confidence, ts, source) tuples, the row shape of
+    emotion_events(), from archive parts. Files are memory-mapped, only
+    these columns are decoded, and the range filter is checked against
+    row-group statistics before anything is read.
+    """
+    if not parts:
+        return []
+    _require_pyarrow()
+    filters = []
+    if since is not None:
+        filters.append(("ts", ">=", since))
+    if until is not None:
+        filters.append(("ts", "<", until))
+    if exclude_unknown:
+        filters.append(("emotion_code", "!=", UNKNOWN))
+
+    events = []
+    for table, relpath in parts:
+        data = pq.read_table(
+            os.path.join(settings.ARCHIVE_DIR, relpath),
+            columns=["emotion_code", "confidence", "ts"],
+            filters=filters or None,
+            memory_map=True
+        )
+        events.extend(zip(
+            data["emotion_code"].to_pylist(),
+            data["confidence"].to_pylist(),
+            data["ts"].to_pylist(),
+            repeat(ARCHIVED_TABLES[table][2])
+        ))
+    return events
+
+
+def archived_events(db, user_id, since=None, until=None, sources=("text", "face"), exclude_unknown=True) -> list:
+    """Archived events in [since, until) for a sync Session; one catalog query when nothing is archived."""
+    parts = db.execute(archive_parts_stmt(user_id, since, until, sources)).all()
+    return read_parts(parts, since, until, exclude_unknown)
+
+
+async def archived_events_async(db, user_id, since=None, until=None, sources=("text", "face"),
+                                exclude_unknown=True) -> list:
+    """archived_events() for an AsyncSession; the file scan runs off the event loop."""
+    parts = (await db.execute(archive_parts_stmt(user_id, since, until, sources))).all()
+    if not parts:
+        return []
+    return await asyncio.to_thread(read_parts, parts, since, until, exclude_unknown)
+
+
+def newest_archived_events(conn, user_id: int, limit: int) -> list:
+    """
+    The user's newest `limit` archived events (unknown emotions excluded),
+    as read_parts() tuples. Parts are read newest month first, and reading
+    stops at the first month that completes the count: every older month
+    only holds older events.
+    """
+    parts = conn.execute(
+        select(LogArchive.period_start, LogArchive.source_table, LogArchive.path)
+        .where(LogArchive.user_id == user_id)
+        .order_by(LogArchive.period_start.desc())
+    ).all()
+    events = []
+    for _, month in groupby(parts, key=lambda part: part.period_start):
+        events.extend(read_parts([(part.source_table, part.path) for part in month]))
+        if len(events) >= limit:
+            break
+    return nlargest(limit, events, key=lambda event: event[2])
+
+
+def iter_part_rows(table: str, relpath: str, since=None, until=None, batch_rows: int = 5000):
+    """
+    Lists of (id, ts, source, emotion_code, emotion, confidence, text) rows
+    from one archive part in [since, until), decoded `batch_rows` at a time
+    so memory follows the batch size rather than the file size.
+    """
+    _require_pyarrow()
+    default_source = ARCHIVED_TABLES[table][2]
+    parquet = pq.ParquetFile(os.path.join(settings.ARCHIVE_DIR, relpath), memory_map=True)
+    for batch in parquet.iter_batches(batch_size=batch_rows):
+        data = batch.to_pydict()
+        rows = [
+            (row_id, ts, source or default_source, code, emotion, confidence, text)
+            for row_id, ts, source, code, emotion, confidence, text in zip(
+                data["id"], data["ts"], data.get("source", repeat(None)), data["emotion_code"],
+                data["emotion"], data["confidence"], data.get("text", repeat(None))
+            )
+            if (since is None or ts >= since) and (until is None or ts < until)
+        ]
+        if rows:
+            yield rows
+
+
+def archived_rollup_events(conn, user_id: int = None):
+    """Archived rows as db.rollup.apply_events() events, for rebuilding the rollup."""
+    stmt = select(LogArchive.user_id, LogArchive.source_table, LogArchive.path)
+    if user_id is not None:
+        stmt = stmt.where(LogArchive.user_id == user_id)
+    for uid, table, relpath in conn.execute(stmt).all():
+        _require_pyarrow()
+        columns = ["ts", "emotion_code", "confidence"] + (["source"] if table == "emotion_logs" else [])
+        data = pq.read_table(os.path.join(settings.ARCHIVE_DIR, relpath), columns=columns, memory_map=True)
+        sources = data["source"].to_pylist() if table == "emotion_logs" else repeat("face")
+        for ts, code, confidence, source in zip(
+            data["ts"].to_pylist(), data["emotion_code"].to_pylist(), data["confidence"].to_pylist(), sources
+        ):
+            yield uid, ts, source or "text", code, confidence, 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old emotion logs to Parquet")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS or None)
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    if not args.older_than_days:
+        parser.error("--older-than-days is required when ARCHIVE_AFTER_DAYS is 0")
+
+    from db.init_db import init_db
+    init_db()
+    parts = archive_logs(args.older_than_days, args.user_id)
+    for part in parts:
+        print(f"user {part['user_id']} {part['source_table']} {part['period_start']:%Y-%m}: "
+              f"{part['row_count']} rows -> {part['path']}")
+    print(f"Archived {sum(p['row_count'] for p in parts)} rows into {len(parts)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from core.config import settings
+from db.engine_profile import engine_options, install_profile
+
+# Async drivers for the sync URLs used elsewhere (aiosqlite locally, asyncpg on Render)
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """Rewrites a sync database URL to the matching async driver."""
+    parsed = make_url(url.replace("postgres://", "postgresql://", 1))
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend!r} database URLs")
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    if backend != "sqlite" and "sslmode" in parsed.query:
+        # asyncpg takes ssl=..., not libpq's sslmode=...
+        parsed = parsed.update_query_dict({"ssl": parsed.query["sslmode"]}).difference_update_query(["sslmode"])
+    return parsed.render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_url(settings.DATABASE_URL)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, is_async=True))
+install_profile(async_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+# -----------------------------
+# FastAPI DB Dependency
+# -----------------------------
+async def get_async_db():
+    """Request-scoped AsyncSession; closed (and its connection returned) even when the handler raises."""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -2,14 +2,13 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from core.config import settings
+from db.engine_profile import engine_options, install_profile
 
 # Correct, explicit path
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+install_profile(engine)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -0,0 +1,257 @@
+"""
+Incremental /drift state.
+
+Usage (from the backend directory):
+    python -m db.drift_state [--user-id ID]     # rebuild from the logs
+
+/drift compares a user's newest `window` events with everything before
+them. Instead of reading the logs per request, drift_states keeps one row
+per user: the newest DRIFT_RECENT_CAPACITY (timestamp, emotion code) pairs
+and per-emotion counts of every older event. Each written log moves at most
+one event from the recent list into the reference counts, inside the
+write's own transaction, so every web and worker process reads the same
+row. Any window up to the number of recent events is answered from that
+row alone.
+
+Rows can always be rebuilt from emotion_rollups (reference counts, archived
+months included) plus the newest raw events.
+"""
+import argparse
+import bisect
+import calendar
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import event, select, insert, update, delete, func, bindparam
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from core.config import settings
+from core.emotions import EMOTIONS, UNKNOWN, label_of
+from db.models import User, DriftState, EmotionRollup
+# Module import: db.rollup is still initializing when it imports db.models,
+# which imports this module
+from db import rollup
+
+
+def _seconds(ts: datetime) -> float:
+    # Same naive-as-UTC reading as db.rollup.hour_of
+    return calendar.timegm(ts.timetuple()) + ts.microsecond / 1e6
+
+
+class DriftCounts:
+    """
+    In-memory copy of one drift_states row.
+
+    Invariant: every event counted in `reference` is no newer than
+    `boundary`, and every event in `recent` is no older than it, so
+    `recent` is always the newest len(recent) events of the user.
+    """
+
+    def __init__(self, reference=None, recent=None, boundary=None):
+        self.reference = list(reference or ()) + [0] * (len(EMOTIONS) - len(reference or ()))
+        self.recent = [list(item) for item in recent or ()]
+        self.boundary = boundary
+
+    @classmethod
+    def from_row(cls, row) -> "DriftCounts":
+        return cls(row.reference_counts, row.recent, row.boundary)
+
+    def to_values(self) -> dict:
+        return {
+            "reference_counts": self.reference,
+            "recent": self.recent,
+            "boundary": self.boundary,
+            "updated_at": datetime.utcnow()
+        }
+
+    def add(self, seconds: float, code: int, capacity: int):
+        if self.boundary is not None and seconds < self.boundary:
+            # Older than the recent list (e.g. an imported chat history)
+            self.reference[code] += 1
+            return
+        bisect.insort(self.recent, [seconds, code])
+        while len(self.recent) > capacity:
+            evicted_at, evicted = self.recent.pop(0)
+            self.reference[evicted] += 1
+            self.boundary = evicted_at if self.boundary is None else max(self.boundary, evicted_at)
+
+    def remove(self, seconds: float, code: int):
+        if self.boundary is None or seconds >= self.boundary:
+            i = bisect.bisect_left(self.recent, [seconds, code])
+            if i < len(self.recent) and self.recent[i] == [seconds, code]:
+                del self.recent[i]
+                return
+        self.reference[code] = max(0, self.reference[code] - 1)
+
+    def split_codes(self, window: int):
+        """
+        (older, newest) count vectors indexed by emotion code for the newest
+        `window` events, or None when the recent list is too short to tell
+        which events those are (window above capacity, or after deletions).
+        """
+        if window > len(self.recent) and sum(self.reference):
+            return None
+        cut = max(0, len(self.recent) - window)
+        old, new = list(self.reference), [0] * len(EMOTIONS)
+        for _, code in self.recent[:cut]:
+            old[code] += 1
+        for _, code in self.recent[cut:]:
+            new[code] += 1
+        return old, new
+
+    def split(self, window: int):
+        """split_codes() as emotion label Counters."""
+        codes = self.split_codes(window)
+        if codes is None:
+            return None
+        return tuple(Counter({label_of(code): n for code, n in enumerate(counts) if n}) for counts in codes)
+
+
+# -----------------------------
+# Incremental maintenance
+# -----------------------------
+def apply_drift_events(conn, events, capacity: int = None):
+    """
+    Folds raw log events into drift_states on `conn`, inside the caller's
+    transaction. Takes the same events as db.rollup.apply_events().
+    """
+    capacity = capacity or settings.DRIFT_RECENT_CAPACITY
+    by_user = defaultdict(list)
+    for user_id, ts, _source, emotion_code, _confidence, sign in events:
+        if user_id is None or ts is None or not emotion_code:
+            continue
+        by_user[user_id].append((_seconds(ts), emotion_code, sign))
+    if not by_user:
+        return
+
+    _ensure_rows(conn, list(by_user))
+    rows = conn.execute(
+        select(DriftState).where(DriftState.user_id.in_(list(by_user))).with_for_update()
+    ).all()
+
+    updates = []
+    for row in rows:
+        counts = DriftCounts.from_row(row)
+        for seconds, code, sign in sorted(by_user[row.user_id]):
+            if sign > 0:
+                counts.add(seconds, code, capacity)
+            else:
+                counts.remove(seconds, code)
+        updates.append({"uid": row.user_id, **counts.to_values()})
+
+    conn.execute(
+        update(DriftState).where(DriftState.user_id == bindparam("uid")).values(
+            reference_counts=bindparam("reference_counts"),
+            recent=bindparam("recent"),
+            boundary=bindparam("boundary"),
+            updated_at=bindparam("updated_at"),
+            version=DriftState.version + 1
+        ),
+        updates
+    )
+
+
+def _ensure_rows(conn, user_ids):
+    empty = [{"user_id": u, "reference_counts": [0] * len(EMOTIONS), "recent": [], "version": 0} for u in user_ids]
+    if conn.dialect.name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if conn.dialect.name == "sqlite" else postgresql.insert
+        conn.execute(dialect_insert(DriftState).values(empty).on_conflict_do_nothing(index_elements=["user_id"]))
+        return
+
+    existing = set(conn.execute(select(DriftState.user_id).where(DriftState.user_id.in_(user_ids))).scalars())
+    missing = [row for row in empty if row["user_id"] not in existing]
+    if missing:
+        conn.execute(insert(DriftState), missing)
+
+
+@event.listens_for(Session, "after_flush")
+def _drift_after_flush(session, flush_context):
+    events = list(rollup._orm_events(session.new, 1)) + list(rollup._orm_events(session.deleted, -1))
+    if events:
+        apply_drift_events(session.connection(), events)
+
+
+# -----------------------------
+# Reads
+# -----------------------------
+def drift_state_stmt(user_id):
+    return select(DriftState).where(DriftState.user_id == user_id)
+
+
+def load_drift_counts(db, user_id):
+    """The user's DriftCounts, or None when no row exists yet."""
+    row = db.execute(drift_state_stmt(user_id)).scalars().first()
+    return DriftCounts.from_row(row) if row is not None else None
+
+
+# -----------------------------
+# Rebuild from raw data
+# -----------------------------
+def rebuild_drift_state(conn, user_id: int = None, capacity: int = None):
+    """
+    Recomputes drift_states (for one user or everyone). Totals come from
+    emotion_rollups, so the rollup must be current; the newest `capacity`
+    events are read from the logs, and from cold storage when the logs hold
+    fewer than that. Only rollup rows of existing users are rebuilt: legacy
+    databases carry text ids ('default_user', ...) that match no user.
+    """
+    # Imported here: both import db.models, which imports this module
+    from analysis.emotion_queries import emotion_events
+    from db.archive import newest_archived_events
+
+    capacity = capacity or settings.DRIFT_RECENT_CAPACITY
+    clear = delete(DriftState)
+    if user_id is not None:
+        clear = clear.where(DriftState.user_id == user_id)
+    conn.execute(clear)
+
+    stmt = (
+        select(User.id, EmotionRollup.emotion_code, func.sum(EmotionRollup.count))
+        .join(User, User.id == EmotionRollup.user_id)
+        .where(EmotionRollup.emotion_code != UNKNOWN)
+        .group_by(User.id, EmotionRollup.emotion_code)
+    )
+    if user_id is not None:
+        stmt = stmt.where(EmotionRollup.user_id == user_id)
+    totals = defaultdict(lambda: [0] * len(EMOTIONS))
+    for uid, code, count in conn.execute(stmt):
+        if 0 < code < len(EMOTIONS):
+            totals[uid][code] += count
+
+    rows = []
+    for uid, reference in totals.items():
+        events = emotion_events(uid)
+        recent = [
+            [_seconds(ts), code]
+            for code, _, ts, _ in conn.execute(select(events).order_by(events.c.ts.desc()).limit(capacity))
+        ]
+        if len(recent) < capacity:
+            recent += [[_seconds(ts), code] for code, _, ts, _ in newest_archived_events(conn, uid, capacity)]
+        recent = sorted(recent)[-capacity:]
+        for _, code in recent:
+            reference[code] = max(0, reference[code] - 1)
+        boundary = recent[0][0] if recent and sum(reference) else None
+        rows.append(
+            {"user_id": uid, **DriftCounts(reference, recent, boundary).to_values()}
+        )
+    if rows:
+        conn.execute(insert(DriftState), rows)
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the incremental /drift state from the logs")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+
+    from db.init_db import init_db
+    from db.database import engine
+    init_db()
+    with engine.begin() as conn:
+        rebuilt = rebuild_drift_state(conn, args.user_id)
+    print(f"Rebuilt drift state for {rebuilt} user(s)")
+
+
+if __name__ == "__main__":
+    main()
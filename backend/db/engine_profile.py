@@ -0,0 +1,63 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from core.config import settings
+
+# Backend-specific engine settings shared by the sync engine (db/database.py),
+# the async engine (db/async_database.py) and the worker.
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """create_engine() / create_async_engine() keyword arguments for `url`."""
+    backend = make_url(url.replace("postgres://", "postgresql://", 1)).get_backend_name()
+
+    if backend == "sqlite":
+        # check_same_thread is a pysqlite argument; the pool hands connections across threads
+        return {} if is_async else {"connect_args": {"check_same_thread": False}}
+
+    if backend == "postgresql":
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        return {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": True,
+            # statement_timeout in ms; 0 disables it
+            "connect_args": (
+                {"server_settings": {"statement_timeout": timeout}} if is_async
+                else {"options": f"-c statement_timeout={timeout}"}
+            )
+        }
+
+    return {}
+
+
+def enable_wal(engine):
+    """
+    Switches a SQLite database to WAL (readers no longer block the writer,
+    and vice versa). The mode persists in the file, so init_db() sets it
+    once instead of every new connection; in-memory databases ignore it.
+    """
+    if engine.dialect.name == "sqlite" and settings.DB_SQLITE_WAL:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+
+def install_profile(engine):
+    """Applies per-connection settings (SQLite PRAGMAs) to a sync Engine or an AsyncEngine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+
+
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        if settings.DB_SQLITE_WAL:
+            # Durable at checkpoints rather than on every commit; safe in WAL
+            # mode (enable_wal), but a per-connection setting
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_SQLITE_BUSY_TIMEOUT_MS)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.DB_SQLITE_MMAP_BYTES)}")
+    finally:
+        cursor.close()
@@ -1,10 +1,18 @@
 from db.database import engine, Base
+from db.engine_profile import enable_wal
 from db import models
+from db.migrations import run_migrations, check_schema
 
 
 def init_db():
     """
-    Initialize database tables using SQLAlchemy ORM.
+    Initialize database tables using SQLAlchemy ORM, then apply pending
+    schema migrations (db/migrations) to bring existing tables up to date,
+    and checks that no model column is left without one. SQLite files are
+    switched to WAL first.
     Safe to run multiple times.
     """
+    enable_wal(engine)
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    check_schema(engine, Base.metadata)
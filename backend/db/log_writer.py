@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+
+from core.config import settings
+from core.emotions import code_of
+from db.database import engine as default_engine, SessionLocal
+from db.models import EmotionLog, FaceEmotionLog
+from db.rollup import apply_events
+from db.drift_state import apply_drift_events
+
+# Attempts per batch before falling back to row-by-row inserts
+MAX_BATCH_ATTEMPTS = 3
+
+
+class LogQueueFull(Exception):
+    """Raised when the write-behind queue stays full past LOG_WRITER_BLOCK_SECONDS."""
+
+
+class LogWriter:
+    """
+    Write-behind buffer for emotion_logs / face_emotion_logs rows.
+
+    Request handlers queue rows in memory and return; one background thread
+    commits them in multi-row transactions every `flush_ms` milliseconds or
+    as soon as `batch_size` rows are waiting, and drains the queue on stop().
+    The queue is bounded: producers block for up to `block_seconds` when it
+    is full, then get LogQueueFull. flush() gives read-your-writes by
+    waiting until everything queued before the call is committed.
+
+    Rows are written with Core inserts, so the rollup is updated here rather
+    than by the ORM flush hook.
+    """
+
+    def __init__(self, batch_size: int = None, flush_ms: int = None, max_queue: int = None,
+                 block_seconds: float = None, engine=None):
+        self.batch_size = batch_size or settings.LOG_WRITER_BATCH_SIZE
+        self.flush_interval = (flush_ms or settings.LOG_WRITER_FLUSH_MS) / 1000
+        self.max_queue = max_queue or settings.LOG_WRITER_MAX_QUEUE
+        self.block_seconds = settings.LOG_WRITER_BLOCK_SECONDS if block_seconds is None else block_seconds
+        self.engine = engine or default_engine
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._accepted = 0  # rows ever queued
+        self._done = 0  # rows committed (or dropped after failing)
+        self._pending_users = Counter()
+        self._flush_requested = False
+        self._stopping = False
+        self._thread = None
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """Stops accepting rows and returns once the queue is drained (or after `timeout`)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+
+    # -----------------------------
+    # Producers / readers
+    # -----------------------------
+    def submit(self, model, values: dict):
+        with self._cond:
+            if self._stopping:
+                raise LogQueueFull("log writer is shutting down")
+            if len(self._queue) >= self.max_queue:
+                # Backpressure: wait for the writer to free space
+                if not self._cond.wait_for(lambda: len(self._queue) < self.max_queue, self.block_seconds):
+                    raise LogQueueFull(f"{len(self._queue)} log rows waiting to be written")
+            self._queue.append((model, values))
+            self._accepted += 1
+            self._pending_users[values["user_id"]] += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def pending(self, user_id: int = None) -> int:
+        """Rows queued but not yet committed, for one user or in total."""
+        with self._cond:
+            if user_id is None:
+                return self._accepted - self._done
+            return self._pending_users[user_id]
+
+    def flush(self, user_id: int = None, timeout: float = 5.0) -> bool:
+        """
+        Waits until every row queued before this call (for `user_id`, or
+        anyone) is committed. Returns False if that took longer than `timeout`.
+        """
+        with self._cond:
+            if user_id is not None and not self._pending_users[user_id]:
+                return True
+            target = self._accepted
+            if self._done >= target:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            return self._cond.wait_for(lambda: self._done >= target, timeout)
+
+    # -----------------------------
+    # Writer thread
+    # -----------------------------
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or self._flush_requested or len(self._queue) >= self.batch_size,
+                    self.flush_interval
+                )
+                if not self._queue:
+                    self._flush_requested = False
+                    if self._stopping:
+                        return
+                    continue
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                # Space freed for producers blocked on a full queue
+                self._cond.notify_all()
+
+            self._write(batch)
+
+            with self._cond:
+                self._done += len(batch)
+                for _, values in batch:
+                    self._pending_users[values["user_id"]] -= 1
+                    if not self._pending_users[values["user_id"]]:
+                        del self._pending_users[values["user_id"]]
+                if not self._queue:
+                    self._flush_requested = False
+                self._cond.notify_all()
+
+    def _write(self, batch):
+        for attempt in range(MAX_BATCH_ATTEMPTS):
+            try:
+                with self.engine.begin() as conn:
+                    _insert_rows(conn, batch)
+                return
+            except SQLAlchemyError as e:
+                print(f"[log-writer] batch of {len(batch)} rows failed (attempt {attempt + 1}): {e}")
+                time.sleep(0.5 * 2 ** attempt)
+
+        # One bad row must not sink the whole batch: write the rest one by one
+        for row in batch:
+            try:
+                with self.engine.begin() as conn:
+                    _insert_rows(conn, [row])
+            except SQLAlchemyError as e:
+                print(f"[log-writer] dropped {row[0].__tablename__} row for user {row[1]['user_id']}: {e}")
+
+
+def _insert_rows(conn, batch):
+    text_rows = [values for model, values in batch if model is EmotionLog]
+    face_rows = [values for model, values in batch if model is FaceEmotionLog]
+    if text_rows:
+        conn.execute(insert(EmotionLog), text_rows)
+    if face_rows:
+        conn.execute(insert(FaceEmotionLog), face_rows)
+    events = [
+        (v["user_id"], v["created_at"], v["source"], v["emotion_code"], v["confidence"], 1) for v in text_rows
+    ] + [
+        (v["user_id"], v["timestamp"], "face", v["emotion_code"], v["confidence"], 1) for v in face_rows
+    ]
+    apply_events(conn, events)
+    apply_drift_events(conn, events)
+
+
+# -----------------------------
+# Process-wide writer
+# -----------------------------
+_writer = None
+
+
+def start_log_writer():
+    """Starts the write-behind writer when LOG_WRITE_BEHIND is on; otherwise writes stay synchronous."""
+    global _writer
+    if settings.LOG_WRITE_BEHIND and _writer is None:
+        _writer = LogWriter()
+        _writer.start()
+
+
+def stop_log_writer():
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
+
+
+def write_log(model, **values):
+    """
+    Records one EmotionLog / FaceEmotionLog row. Callers must pass the
+    timestamp (created_at / timestamp): with write-behind on, the insert
+    happens later than the event.
+
+    Raises:
+        LogQueueFull: The write-behind queue stayed full (map to 503).
+    """
+    values["emotion_code"] = code_of(values.get("emotion"))
+    if model is EmotionLog:
+        values.setdefault("source", "text")
+
+    if _writer is not None:
+        _writer.submit(model, values)
+        return
+
+    db = SessionLocal()
+    try:
+        db.add(model(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def flush_logs(user_id: int = None) -> bool:
+    """Read-your-writes for sync callers: commits the user's queued rows first."""
+    if _writer is None:
+        return True
+    return _writer.flush(user_id)
+
+
+async def flush_logs_async(user_id: int = None) -> bool:
+    """flush_logs() for async endpoints; only leaves the event loop when rows are queued."""
+    if _writer is None or not _writer.pending(user_id):
+        return True
+    return await asyncio.to_thread(_writer.flush, user_id)
@@ -0,0 +1 @@
+from db.migrations.runner import run_migrations, applied_versions, pending_migrations, check_schema, SchemaDrift
@@ -0,0 +1,28 @@
+"""
+Usage (from the backend directory):
+    python -m db.migrations           # apply pending migrations
+    python -m db.migrations status    # list applied and pending versions, and missing columns
+"""
+import sys
+
+from db.database import engine, Base
+from db.init_db import init_db
+from db.migrations.runner import applied_versions, discover_migrations, missing_columns
+
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        applied = applied_versions(engine)
+        for version, name, _ in discover_migrations():
+            print(f"{version:04d} {name}: {'applied' if version in applied else 'pending'}")
+        for column in missing_columns(engine, Base.metadata):
+            print(f"missing column: {column}")
+    elif command == "upgrade":
+        init_db()
+    else:
+        sys.exit(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""Live-progress columns added to chat_jobs after the table first shipped."""
+from sqlalchemy import Column, String, Integer, JSON, text
+
+from db.migrations.ops import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "chat_jobs", Column("stage", String))
+    add_column(conn, "chat_jobs", Column("partial", JSON))
+    add_column(conn, "chat_jobs", Column("event_seq", Integer))
+    # Runners bump event_seq in SQL (event_seq + 1), which stays NULL on NULL
+    conn.execute(text("UPDATE chat_jobs SET event_seq = 0 WHERE event_seq IS NULL"))
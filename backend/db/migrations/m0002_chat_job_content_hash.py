@@ -0,0 +1,9 @@
+"""Upload hash on chat_jobs, used to find identical earlier analyses."""
+from sqlalchemy import Column, String
+
+from db.migrations.ops import add_column, create_index
+
+
+def upgrade(conn):
+    add_column(conn, "chat_jobs", Column("content_hash", String))
+    create_index(conn, "ix_chat_jobs_content_hash", "chat_jobs", ["content_hash"])
@@ -0,0 +1,12 @@
+"""Priority class, cancellation flag and queue wait on chat_jobs."""
+from sqlalchemy import Column, String, Boolean, Integer, text
+
+from db.migrations.ops import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "chat_jobs", Column("priority_class", String))
+    add_column(conn, "chat_jobs", Column("cancel_requested", Boolean))
+    add_column(conn, "chat_jobs", Column("queue_wait_ms", Integer))
+    conn.execute(text("UPDATE chat_jobs SET priority_class = 'interactive' WHERE priority_class IS NULL"))
+    conn.execute(text("UPDATE chat_jobs SET cancel_requested = :no WHERE cancel_requested IS NULL"), {"no": False})
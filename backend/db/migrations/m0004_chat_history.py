@@ -0,0 +1,13 @@
+"""Columns for persisting analyzed chat messages into emotion_logs."""
+from sqlalchemy import Column, String, Boolean
+
+from db.migrations.ops import add_column, create_index
+
+
+def upgrade(conn):
+    add_column(conn, "chat_jobs", Column("persist_history", Boolean))
+
+    add_column(conn, "emotion_logs", Column("source", String))
+    add_column(conn, "emotion_logs", Column("source_key", String))
+    # Backs ON CONFLICT (user_id, source_key) for imported chat messages
+    create_index(conn, "uq_emotion_logs_user_source_key", "emotion_logs", ["user_id", "source_key"], unique=True)
@@ -0,0 +1,16 @@
+"""
+Composite (user_id, time) indexes for the dashboard queries, which all filter
+by user and range-scan or sort by time. They replace the user_id-only
+indexes, whose lookups they cover as a leading-column prefix.
+"""
+from db.migrations.ops import create_index, drop_index
+
+
+def upgrade(conn):
+    create_index(conn, "ix_emotion_logs_user_created", "emotion_logs", ["user_id", "created_at"])
+    create_index(conn, "ix_face_emotion_logs_user_timestamp", "face_emotion_logs", ["user_id", "timestamp"])
+    create_index(conn, "ix_drift_alerts_user_created", "drift_alerts", ["user_id", "created_at"])
+
+    drop_index(conn, "ix_emotion_logs_user_id", "emotion_logs")
+    drop_index(conn, "ix_face_emotion_logs_user_id", "face_emotion_logs")
+    drop_index(conn, "ix_drift_alerts_user_id", "drift_alerts")
@@ -0,0 +1,6 @@
+"""Hourly emotion rollup table (filled by m0007 once emotion codes exist)."""
+from db.models import EmotionRollup
+
+
+def upgrade(conn):
+    EmotionRollup.__table__.create(conn, checkfirst=True)
@@ -0,0 +1,32 @@
+"""
+Integer emotion codes: emotion_logs / face_emotion_logs get an emotion_code
+column backfilled from the raw labels (one UPDATE per distinct label), and
+the rollup is re-keyed by code and rebuilt.
+"""
+from sqlalchemy import Column, SmallInteger, select, update
+
+from core.emotions import code_of
+from db.models import EmotionLog, FaceEmotionLog, EmotionRollup
+from db.migrations.ops import add_column, has_column
+from db.rollup import rebuild_rollup
+
+
+def upgrade(conn):
+    for model in (EmotionLog, FaceEmotionLog):
+        table = model.__tablename__
+        add_column(conn, table, Column("emotion_code", SmallInteger))
+
+        labels = conn.execute(
+            select(model.emotion).where(model.emotion_code.is_(None)).distinct()
+        ).scalars().all()
+        for label in labels:
+            match = model.emotion.is_(None) if label is None else model.emotion == label
+            conn.execute(
+                update(model).where(match, model.emotion_code.is_(None)).values(emotion_code=code_of(label))
+            )
+
+    # Rollups created by m0006 before this migration were keyed by raw label
+    if has_column(conn, "emotion_rollups", "emotion"):
+        EmotionRollup.__table__.drop(conn)
+    EmotionRollup.__table__.create(conn, checkfirst=True)
+    rebuild_rollup(conn)
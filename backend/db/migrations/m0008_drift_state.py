@@ -0,0 +1,8 @@
+"""Incremental /drift state (db/drift_state.py), built from the rollup and the newest raw events."""
+from db.models import DriftState
+from db.drift_state import rebuild_drift_state
+
+
+def upgrade(conn):
+    DriftState.__table__.create(conn, checkfirst=True)
+    rebuild_drift_state(conn)
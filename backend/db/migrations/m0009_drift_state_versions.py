@@ -0,0 +1,11 @@
+"""Write / check versions on drift_states, so the drift monitor only evaluates users with new logs."""
+from sqlalchemy import Column, Integer, update
+
+from db.models import DriftState
+from db.migrations.ops import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "drift_states", Column("version", Integer))
+    add_column(conn, "drift_states", Column("checked_version", Integer))
+    conn.execute(update(DriftState).where(DriftState.version.is_(None)).values(version=0))
@@ -0,0 +1,8 @@
+"""chat_analyses.retired_at: extensions build a new row and retire the one they extended."""
+from sqlalchemy import Column, DateTime
+
+from db.migrations.ops import add_column
+
+
+def upgrade(conn):
+    add_column(conn, "chat_analyses", Column("retired_at", DateTime))
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, text
+
+# Idempotent schema operations for migrations. They inspect the live schema
+# first, so a migration can run on a database created by create_all() with
+# the latest models as well as on an old one.
+
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    insp = inspect(conn)
+    names = {ix["name"] for ix in insp.get_indexes(table)}
+    names |= {uc["name"] for uc in insp.get_unique_constraints(table)}
+    return name in names
+
+
+def add_column(conn, table: str, column):
+    """Adds a sqlalchemy Column to an existing table if it is missing (existing rows get NULL)."""
+    if not has_table(conn, table) or has_column(conn, table, column.name):
+        return
+    col_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column.name} {col_type}'))
+
+
+def create_index(conn, name: str, table: str, columns, unique: bool = False):
+    if not has_table(conn, table) or has_index(conn, table, name):
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} {name} ON {table} ({', '.join(columns)})"))
+
+
+def drop_index(conn, name: str, table: str):
+    if not has_table(conn, table) or not has_index(conn, table, name):
+        return
+    conn.execute(text(f"DROP INDEX {name}"))
@@ -0,0 +1,105 @@
+import importlib
+import pkgutil
+import re
+from datetime import datetime
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, insert, text, inspect
+
+# Migrations are the modules of this package named mNNNN_<description>.py,
+# applied in NNNN order. Each defines `upgrade(conn)` and must be idempotent:
+# init_db() runs create_all() first, so on a fresh database the tables
+# already have the latest shape when migrations run.
+_MODULE_RE = re.compile(r"^m(\d{4})_(\w+)$")
+
+# Arbitrary constant; serializes migration runs across web/worker processes on Postgres
+_PG_LOCK_KEY = 7246001
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String),
+    Column("applied_at", DateTime)
+)
+
+
+def discover_migrations() -> list:
+    """(version, name, module) for every migration in the package, in order."""
+    package = importlib.import_module("db.migrations")
+    found = []
+    for info in pkgutil.iter_modules(package.__path__):
+        match = _MODULE_RE.match(info.name)
+        if match:
+            module = importlib.import_module(f"db.migrations.{info.name}")
+            found.append((int(match.group(1)), match.group(2), module))
+    return sorted(found, key=lambda item: item[0])
+
+
+def applied_versions(engine) -> set:
+    _metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return set(conn.execute(select(schema_version.c.version)).scalars())
+
+
+def pending_migrations(engine) -> list:
+    applied = applied_versions(engine)
+    return [m for m in discover_migrations() if m[0] not in applied]
+
+
+def run_migrations(engine) -> list:
+    """
+    Applies pending migrations, each in its own transaction together with
+    its schema_version row, so a failed migration leaves no partial state
+    on backends with transactional DDL (Postgres, SQLite).
+
+    Returns:
+        list: Versions applied by this call.
+    """
+    applied = []
+    for version, name, module in pending_migrations(engine):
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Backfills and index builds may outlast the request statement_timeout
+                conn.execute(text("SET LOCAL statement_timeout = 0"))
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _PG_LOCK_KEY})
+            # Another process may have applied it while we waited for the lock
+            done = conn.execute(
+                select(schema_version.c.version).where(schema_version.c.version == version)
+            ).first()
+            if done:
+                continue
+
+            module.upgrade(conn)
+            conn.execute(insert(schema_version).values(version=version, name=name, applied_at=datetime.utcnow()))
+        applied.append(version)
+        print(f"Applied migration {version:04d} {name}")
+    return applied
+
+
+class SchemaDrift(RuntimeError):
+    """Model columns missing from the live database: a model change shipped without its migration."""
+
+
+def missing_columns(engine, metadata) -> list:
+    """`table.column` names declared in `metadata` but absent from tables that already exist."""
+    with engine.connect() as conn:
+        insp = inspect(conn)
+        missing = []
+        for table in metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            live = {c["name"] for c in insp.get_columns(table.name)}
+            missing += [f"{table.name}.{c.name}" for c in table.columns if c.name not in live]
+        return missing
+
+
+def check_schema(engine, metadata):
+    """
+    Raises SchemaDrift when migrations left a model column missing.
+    create_all() never alters existing tables, so every new column needs a
+    migration in the same change; this fails at startup instead of on the
+    first query that touches the column.
+    """
+    missing = missing_columns(engine, metadata)
+    if missing:
+        raise SchemaDrift(f"Columns missing from the database (add a migration): {', '.join(missing)}")
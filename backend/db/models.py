@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, DateTime, Boolean, ForeignKey, JSON, LargeBinary, UniqueConstraint, Index
 from datetime import datetime
 from .database import Base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
+from core.emotions import code_of
 
 class User(Base):
     __tablename__ = "users"
@@ -22,30 +23,99 @@ class EmotionLog(Base):
     __tablename__ = "emotion_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
     text = Column(String)
-    emotion = Column(String)
+    emotion = Column(String) # raw model label
+    emotion_code = Column(SmallInteger) # core.emotions code, set whenever emotion is
     confidence = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
+    source = Column(String, default="text") # "text" (/predict) | "chat" (imported chat message)
+    source_key = Column(String) # idempotency key for imported rows
 
     user = relationship("User", back_populates="logs")
 
+    @validates("emotion")
+    def _set_emotion_code(self, key, value):
+        self.emotion_code = code_of(value)
+        return value
+
+    __table_args__ = (
+        Index("ix_emotion_logs_user_created", "user_id", "created_at"),
+        UniqueConstraint("user_id", "source_key", name="uq_emotion_logs_user_source_key"),
+    )
+
 class FaceEmotionLog(Base):
     __tablename__ = "face_emotion_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
-    emotion = Column(String)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    emotion = Column(String) # raw model label
+    emotion_code = Column(SmallInteger) # core.emotions code, set whenever emotion is
     confidence = Column(Float)
     timestamp = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="face_logs")
 
+    @validates("emotion")
+    def _set_emotion_code(self, key, value):
+        self.emotion_code = code_of(value)
+        return value
+
+    __table_args__ = (
+        Index("ix_face_emotion_logs_user_timestamp", "user_id", "timestamp"),
+    )
+
+class EmotionRollup(Base):
+    __tablename__ = "emotion_rollups"
+
+    # Hourly pre-aggregate of emotion_logs + face_emotion_logs, maintained on
+    # write by db/rollup.py. hour = hours since the Unix epoch (UTC).
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    source = Column(String, primary_key=True) # "text" | "chat" | "face"
+    emotion_code = Column(SmallInteger, primary_key=True) # core.emotions code
+    count = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+
+class LogArchive(Base):
+    __tablename__ = "log_archives"
+
+    # Catalog of cold-storage files written by db/archive.py, one row per
+    # Parquet part. A part's rows left the log table in the transaction that
+    # inserted its catalog row; their counts stay in emotion_rollups.
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    source_table = Column(String) # "emotion_logs" | "face_emotion_logs"
+    period_start = Column(DateTime) # first instant of the archived month
+    period_end = Column(DateTime) # first instant of the next month
+    path = Column(String) # relative to ARCHIVE_DIR
+    row_count = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_log_archives_user_period", "user_id", "period_start"),
+    )
+
+class DriftState(Base):
+    __tablename__ = "drift_states"
+
+    # Per-user /drift counters, maintained on write by db/drift_state.py.
+    # `recent` holds the newest events (at most DRIFT_RECENT_CAPACITY);
+    # everything older is folded into reference_counts. Unknown emotions are
+    # not counted.
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    reference_counts = Column(JSON) # counts indexed by core.emotions code
+    recent = Column(JSON) # [[epoch seconds, emotion code], ...], oldest first
+    boundary = Column(Float) # newest timestamp folded into reference_counts
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    version = Column(Integer, default=0) # bumped by every write
+    checked_version = Column(Integer) # version last evaluated by worker/drift_monitor.py
+
 class DriftAlert(Base):
     __tablename__ = "drift_alerts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
     from_emotion = Column(String)
     to_emotion = Column(String)
     severity = Column(Float)
@@ -53,6 +123,10 @@ class DriftAlert(Base):
 
     user = relationship("User", back_populates="alerts")
 
+    __table_args__ = (
+        Index("ix_drift_alerts_user_created", "user_id", "created_at"),
+    )
+
 class Report(Base):
     __tablename__ = "reports"
 
@@ -64,4 +138,78 @@ class Report(Base):
     file_path = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
 
-    user = relationship("User", back_populates="reports")
\ No newline at end of file
+    user = relationship("User", back_populates="reports")
+
+class ChatJob(Base):
+    __tablename__ = "chat_jobs"
+
+    # Lifecycle: queued -> processing -> completed | failed | cancelled
+    job_id = Column(String, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    status = Column(String, default="queued", index=True)
+    priority_class = Column(String, default="interactive") # "interactive" | "bulk"
+    cancel_requested = Column(Boolean, default=False)
+    persist_history = Column(Boolean, default=False) # also write messages to emotion_logs
+    progress = Column(Integer, default=0)
+    stage = Column(String)
+    partial = Column(JSON) # running aggregates published while the job runs
+    event_seq = Column(Integer, default=0) # bumped on every visible change (SSE event id)
+    upload_size = Column(Integer)
+    content_hash = Column(String, index=True) # sha256 of the uploaded archive
+    result = Column(JSON)
+    error = Column(String)
+
+    # Claim bookkeeping used by the worker tier
+    worker_id = Column(String)
+    attempts = Column(Integer, default=0)
+    heartbeat_at = Column(DateTime)
+    submitted_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    queue_wait_ms = Column(Integer) # submitted -> last claimed
+
+
+class ChatUploadChunk(Base):
+    __tablename__ = "chat_upload_chunks"
+
+    # Uploaded archives are handed from the web tier to the worker tier through
+    # the database, so both can run on different machines.
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, ForeignKey("chat_jobs.job_id"), index=True)
+    seq = Column(Integer)
+    data = Column(LargeBinary)
+
+
+class ChatAnalysis(Base):
+    __tablename__ = "chat_analyses"
+
+    # One row per distinct chat a user has analyzed. Re-uploads of the same
+    # archive reuse `result`; uploads that extend the chat (same leading
+    # messages, matched via prefix_hash) resume from `state` into a new row
+    # (copy-on-write), which retires this one when the job finishes.
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    content_hash = Column(String, index=True) # sha256 of the latest archive
+    message_count = Column(Integer, default=0)
+    prefix_hash = Column(String) # rolling hash over the first message_count messages
+    state = Column(JSON) # ChatAggregator.to_state()
+    result = Column(JSON)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    retired_at = Column(DateTime) # superseded by a longer copy; purged after a grace period
+
+
+class ChatMessageResult(Base):
+    __tablename__ = "chat_message_results"
+
+    # Per-message inference results, one row per inference chunk: one byte
+    # emotion code and one byte quantized confidence per message.
+    id = Column(Integer, primary_key=True, index=True)
+    analysis_id = Column(Integer, ForeignKey("chat_analyses.id"), index=True)
+    seq_start = Column(Integer) # index of the first message in the chunk
+    emotions = Column(LargeBinary)
+    confidences = Column(LargeBinary)
+
+
+# Register the ORM hooks that keep emotion_rollups and drift_states in step with log inserts
+from db import rollup, drift_state  # noqa: E402,F401
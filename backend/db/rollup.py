@@ -0,0 +1,169 @@
+import calendar
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, delete, update, insert, func, cast, Integer, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from core.emotions import UNKNOWN
+from db.models import EmotionLog, FaceEmotionLog, EmotionRollup
+
+# emotion_rollups keeps per-user, per-hour, per-source, per-emotion-code
+# counts and confidence sums. Hours are integers (hours since the Unix epoch, naive
+# timestamps read as UTC) so the key compares identically on every backend.
+# Sources: "text" (/predict), "chat" (imported chat messages), "face".
+_EPOCH = datetime(1970, 1, 1)
+
+
+def hour_of(ts: datetime) -> int:
+    return calendar.timegm(ts.timetuple()) // 3600
+
+
+def hour_start(hour: int) -> datetime:
+    return _EPOCH + timedelta(hours=hour)
+
+
+def text_source(log) -> str:
+    return log.source if log.source in ("text", "chat") else "text"
+
+
+# -----------------------------
+# Incremental maintenance
+# -----------------------------
+def apply_events(conn, events):
+    """
+    Folds raw log events into the rollup on `conn`, inside the caller's
+    transaction, so rollup and raw rows commit or roll back together.
+
+    Args:
+        events: Iterable of (user_id, timestamp, source, emotion_code, confidence, sign),
+            sign being +1 for inserted rows and -1 for deleted ones.
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for user_id, ts, source, emotion_code, confidence, sign in events:
+        if user_id is None or ts is None:
+            continue
+        key = (user_id, hour_of(ts), source, UNKNOWN if emotion_code is None else emotion_code)
+        deltas[key][0] += sign
+        deltas[key][1] += sign * (confidence or 0.0)
+    if not deltas:
+        return
+
+    rows = [
+        {"user_id": u, "hour": h, "source": s, "emotion_code": e, "count": n, "confidence_sum": c}
+        for (u, h, s, e), (n, c) in deltas.items()
+    ]
+    _upsert(conn, rows)
+    if any(row["count"] < 0 for row in rows):
+        conn.execute(delete(EmotionRollup).where(EmotionRollup.count <= 0))
+
+
+def _upsert(conn, rows):
+    key = ["user_id", "hour", "source", "emotion_code"]
+    if conn.dialect.name in ("sqlite", "postgresql"):
+        dialect_insert = sqlite.insert if conn.dialect.name == "sqlite" else postgresql.insert
+        stmt = dialect_insert(EmotionRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key,
+            set_={
+                "count": EmotionRollup.count + stmt.excluded["count"],
+                "confidence_sum": EmotionRollup.confidence_sum + stmt.excluded.confidence_sum
+            }
+        )
+        conn.execute(stmt)
+        return
+
+    for row in rows:
+        updated = conn.execute(
+            update(EmotionRollup)
+            .where(*[getattr(EmotionRollup, k) == row[k] for k in key])
+            .values(
+                count=EmotionRollup.count + row["count"],
+                confidence_sum=EmotionRollup.confidence_sum + row["confidence_sum"]
+            )
+        ).rowcount
+        if not updated:
+            conn.execute(insert(EmotionRollup).values(**row))
+
+
+def _orm_events(objects, sign):
+    for obj in objects:
+        if isinstance(obj, EmotionLog):
+            yield obj.user_id, obj.created_at, text_source(obj), obj.emotion_code, obj.confidence, sign
+        elif isinstance(obj, FaceEmotionLog):
+            yield obj.user_id, obj.timestamp, "face", obj.emotion_code, obj.confidence, sign
+
+
+@event.listens_for(Session, "after_flush")
+def _rollup_after_flush(session, flush_context):
+    # Runs inside the flush's transaction; new/deleted still list what was flushed
+    events = list(_orm_events(session.new, 1)) + list(_orm_events(session.deleted, -1))
+    if events:
+        apply_events(session.connection(), events)
+
+
+# -----------------------------
+# Rebuild from raw data
+# -----------------------------
+def _hour_expr(conn, column):
+    if conn.dialect.name == "sqlite":
+        # Drop fractional seconds first: strftime('%s') rounds them, which
+        # would push 10:59:59.9 into the 11:00 bucket
+        return cast(func.strftime("%s", func.substr(column, 1, 19)), Integer) // 3600
+    if conn.dialect.name == "postgresql":
+        return cast(func.floor(func.extract("epoch", column) / 3600), Integer)
+    return None
+
+
+def rebuild_rollup(conn, user_id: int = None):
+    """
+    Recomputes the rollup (for one user or everyone) from emotion_logs and
+    face_emotion_logs with INSERT ... SELECT ... GROUP BY. Backends without
+    an hour expression fall back to streaming raw rows through apply_events(),
+    as do rows already moved to cold storage (db/archive.py).
+    """
+    clear = delete(EmotionRollup)
+    if user_id is not None:
+        clear = clear.where(EmotionRollup.user_id == user_id)
+    conn.execute(clear)
+
+    branches = (
+        (EmotionLog, EmotionLog.created_at, func.coalesce(EmotionLog.source, "text")),
+        (FaceEmotionLog, FaceEmotionLog.timestamp, literal("face"))
+    )
+    for model, ts_column, source in branches:
+        hour = _hour_expr(conn, ts_column)
+        emotion = func.coalesce(model.emotion_code, UNKNOWN)
+        where = [ts_column.isnot(None), model.user_id.isnot(None)]
+        if user_id is not None:
+            where.append(model.user_id == user_id)
+
+        if hour is None:
+            rows = conn.execute(
+                select(model.user_id, ts_column, source, model.emotion_code, model.confidence).where(*where)
+            )
+            apply_events(conn, ((u, ts, s, e, c, 1) for u, ts, s, e, c in rows))
+            continue
+
+        grouped = (
+            select(
+                model.user_id,
+                hour.label("hour"),
+                source.label("source"),
+                emotion.label("emotion_code"),
+                func.count().label("count"),
+                func.coalesce(func.sum(model.confidence), 0.0).label("confidence_sum")
+            )
+            .where(*where)
+            .group_by(model.user_id, hour, source, emotion)
+        )
+        conn.execute(
+            insert(EmotionRollup).from_select(
+                ["user_id", "hour", "source", "emotion_code", "count", "confidence_sum"], grouped
+            )
+        )
+
+    # Imported here: db.models imports this module, and db.archive imports db.models
+    from db.archive import archived_rollup_events
+    apply_events(conn, archived_rollup_events(conn, user_id))
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from datetime import datetime
 
-from db.database import get_db
 from db.models import FaceEmotionLog, User
-from api.deps import get_current_user
+from db.async_database import get_async_db
+from db.log_writer import LogQueueFull, write_log, flush_logs_async
+from db.archive import archived_events_async
+from api.deps import get_current_user, get_current_user_async
+from analysis.emotion_queries import bucketed_counts_stmt, first_hour_stmt, emotion_counts_stmt, counts_to_dict
+from analysis.downsample import resolve_bucket, dominant_points, downsample_events
+from core.config import settings
+from core.emotions import label_of
 from inference.face_emotion import FaceEmotionAnalyzer
 
 router = APIRouter(
@@ -26,6 +32,7 @@ class HistoryResponse(BaseModel):
     timestamp: datetime
     emotion: str
     confidence: float
+    count: Optional[int] = None # events behind a bucketed point
 
     class Config:
         from_attributes = True
@@ -33,7 +40,6 @@ class HistoryResponse(BaseModel):
 @router.post("/capture", response_model=EmotionCaptureResponse)
 def capture_emotion(
     request: EmotionCaptureRequest,
-    db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -50,38 +56,53 @@ def capture_emotion(
             detail=result["error"]
         )
 
-    # 2. Save to DB
-    new_log = FaceEmotionLog(
-        user_id=current_user.id,
-        emotion=result["emotion"],
-        confidence=result["confidence"],
-        timestamp=datetime.utcnow()
-    )
-    db.add(new_log)
-    db.commit()
-    db.refresh(new_log)
+    # 2. Save to DB (queued when the write-behind log writer is on)
+    timestamp = datetime.utcnow()
+    try:
+        write_log(
+            FaceEmotionLog,
+            user_id=current_user.id,
+            emotion=result["emotion"],
+            confidence=result["confidence"],
+            timestamp=timestamp
+        )
+    except LogQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many pending writes, retry shortly",
+            headers={"Retry-After": "1"}
+        )
 
     return {
-        "emotion": new_log.emotion,
-        "confidence": new_log.confidence,
-        "timestamp": new_log.timestamp
+        "emotion": result["emotion"],
+        "confidence": result["confidence"],
+        "timestamp": timestamp
     }
 
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, select
 
 @router.get("/history", response_model=list[HistoryResponse])
-def get_history(
+async def get_history(
     range: str = "7d",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    bucket: Optional[str] = None,
+    max_points: Optional[int] = Query(None, ge=3),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Returns the user's emotion history (face only) for the requested range.
     Range options: "1h", "24h", "7d", "30d", "all"
+
+    At most max_points entries are returned (capped by TIMELINE_MAX_POINTS):
+    raw captures are LTTB-downsampled over confidence, and with
+    bucket=hour|day|week|auto each entry is a fixed-width bucket from the
+    hourly rollup (dominant emotion, mean confidence, count).
     """
+    await flush_logs_async(current_user.id)
     now = datetime.utcnow()
     cutoff_date = now - timedelta(days=7) # Default
+    max_points = min(max_points or settings.TIMELINE_MAX_POINTS, settings.TIMELINE_MAX_POINTS)
 
     if range == "1h":
         cutoff_date = now - timedelta(hours=1)
@@ -92,47 +113,59 @@ def get_history(
     elif range == "all":
         cutoff_date = datetime.min
 
-    logs = db.query(FaceEmotionLog)\
-        .filter(
+    if bucket is not None:
+        first_hour = (await db.execute(first_hour_stmt(current_user.id, sources=("face",)))).scalar()
+        width = resolve_bucket(bucket, cutoff_date, now, first_hour, max_points)
+        if width is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="bucket must be one of: hour, day, week, auto"
+            )
+        rows = (await db.execute(
+            bucketed_counts_stmt(current_user.id, width, cutoff_date, now, sources=("face",), exclude_unknown=False)
+        )).all()
+        return dominant_points(rows)
+
+    # Only the plotted columns; no ORM objects for long histories
+    logs = (await db.execute(
+        select(FaceEmotionLog.timestamp, FaceEmotionLog.emotion_code, FaceEmotionLog.confidence)
+        .where(
             FaceEmotionLog.user_id == current_user.id,
             FaceEmotionLog.timestamp >= cutoff_date
-        )\
-        .order_by(FaceEmotionLog.timestamp.asc())\
-        .all()
-    
-    # Normalize
-    EMOTION_MAP = {
-        "angry": "anger",
-        "disgust": "anger", 
-        "sad": "sadness",
-        "joy": "happy",
-        "happines": "happy"
-    }
-    
-    normalized_logs = []
-    for log in logs:
-        # Create a dict or copy to avoiding mutation issues if attached to session
-        # Pydantic response model will handle dict conversion
-        raw_e = log.emotion
-        if raw_e: raw_e = raw_e.lower()
-        
-        normalized_logs.append({
+        )
+        .order_by(FaceEmotionLog.timestamp.asc())
+    )).all()
+
+    history = [
+        {
             "timestamp": log.timestamp,
-            "emotion": EMOTION_MAP.get(raw_e, raw_e),
+            "emotion": label_of(log.emotion_code),
             "confidence": log.confidence
-        })
-
-    return normalized_logs
+        }
+        for log in logs
+    ]
+    # Captures from archived months, when the range reaches that far back
+    archived = await archived_events_async(
+        db, current_user.id, cutoff_date, sources=("face",), exclude_unknown=False
+    )
+    if archived:
+        history += [
+            {"timestamp": ts, "emotion": label_of(emotion_code), "confidence": confidence}
+            for emotion_code, confidence, ts, _ in archived
+        ]
+        history.sort(key=lambda point: point["timestamp"])
+    return downsample_events(history, max_points)
 
 @router.get("/distribution")
-def get_distribution(
+async def get_distribution(
     range: str = "7d",
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """
     Returns the percentage distribution of emotions for the given timeframe.
     """
+    await flush_logs_async(current_user.id)
     now = datetime.utcnow()
     cutoff_date = now - timedelta(days=7) # Default
 
@@ -145,33 +178,11 @@ def get_distribution(
     elif range == "all":
         cutoff_date = datetime.min
 
-    # Query for distribution
-    # We can do this with a group_by query for efficiency
-    results = db.query(
-        FaceEmotionLog.emotion, 
-        func.count(FaceEmotionLog.emotion)
-    ).filter(
-        FaceEmotionLog.user_id == current_user.id,
-        FaceEmotionLog.timestamp >= cutoff_date
-    ).group_by(FaceEmotionLog.emotion).all()
-
-    # Convert to dictionary and calculate percentages
-    # Normalize keys while aggregating
-    EMOTION_MAP = {
-        "angry": "anger",
-        "disgust": "anger", 
-        "sad": "sadness",
-        "joy": "happy",
-        "happines": "happy"
-    }
-
-    counts = {}
-    for emotion, count in results:
-        raw_e = emotion
-        if raw_e: raw_e = raw_e.lower()
-        
-        norm_e = EMOTION_MAP.get(raw_e, raw_e)
-        counts[norm_e] = counts.get(norm_e, 0) + count
+    # Counted from the rollup (archived months included), grouped by emotion code
+    rows = (await db.execute(
+        emotion_counts_stmt(current_user.id, cutoff_date, sources=("face",), exclude_unknown=False)
+    )).all()
+    counts = counts_to_dict(rows)
 
     total = sum(counts.values())
     
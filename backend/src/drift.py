@@ -1,22 +1,115 @@
-import pandas as pd
 import numpy as np
-from scipy.spatial.distance import jensenshannon
+import pandas as pd
+
+try:
+    # The API's vectorized engine, importable when the backend directory is on the path
+    from analysis.drift_metrics import window_distances, adaptive_thresholds
+except ImportError:
+    # src/ loaded flat (only src/ on sys.path): Jensen-Shannon only, computed locally
+    window_distances = None
+
+
+def _normalize(counts):
+    counts = np.atleast_2d(np.asarray(counts, dtype=np.float64))
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(totals > 0, counts / totals, np.nan)
+
+
+def _local_js(counts, baseline):
+    counts = np.asarray(counts, dtype=np.float64)
+    if baseline is None:
+        p, q = _normalize(counts[1:]), _normalize(counts[:-1])
+    else:
+        p = _normalize(counts)
+        q = _normalize(counts[baseline] if isinstance(baseline, (int, np.integer)) else baseline)
+    m = (p + q) / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        terms = np.where(p > 0, p * np.log(p / m), 0.0) + np.where(q > 0, q * np.log(q / m), 0.0)
+    js = np.sqrt(np.maximum(terms.sum(axis=1) / 2, 0.0))
+    # Empty windows have no distribution to compare
+    return np.where(np.isnan(p[:, 0]) | np.isnan(q[:, 0]), np.nan, js)
+
+
+def _mad(values):
+    return np.nanmedian(np.abs(values - np.nanmedian(values)))
+
 
-def detect_drift(distribution_df):
-    drift_scores = []
-    windows = distribution_df.index
+def _local_thresholds(scores, k, lookback, robust):
+    # Same rule as analysis.drift_metrics.adaptive_thresholds
+    scores = pd.Series(scores, dtype=np.float64)
+    if lookback is None:
+        if scores.notna().sum() < 2:
+            return np.full(len(scores), np.nan)
+        if robust:
+            center, spread = scores.median(), 1.4826 * _mad(scores.values)
+        else:
+            center, spread = scores.mean(), scores.std()
+        return np.full(len(scores), center + k * spread)
+    history = scores.shift(1).rolling(lookback, min_periods=2)
+    if robust:
+        center, spread = history.median(), 1.4826 * history.apply(_mad, raw=True)
+    else:
+        center, spread = history.mean(), history.std()
+    return (center + k * spread).values
 
-    for i in range(1, len(distribution_df)):
-        p = distribution_df.iloc[i - 1].values
-        q = distribution_df.iloc[i].values
-        drift_scores.append(jensenshannon(p, q))
 
-    drift_df = pd.DataFrame({
-        "window": windows[1:],
-        "drift_score": drift_scores
+def _scores(distribution_df, metric, baseline):
+    if window_distances is not None:
+        scores = window_distances(distribution_df.values, baseline=baseline, metrics=(metric,))[metric]
+    elif metric == "js":
+        scores = _local_js(distribution_df.values, baseline)
+    else:
+        raise ValueError(f"metric={metric!r} needs analysis.drift_metrics (run from the backend directory)")
+    windows = distribution_df.index if baseline is not None else distribution_df.index[1:]
+    return pd.DataFrame({
+        "window": windows,
+        "drift_score": scores
     })
 
-    threshold = drift_df['drift_score'].mean() + drift_df['drift_score'].std()
-    drift_df['drift_detected'] = drift_df['drift_score'] > threshold
 
+def _thresholds(scores, k, lookback, robust):
+    if window_distances is not None:
+        return adaptive_thresholds(scores, k=k, lookback=lookback, robust=robust)
+    return _local_thresholds(scores, k, lookback, robust)
+
+
+def _flags(scores, thresholds):
+    with np.errstate(invalid="ignore"):
+        return np.asarray(scores) > np.asarray(thresholds)
+
+
+def detect_drift(distribution_df, metric="js", baseline=None, k=1.0, robust=False):
+    """
+    Scores each window of a (windows x emotions) distribution frame against
+    the previous window (or `baseline`: a row position or a distribution)
+    and flags scores above one threshold for the whole series. Defaults
+    reproduce the original rule: Jensen-Shannon distance, threshold =
+    mean + std.
+
+    Uses analysis.drift_metrics when the backend directory is importable;
+    loaded flat from src/, only metric="js" is available.
+
+    Returns:
+        tuple: (drift_df, threshold)
+    """
+    drift_df = _scores(distribution_df, metric, baseline)
+    thresholds = _thresholds(drift_df['drift_score'].values, k, None, robust)
+    drift_df['drift_detected'] = _flags(drift_df['drift_score'].values, thresholds)
+    threshold = thresholds[0] if len(thresholds) else float("nan")
     return drift_df, threshold
+
+
+def detect_drift_trailing(distribution_df, lookback, metric="js", baseline=None, k=1.0, robust=False):
+    """
+    detect_drift() with a moving threshold learned from the `lookback`
+    scores before each window, so it follows a changing baseline.
+
+    Returns:
+        DataFrame: window, drift_score, threshold (NaN until two earlier
+            scores exist) and drift_detected.
+    """
+    drift_df = _scores(distribution_df, metric, baseline)
+    drift_df['threshold'] = _thresholds(drift_df['drift_score'].values, k, lookback, robust)
+    drift_df['drift_detected'] = _flags(drift_df['drift_score'].values, drift_df['threshold'].values)
+    return drift_df
@@ -0,0 +1,138 @@
+"""
+Checks for the incremental /drift state (db/drift_state.py).
+
+Usage (from the backend directory):
+    python test_drift_state.py
+
+Covers: the state kept up to date by the after_flush hook matches
+rebuild_drift_state() after inserts that push events across the recent
+capacity (out of order, with deletes), and the repo's committed
+storage/emotion.db upgrades through every migration.
+"""
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+# Ensure backend modules are found, and keep these checks off the real database
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), f'emotion_checks_{os.getpid()}.db')}")
+
+from core.config import settings
+from db.init_db import init_db
+from db.database import engine, SessionLocal
+from db.models import User, EmotionLog
+from db.drift_state import rebuild_drift_state, load_drift_counts
+
+LABELS = ["joy", "sadness", "anger", "fear", "love", "surprise"]
+
+
+def make_user(db) -> int:
+    user = User(email=f"{uuid.uuid4().hex}@checks.local", hashed_password="x")
+    db.add(user)
+    db.commit()
+    return user.id
+
+
+def state_of(user_id):
+    db = SessionLocal()
+    try:
+        return load_drift_counts(db, user_id)
+    finally:
+        db.close()
+
+
+def rebuilt_state_of(user_id):
+    with engine.begin() as conn:
+        rebuild_drift_state(conn, user_id)
+    return state_of(user_id)
+
+
+# -----------------------------
+# Incremental vs rebuild
+# -----------------------------
+def test_incremental_matches_rebuild():
+    init_db()
+    capacity = settings.DRIFT_RECENT_CAPACITY
+    rng = random.Random(48)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    db = SessionLocal()
+    user_id = make_user(db)
+    # Distinct timestamps in random order, flushed in uneven batches, so
+    # events land both in the recent list and behind the boundary
+    minutes = rng.sample(range(1, 100_000), capacity * 3)
+    logs = []
+    for i, minute in enumerate(minutes):
+        log = EmotionLog(user_id=user_id, text=f"m{i}", emotion=rng.choice(LABELS), confidence=0.5,
+                         created_at=now - timedelta(minutes=minute))
+        db.add(log)
+        logs.append(log)
+        if rng.random() < 0.1:
+            db.commit()
+    db.commit()
+
+    incremental = state_of(user_id)
+    assert len(incremental.recent) == capacity, len(incremental.recent)
+    newest = sorted(logs, key=lambda log: log.created_at)[-capacity:]
+    assert [code for _, code in incremental.recent] == [log.emotion_code for log in newest]
+
+    rebuilt = rebuilt_state_of(user_id)
+    assert incremental.reference == rebuilt.reference, (incremental.reference, rebuilt.reference)
+    assert incremental.recent == rebuilt.recent
+
+    # Deletes shrink the recent list; every window it still covers must agree
+    for log in rng.sample(newest, 5) + rng.sample(logs[:capacity], 5):
+        db.delete(log)
+    db.commit()
+    db.close()
+    incremental = state_of(user_id)
+    rebuilt = rebuilt_state_of(user_id)
+    assert sum(incremental.reference) + len(incremental.recent) == len(logs) - 10
+    for window in (1, 5, 10, len(incremental.recent)):
+        assert incremental.split(window) == rebuilt.split(window), window
+
+
+# -----------------------------
+# Committed database upgrade
+# -----------------------------
+def test_shipped_database_upgrades():
+    workdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(workdir, "emotion.db")
+        shutil.copy(os.path.join(BACKEND_DIR, "storage", "emotion.db"), path)
+        result = subprocess.run(
+            [sys.executable, "-m", "db.migrations"], cwd=BACKEND_DIR, capture_output=True, text=True,
+            env=dict(os.environ, DATABASE_URL=f"sqlite:///{path}")
+        )
+        assert result.returncode == 0, result.stderr
+
+        conn = sqlite3.connect(path)
+        try:
+            versions = [v for (v,) in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+            migrations = sorted(
+                name for name in os.listdir(os.path.join(BACKEND_DIR, "db", "migrations"))
+                if name.startswith("m") and name.endswith(".py")
+            )
+            assert versions == list(range(1, len(migrations) + 1)), versions
+            # Legacy text ids ('default_user', ...) belong to no user and get no state
+            kinds = {kind for (kind,) in conn.execute("SELECT DISTINCT typeof(user_id) FROM drift_states")}
+            assert kinds <= {"integer"}, kinds
+        finally:
+            conn.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} checks passed")
@@ -0,0 +1,218 @@
+"""
+Checks for the outbound HTTP client (core/http.py) against a local stub server.
+
+Usage (from the backend directory):
+    python test_http_client.py
+
+Covers: retries on GET only (POST and 4xx are never retried), the circuit
+breaker opening, half-opening for a single probe and closing or re-opening
+on its outcome, and the full-jitter backoff staying inside its bounds.
+"""
+import json
+import os
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Ensure backend modules are found
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import core.http as http
+from core.http import HttpClient, CircuitBreaker, UpstreamUnavailable
+
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """Answers each path with the statuses queued in `script`, then 200."""
+    protocol_version = "HTTP/1.1"
+    script = {}
+    hits = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._answer()
+
+    def _answer(self):
+        path = self.path.split("?")[0]
+        with self.lock:
+            self.hits[(self.command, path)] += 1
+            queued = self.script.get(path)
+            status = queued.pop(0) if queued else (503 if path == "/down" else 200)
+        body = json.dumps({"status": status}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub():
+    ScriptedHandler.script = {}
+    ScriptedHandler.hits = Counter()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ScriptedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def make_client(**options) -> HttpClient:
+    options.setdefault("retries", 3)
+    options.setdefault("backoff_base", 0.001)
+    options.setdefault("backoff_max", 0.002)
+    options.setdefault("breaker", CircuitBreaker(failure_threshold=100, reset_seconds=60))
+    return HttpClient("test", timeout=(1, 2), **options)
+
+
+# -----------------------------
+# Retries
+# -----------------------------
+def test_get_retries_transient_failures():
+    server, base = start_stub()
+    client = make_client()
+    try:
+        ScriptedHandler.script["/flaky"] = [503, 502]
+        response = client.get(f"{base}/flaky")
+        assert response.status_code == 200, response.status_code
+        assert ScriptedHandler.hits[("GET", "/flaky")] == 3, ScriptedHandler.hits
+
+        try:
+            client.get(f"{base}/down")
+            raise AssertionError("GET /down should exhaust its retries")
+        except UpstreamUnavailable:
+            pass
+        assert ScriptedHandler.hits[("GET", "/down")] == 4, ScriptedHandler.hits
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_post_is_not_retried():
+    server, base = start_stub()
+    client = make_client()
+    try:
+        try:
+            client.request("POST", f"{base}/down", json={"q": 1})
+            raise AssertionError("POST /down should fail")
+        except UpstreamUnavailable:
+            pass
+        assert ScriptedHandler.hits[("POST", "/down")] == 1, ScriptedHandler.hits
+
+        ScriptedHandler.script["/flaky"] = [503]
+        try:
+            client.request("POST", f"{base}/flaky", json={"q": 1})
+            raise AssertionError("POST /flaky should not be retried into a success")
+        except UpstreamUnavailable:
+            pass
+        assert ScriptedHandler.hits[("POST", "/flaky")] == 1, ScriptedHandler.hits
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_client_errors_are_returned_not_retried():
+    server, base = start_stub()
+    client = make_client()
+    try:
+        ScriptedHandler.script["/missing"] = [404]
+        assert client.get(f"{base}/missing").status_code == 404
+        assert ScriptedHandler.hits[("GET", "/missing")] == 1, ScriptedHandler.hits
+    finally:
+        client.close()
+        server.shutdown()
+
+
+# -----------------------------
+# Circuit breaker
+# -----------------------------
+def test_breaker_opens_and_half_opens():
+    server, base = start_stub()
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=0.2)
+    client = make_client(retries=0, breaker=breaker)
+    try:
+        for _ in range(2):
+            try:
+                client.get(f"{base}/down")
+            except UpstreamUnavailable:
+                pass
+        assert breaker.state == "open", breaker.state
+        assert ScriptedHandler.hits[("GET", "/down")] == 2
+
+        # Open: refused without reaching the upstream
+        try:
+            client.get(f"{base}/ok")
+            raise AssertionError("an open circuit should refuse calls")
+        except UpstreamUnavailable as e:
+            assert "circuit open" in str(e), e
+        assert ScriptedHandler.hits[("GET", "/ok")] == 0
+
+        # After reset_seconds exactly one probe goes through; a failed probe re-opens
+        time.sleep(0.25)
+        assert breaker.allow() and breaker.state == "half-open"
+        assert not breaker.allow(), "only one probe may run while half-open"
+        breaker.record_failure()
+        assert breaker.state == "open", breaker.state
+        try:
+            client.get(f"{base}/ok")
+            raise AssertionError("a failed probe should re-open the circuit")
+        except UpstreamUnavailable:
+            pass
+
+        # A successful probe closes it again
+        time.sleep(0.25)
+        assert client.get(f"{base}/ok").status_code == 200
+        assert breaker.state == "closed", breaker.state
+        assert ScriptedHandler.hits[("GET", "/ok")] == 1
+    finally:
+        client.close()
+        server.shutdown()
+
+
+# -----------------------------
+# Backoff
+# -----------------------------
+def test_backoff_jitter_bounds():
+    server, base = start_stub()
+    client = make_client(retries=5, backoff_base=0.1, backoff_max=0.25)
+    caps = [min(0.25, 0.1 * 2 ** attempt) for attempt in range(5)]
+    sleeps = []
+    real_time, real_random = http.time, http.random
+    http.time = types.SimpleNamespace(sleep=sleeps.append, monotonic=real_time.monotonic)
+    try:
+        for _ in range(20):
+            try:
+                client.get(f"{base}/down")
+            except UpstreamUnavailable:
+                pass
+        assert len(sleeps) == 20 * 5, len(sleeps)
+        for i, seconds in enumerate(sleeps):
+            assert 0 <= seconds <= caps[i % 5], (i % 5, seconds)
+        assert len(set(sleeps)) > 1, "backoff should be jittered"
+
+        # Upper end of the jitter range is exactly the capped exponential
+        sleeps.clear()
+        http.random = types.SimpleNamespace(uniform=lambda low, high: high)
+        try:
+            client.get(f"{base}/down")
+        except UpstreamUnavailable:
+            pass
+        assert sleeps == caps, sleeps
+    finally:
+        http.time, http.random = real_time, real_random
+        client.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} checks passed")
@@ -0,0 +1,258 @@
+"""
+Checks for the chat job queue (worker/job_queue.py) on a scratch database.
+
+Usage (from the backend directory):
+    python test_job_queue.py
+
+Covers: the compare-and-set claim when two runners go for the same job,
+stale jobs being re-queued and then failed once they run out of attempts,
+a pending cancellation winning over a shutdown release, bulk jobs aging
+into the interactive class, and fair-share ordering between users.
+"""
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Ensure backend modules are found, and keep these checks off the real database
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), f'emotion_checks_{os.getpid()}.db')}")
+
+from sqlalchemy import delete, update
+
+from core.config import settings
+from db.init_db import init_db
+from db.database import SessionLocal
+from db.models import User, ChatJob, ChatUploadChunk
+import worker.job_queue as job_queue
+from worker.scheduler import order_candidates
+from worker.job_queue import claim_next_job, request_cancel, release_job, requeue_stale_jobs, get_chat_job
+
+
+def fresh_queue():
+    """Empties the queue and returns a new user id."""
+    init_db()
+    db = SessionLocal()
+    try:
+        db.execute(delete(ChatUploadChunk))
+        db.execute(delete(ChatJob))
+        user = User(email=f"{uuid.uuid4().hex}@checks.local", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def queue_job(user_id: int, priority_class: str = "interactive", age_seconds: float = 0) -> str:
+    job_id = uuid.uuid4().hex
+    db = SessionLocal()
+    try:
+        db.add(ChatJob(job_id=job_id, user_id=user_id, status="queued", priority_class=priority_class,
+                       submitted_at=datetime.utcnow() - timedelta(seconds=age_seconds)))
+        db.commit()
+        return job_id
+    finally:
+        db.close()
+
+
+def job(job_id: str) -> ChatJob:
+    db = SessionLocal()
+    try:
+        return get_chat_job(db, job_id)
+    finally:
+        db.close()
+
+
+def go_stale(job_id: str):
+    db = SessionLocal()
+    try:
+        db.execute(update(ChatJob).where(ChatJob.job_id == job_id)
+                   .values(heartbeat_at=datetime.utcnow() - timedelta(hours=1)))
+        db.commit()
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Claiming
+# -----------------------------
+def test_claim_is_compare_and_set():
+    user_id = fresh_queue()
+    first, second = queue_job(user_id, age_seconds=2), queue_job(user_id, age_seconds=1)
+
+    # Runner B reads the queue, then runner A claims B's first choice before
+    # B's UPDATE runs: B must lose that job and take the next one
+    real_order = job_queue.order_candidates
+
+    def order_then_race(*args):
+        ordered = real_order(*args)
+        job_queue.order_candidates = real_order
+        assert claim_next_job("runner-a").job_id == ordered[0]
+        return ordered
+
+    job_queue.order_candidates = order_then_race
+    try:
+        claimed = claim_next_job("runner-b")
+    finally:
+        job_queue.order_candidates = real_order
+    assert claimed.job_id == second, claimed.job_id
+    assert job(first).worker_id == "runner-a" and job(first).attempts == 1
+    assert job(second).worker_id == "runner-b" and job(second).attempts == 1
+    assert claim_next_job("runner-a") is None
+
+
+def test_concurrent_runners_never_share_a_job():
+    user_id = fresh_queue()
+    job_ids = {queue_job(user_id, age_seconds=i) for i in range(40)}
+    claims = Counter()
+    lock = threading.Lock()
+
+    def runner(worker_id):
+        while True:
+            claimed = claim_next_job(worker_id)
+            if claimed is None:
+                return
+            with lock:
+                claims[claimed.job_id] += 1
+
+    threads = [threading.Thread(target=runner, args=(f"runner-{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(claims) == job_ids, len(claims)
+    assert set(claims.values()) == {1}, claims.most_common(1)
+
+
+# -----------------------------
+# Abandoned jobs
+# -----------------------------
+def test_stale_jobs_requeue_then_fail():
+    user_id = fresh_queue()
+    job_id = queue_job(user_id)
+    max_attempts = 2
+
+    claim_next_job("runner-a")
+    go_stale(job_id)
+    assert requeue_stale_jobs(settings.WORKER_HEARTBEAT_TIMEOUT, max_attempts) == 1
+    requeued = job(job_id)
+    assert requeued.status == "queued" and requeued.worker_id is None and requeued.attempts == 1
+
+    # The previous owner can no longer write to it
+    assert claim_next_job("runner-b").job_id == job_id
+    assert not job_queue.complete_job(job_id, "runner-a", {})
+    go_stale(job_id)
+    assert requeue_stale_jobs(settings.WORKER_HEARTBEAT_TIMEOUT, max_attempts) == 0
+    failed = job(job_id)
+    assert failed.status == "failed" and failed.attempts == max_attempts, (failed.status, failed.attempts)
+    assert failed.finished_at is not None and "abandoned" in failed.error
+
+
+def test_fresh_heartbeats_are_left_alone():
+    user_id = fresh_queue()
+    job_id = queue_job(user_id)
+    claim_next_job("runner-a")
+    assert requeue_stale_jobs(settings.WORKER_HEARTBEAT_TIMEOUT, 3) == 0
+    assert job(job_id).status == "processing"
+
+
+# -----------------------------
+# Cancellation
+# -----------------------------
+def test_cancel_beats_release():
+    user_id = fresh_queue()
+    job_id = queue_job(user_id)
+    claim_next_job("runner-a")
+    db = SessionLocal()
+    try:
+        assert request_cancel(db, job_id) == "cancelling"
+    finally:
+        db.close()
+
+    # Shutting down after the cancel request must not hand the job back
+    assert release_job(job_id, "runner-a")
+    cancelled = job(job_id)
+    assert cancelled.status == "cancelled" and cancelled.stage == "cancelled", cancelled.status
+    assert claim_next_job("runner-b") is None
+
+    # Without a cancel request the job goes back on the queue
+    other = queue_job(user_id)
+    claim_next_job("runner-a")
+    assert release_job(other, "runner-a")
+    assert job(other).status == "queued"
+
+
+def test_cancel_beats_stale_requeue():
+    user_id = fresh_queue()
+    job_id = queue_job(user_id)
+    claim_next_job("runner-a")
+    db = SessionLocal()
+    try:
+        request_cancel(db, job_id)
+    finally:
+        db.close()
+    go_stale(job_id)
+    assert requeue_stale_jobs(settings.WORKER_HEARTBEAT_TIMEOUT, 3) == 0
+    assert job(job_id).status == "cancelled"
+
+
+# -----------------------------
+# Priority classes
+# -----------------------------
+def test_bulk_jobs_age_into_interactive():
+    user_id = fresh_queue()
+    aging = settings.CHAT_BULK_AGING_SECONDS
+    young_bulk = queue_job(user_id, "bulk", age_seconds=aging / 2)
+    interactive = queue_job(user_id, "interactive")
+    assert claim_next_job("runner-a").job_id == interactive
+    assert claim_next_job("runner-a").job_id == young_bulk
+
+    user_id = fresh_queue()
+    old_bulk = queue_job(user_id, "bulk", age_seconds=aging + 5)
+    interactive = queue_job(user_id, "interactive")
+    assert claim_next_job("runner-a").job_id == old_bulk
+    claimed = job(old_bulk)
+    assert claimed.queue_wait_ms >= aging * 1000, claimed.queue_wait_ms
+    assert claim_next_job("runner-a").job_id == interactive
+
+
+# -----------------------------
+# Fair share
+# -----------------------------
+def test_users_take_turns():
+    now = datetime.utcnow()
+    queued = [
+        ("a1", 1, "interactive", now - timedelta(seconds=40)),
+        ("a2", 1, "interactive", now - timedelta(seconds=30)),
+        ("a3", 1, "interactive", now - timedelta(seconds=20)),
+        ("b1", 2, "interactive", now - timedelta(seconds=10)),
+        ("c1", 3, "bulk", now - timedelta(seconds=5)),
+    ]
+    assert order_candidates(queued, {}, now) == ["a1", "b1", "a2", "a3", "c1"]
+    # Jobs already running count against their owner's share
+    assert order_candidates(queued, {1: 1}, now) == ["b1", "a1", "a2", "a3", "c1"]
+    assert order_candidates(queued, {2: 3}, now) == ["a1", "a2", "a3", "b1", "c1"]
+
+
+def test_claims_follow_fair_share():
+    heavy, light = fresh_queue(), fresh_queue()
+    backlog = [queue_job(heavy, age_seconds=60 - i) for i in range(3)]
+    late = queue_job(light, age_seconds=1)
+
+    assert claim_next_job("runner-a").job_id == backlog[0]
+    # The heavy user now has a job running, so the light user goes next
+    assert claim_next_job("runner-b").job_id == late
+    assert [claim_next_job("runner-a").job_id for _ in backlog[1:]] == backlog[1:]
+    assert claim_next_job("runner-a") is None
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} checks passed")
@@ -0,0 +1,179 @@
+"""
+Checks for the hourly emotion rollup (db/rollup.py) behind emotion_counts_stmt().
+
+Usage (from the backend directory):
+    python test_rollup.py
+
+Covers: rollup-served counts match a raw GROUP BY over the log tables
+for ranges whose edges fall inside an hour or on an hour, and still match
+once old months have moved to cold storage (archived_before widens edges
+in archived months to whole hours). The archive check needs pyarrow.
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+
+# Ensure backend modules are found, and keep these checks off the real database
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), f'emotion_checks_{os.getpid()}.db')}")
+
+from sqlalchemy import select, func
+
+from core.config import settings
+from core.emotions import UNKNOWN
+from db.init_db import init_db
+from db.database import SessionLocal
+from db.models import User, EmotionLog, FaceEmotionLog
+from db.rollup import hour_of, hour_start
+from db.archive import archive_logs, archive_horizon_stmt
+from analysis.emotion_queries import emotion_counts_stmt, emotion_label
+
+# "neutral" has no code: it lands in UNKNOWN
+LABELS = ["joy", "sadness", "anger", "fear", "love", "surprise", "neutral"]
+NOW = datetime(2026, 3, 15, 12, 0)
+
+
+def seed(db, rng, days: int = 90, count: int = 1500) -> int:
+    user = User(email=f"{uuid.uuid4().hex}@checks.local", hashed_password="x")
+    db.add(user)
+    db.commit()
+
+    start = NOW - timedelta(days=days)
+    for i in range(count):
+        ts = start + timedelta(seconds=rng.randrange(days * 86400), microseconds=rng.randrange(1_000_000))
+        if i % 50 == 0:
+            # Last instant of an hour and the first of the next
+            ts = ts.replace(minute=59, second=59, microsecond=999_999) if i % 100 else ts.replace(minute=0, second=0, microsecond=0)
+        confidence = rng.random()
+        if i % 3:
+            db.add(EmotionLog(user_id=user.id, text=f"m{i}", emotion=rng.choice(LABELS), confidence=confidence,
+                              created_at=ts, source="chat" if i % 7 == 0 else "text",
+                              source_key=f"{user.id}:{i}" if i % 7 == 0 else None))
+        else:
+            db.add(FaceEmotionLog(user_id=user.id, emotion=rng.choice(LABELS), confidence=confidence, timestamp=ts))
+        if i % 200 == 0:
+            db.commit()
+    db.commit()
+    return user.id
+
+
+def raw_counts(db, user_id, since, until, sources, exclude_unknown) -> dict:
+    """{emotion: (count, avg confidence)} straight from the log tables."""
+    counts = {}
+    for model, ts_column in ((EmotionLog, EmotionLog.created_at), (FaceEmotionLog, FaceEmotionLog.timestamp)):
+        if (model is EmotionLog and "text" not in sources) or (model is FaceEmotionLog and "face" not in sources):
+            continue
+        stmt = select(
+            emotion_label(model.emotion_code), func.count(), func.sum(model.confidence)
+        ).where(model.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(ts_column >= since)
+        if until is not None:
+            stmt = stmt.where(ts_column < until)
+        if exclude_unknown:
+            stmt = stmt.where(model.emotion_code != UNKNOWN)
+        for emotion, n, confidence_sum in db.execute(stmt.group_by(model.emotion_code)):
+            total = counts.setdefault(emotion, [0, 0.0])
+            total[0] += n
+            total[1] += confidence_sum
+    return {emotion: (n, confidence_sum / n) for emotion, (n, confidence_sum) in counts.items()}
+
+
+def served_counts(db, user_id, since, until, sources, exclude_unknown, archived_before=None) -> dict:
+    rows = db.execute(emotion_counts_stmt(user_id, since, until, sources, exclude_unknown, archived_before)).all()
+    return {row.emotion: (row.count, row.avg_confidence) for row in rows}
+
+
+def assert_same(served, raw, context):
+    assert {e: n for e, (n, _) in served.items()} == {e: n for e, (n, _) in raw.items()}, (context, served, raw)
+    for emotion, (_, avg) in raw.items():
+        assert abs(served[emotion][1] - avg) < 1e-9, (context, emotion, served[emotion][1], avg)
+
+
+def edges(rng, start, end):
+    """Random ranges: mid-hour, on the hour, inside one hour and open-ended."""
+    span = int((end - start).total_seconds())
+    for _ in range(40):
+        a = start + timedelta(seconds=rng.randrange(span), microseconds=rng.randrange(1_000_000))
+        b = a + timedelta(seconds=rng.randrange(1, span // 3))
+        yield a, b
+        yield hour_start(hour_of(a)), hour_start(hour_of(b))
+        yield a, a + timedelta(minutes=rng.randrange(1, 50))
+    yield None, None
+    yield a, None
+    yield None, b
+
+
+# -----------------------------
+# Partial-hour edges
+# -----------------------------
+def test_rollup_matches_raw_group_by():
+    init_db()
+    rng = random.Random(37)
+    db = SessionLocal()
+    try:
+        user_id = seed(db, rng)
+        for since, until in edges(rng, NOW - timedelta(days=95), NOW + timedelta(days=1)):
+            for sources in (("text",), ("face",), ("text", "face")):
+                for exclude_unknown in (True, False):
+                    context = (since, until, sources, exclude_unknown)
+                    assert_same(served_counts(db, user_id, since, until, sources, exclude_unknown),
+                                raw_counts(db, user_id, since, until, sources, exclude_unknown), context)
+    finally:
+        db.close()
+
+
+# -----------------------------
+# Archived months
+# -----------------------------
+def widen(since, until, horizon):
+    """The range emotion_counts_stmt(archived_before=horizon) actually reads."""
+    if since is not None and since < horizon:
+        since = hour_start(hour_of(since))
+    if until is not None and until < horizon:
+        until = hour_start(hour_of(until) + (hour_start(hour_of(until)) < until))
+    return since, until
+
+
+def test_rollup_matches_raw_after_archiving():
+    init_db()
+    rng = random.Random(4337)
+    archive_dir, settings.ARCHIVE_DIR = settings.ARCHIVE_DIR, tempfile.mkdtemp()
+    db = SessionLocal()
+    try:
+        user_id = seed(db, rng)
+        ranges = list(edges(rng, NOW - timedelta(days=95), NOW + timedelta(days=1)))
+
+        # Raw answers taken while every row is still in the database, with
+        # edges in archived months rounded the way the query will round them
+        horizon = datetime(2026, 2, 1)
+        expected = {}
+        for since, until in ranges:
+            for sources in (("text",), ("text", "face")):
+                expected[since, until, sources] = raw_counts(db, user_id, *widen(since, until, horizon), sources, False)
+
+        parts = archive_logs(older_than_days=30, user_id=user_id, now=NOW)
+        assert parts, "nothing was archived"
+        assert db.execute(archive_horizon_stmt(user_id)).scalar() == horizon
+        left = db.execute(select(func.min(FaceEmotionLog.timestamp)).where(FaceEmotionLog.user_id == user_id)).scalar()
+        assert left >= horizon, left
+
+        for (since, until, sources), raw in expected.items():
+            served = served_counts(db, user_id, since, until, sources, False, archived_before=horizon)
+            assert_same(served, raw, (since, until, sources))
+    finally:
+        db.close()
+        shutil.rmtree(settings.ARCHIVE_DIR, ignore_errors=True)
+        settings.ARCHIVE_DIR = archive_dir
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"PASS {test.__name__}")
+    print(f"{len(tests)} checks passed")
@@ -0,0 +1,49 @@
+"""
+Standalone chat-analysis worker.
+
+Usage (from the backend directory):
+    python -m worker [--concurrency N] [--poll-interval SECONDS]
+
+Runs inference with its own model instance, isolated from the web workers,
+and claims jobs from the shared `chat_jobs` table.
+"""
+import argparse
+import signal
+import threading
+
+from core.config import settings
+from db.init_db import init_db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat-analysis job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    parser.add_argument("--poll-interval", type=float, default=settings.WORKER_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    if settings.WORKER_TORCH_THREADS > 0:
+        import torch
+        torch.set_num_threads(settings.WORKER_TORCH_THREADS)
+
+    init_db()
+
+    # Imported after torch is configured: loading the runner loads the model.
+    from worker.runner import JobRunner
+
+    runner = JobRunner(concurrency=args.concurrency, poll_interval=args.poll_interval)
+    shutdown = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"Received signal {signum}, shutting down gracefully...")
+        shutdown.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    runner.start()
+    shutdown.wait()
+    runner.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Background drift monitoring: turns drift_states into drift_alerts.
+
+Usage (from the backend directory):
+    python -m worker.drift_monitor      # one cycle, then print its metrics
+
+Every write bumps the user's drift_states.version (db/drift_state.py); a
+cycle evaluates only users whose version moved since their last check. They
+are claimed in batches (UPDATE ... SET checked_version = version, returning
+the state), so concurrent monitors in several processes never evaluate the
+same change twice. Batches run on a thread pool; each one scores its users
+with one vectorized call, drops alerts repeating the same shift for a user
+within DRIFT_ALERT_COOLDOWN_MINUTES, and bulk-inserts the rest in the
+claim's transaction. A failed batch rolls back its claim and is retried on
+the next cycle.
+
+The standalone job runner (python -m worker) checks for changed states
+every DRIFT_MONITOR_INTERVAL seconds with one EXISTS query and runs a cycle
+when there are any. The versions live in the database, so writes from
+every web and worker process are seen.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import select, update, insert, or_, exists, bindparam
+
+from core.config import settings
+from core.emotions import label_of
+from db.database import engine as default_engine
+from db.drift_state import DriftCounts
+from db.models import DriftState, DriftAlert
+from analysis.drift import detect_distribution_drift_batch
+
+_DIRTY = or_(DriftState.checked_version.is_(None), DriftState.checked_version != DriftState.version)
+
+
+def dirty_users(conn) -> list:
+    """Users whose drift state changed since the monitor last evaluated it."""
+    return list(conn.execute(select(DriftState.user_id).where(_DIRTY).order_by(DriftState.user_id)).scalars())
+
+
+def has_changes(engine=None) -> bool:
+    """Whether any user's drift state changed since the monitor last evaluated it."""
+    with (engine or default_engine).connect() as conn:
+        return bool(conn.execute(select(exists().where(_DIRTY))).scalar())
+
+
+def _claim(conn, user_ids) -> list:
+    columns = (DriftState.user_id, DriftState.reference_counts, DriftState.recent, DriftState.boundary)
+    if conn.dialect.update_returning:
+        return conn.execute(
+            update(DriftState)
+            .where(DriftState.user_id.in_(user_ids), _DIRTY)
+            .values(checked_version=DriftState.version)
+            .returning(*columns)
+        ).all()
+
+    rows = conn.execute(
+        select(*columns, DriftState.version).where(DriftState.user_id.in_(user_ids), _DIRTY).with_for_update()
+    ).all()
+    if rows:
+        conn.execute(
+            update(DriftState).where(DriftState.user_id == bindparam("uid")).values(checked_version=bindparam("seen")),
+            [{"uid": row.user_id, "seen": row.version} for row in rows]
+        )
+    return rows
+
+
+def evaluate_batch(user_ids, window: int, cooldown: timedelta, now: datetime, engine=None) -> dict:
+    """Claims, scores and alerts one batch of users in a single transaction."""
+    engine = engine or default_engine
+    with engine.begin() as conn:
+        rows = _claim(conn, user_ids)
+
+        evaluated, olds, news = [], [], []
+        for row in rows:
+            codes = DriftCounts.from_row(row).split_codes(window)
+            if codes is None or sum(codes[0]) + sum(codes[1]) < window * 2:
+                continue
+            evaluated.append(row.user_id)
+            olds.append(codes[0])
+            news.append(codes[1])
+
+        shifts = []
+        if evaluated:
+            drift, dominant_old, dominant_new, severity = detect_distribution_drift_batch(olds, news)
+            for i in np.flatnonzero(drift):
+                shifts.append((evaluated[i], label_of(int(dominant_old[i])), label_of(int(dominant_new[i])),
+                               float(severity[i])))
+
+        alerts = []
+        if shifts:
+            cooling = set(conn.execute(
+                select(DriftAlert.user_id, DriftAlert.from_emotion, DriftAlert.to_emotion)
+                .where(DriftAlert.user_id.in_([s[0] for s in shifts]), DriftAlert.created_at >= now - cooldown)
+                .distinct()
+            ).all())
+            alerts = [
+                {"user_id": uid, "from_emotion": old, "to_emotion": new, "severity": severity, "created_at": now}
+                for uid, old, new, severity in shifts if (uid, old, new) not in cooling
+            ]
+            if alerts:
+                conn.execute(insert(DriftAlert), alerts)
+
+    return {
+        "scanned": len(rows),
+        "evaluated": len(evaluated),
+        "drifting": len(shifts),
+        "alerts": len(alerts)
+    }
+
+
+def run_drift_cycle(engine=None, window: int = None, batch_size: int = None, workers: int = None,
+                    cooldown_minutes: float = None) -> dict:
+    """
+    One monitoring pass over every user with new logs.
+
+    Returns:
+        dict: users_scanned (claimed this cycle), users_evaluated (enough
+            events to compare), users_drifting, alerts_raised,
+            alerts_suppressed (inside the cooldown), batches, failed_batches,
+            cycle_seconds.
+    """
+    engine = engine or default_engine
+    window = window or settings.DRIFT_MONITOR_WINDOW
+    batch_size = batch_size or settings.DRIFT_MONITOR_BATCH_SIZE
+    workers = workers or settings.DRIFT_MONITOR_WORKERS
+    cooldown = timedelta(minutes=settings.DRIFT_ALERT_COOLDOWN_MINUTES if cooldown_minutes is None else cooldown_minutes)
+    start = time.perf_counter()
+    now = datetime.utcnow()
+
+    with engine.connect() as conn:
+        users = dirty_users(conn)
+    batches = [users[i:i + batch_size] for i in range(0, len(users), batch_size)]
+
+    def run(batch):
+        try:
+            return evaluate_batch(batch, window, cooldown, now, engine)
+        except Exception as e:
+            print(f"[drift-monitor] batch of {len(batch)} users failed: {e}")
+            return None
+
+    if len(batches) > 1 and workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="drift-eval") as pool:
+            results = list(pool.map(run, batches))
+    else:
+        results = [run(batch) for batch in batches]
+
+    done = [r for r in results if r is not None]
+    drifting = sum(r["drifting"] for r in done)
+    raised = sum(r["alerts"] for r in done)
+    return {
+        "users_scanned": sum(r["scanned"] for r in done),
+        "users_evaluated": sum(r["evaluated"] for r in done),
+        "users_drifting": drifting,
+        "alerts_raised": raised,
+        "alerts_suppressed": drifting - raised,
+        "batches": len(batches),
+        "failed_batches": len(results) - len(done),
+        "cycle_seconds": round(time.perf_counter() - start, 3)
+    }
+
+
+def format_metrics(metrics: dict) -> str:
+    return (f"scanned {metrics['users_scanned']} user(s), evaluated {metrics['users_evaluated']}, "
+            f"raised {metrics['alerts_raised']} alert(s) ({metrics['alerts_suppressed']} in cooldown), "
+            f"{metrics['batches']} batch(es) ({metrics['failed_batches']} failed) in {metrics['cycle_seconds']:.3f}s")
+
+
+def main():
+    from db.init_db import init_db
+    init_db()
+    print(f"[drift-monitor] {format_metrics(run_drift_cycle())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, delete, insert, select, func, and_
+
+from core.config import settings
+from db.database import SessionLocal
+from db.models import ChatJob, ChatUploadChunk
+from worker.scheduler import PRIORITY_CLASSES, classify_upload, order_candidates
+
+# Queued jobs the scheduler looks at per claim, oldest first
+SCHEDULER_WINDOW = 200
+
+
+# -----------------------------
+# Producer side (web process)
+# -----------------------------
+def enqueue_chat_job(db, job_id: str, user_id: int, upload, upload_size: int, content_hash: str = None,
+                     persist_history: bool = False) -> ChatJob:
+    """
+    Stores the spooled upload as fixed-size chunks and queues the job,
+    both in one transaction so a runner never claims a half-written upload.
+
+    Args:
+        upload: Readable binary file positioned at the start of the archive.
+        upload_size: Total size in bytes.
+        content_hash: sha256 of the archive, used to reuse earlier analyses.
+        persist_history: Also write the analyzed messages to `emotion_logs`.
+    """
+    job = ChatJob(
+        job_id=job_id,
+        user_id=user_id,
+        status="queued",
+        priority_class=classify_upload(upload_size),
+        persist_history=persist_history,
+        progress=0,
+        event_seq=0,
+        upload_size=upload_size,
+        content_hash=content_hash,
+        submitted_at=datetime.utcnow()
+    )
+    db.add(job)
+    db.flush()
+
+    # Core inserts, one chunk at a time: the session never holds the whole file
+    seq = 0
+    while True:
+        data = upload.read(settings.CHAT_UPLOAD_CHUNK_SIZE)
+        if not data:
+            break
+        db.execute(insert(ChatUploadChunk).values(job_id=job_id, seq=seq, data=data))
+        seq += 1
+
+    db.commit()
+    return job
+
+
+def record_reused_job(db, job_id: str, user_id: int, upload_size: int, content_hash: str, result: dict) -> ChatJob:
+    """
+    Records an upload whose result is already known as a completed job, so
+    clients follow the same status/SSE flow without anything being queued.
+    """
+    now = datetime.utcnow()
+    job = ChatJob(
+        job_id=job_id,
+        user_id=user_id,
+        status="completed",
+        priority_class=classify_upload(upload_size),
+        progress=100,
+        stage="done",
+        event_seq=1,
+        upload_size=upload_size,
+        content_hash=content_hash,
+        result=result,
+        submitted_at=now,
+        started_at=now,
+        finished_at=now,
+        queue_wait_ms=0
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def get_chat_job(db, job_id: str):
+    return db.query(ChatJob).filter(ChatJob.job_id == job_id).first()
+
+
+def request_cancel(db, job_id: str) -> str:
+    """
+    Cancels a queued job immediately; flags a running one so its runner
+    stops after the current inference chunk.
+
+    Returns:
+        str: "cancelled", "cancelling", or the job's status if it already finished.
+    """
+    now = datetime.utcnow()
+    cancelled = db.execute(
+        update(ChatJob)
+        .where(ChatJob.job_id == job_id, ChatJob.status == "queued")
+        .values(status="cancelled", stage="cancelled", finished_at=now, event_seq=ChatJob.event_seq + 1)
+    ).rowcount
+    if cancelled:
+        db.execute(delete(ChatUploadChunk).where(ChatUploadChunk.job_id == job_id))
+        db.commit()
+        return "cancelled"
+
+    flagged = db.execute(
+        update(ChatJob)
+        .where(ChatJob.job_id == job_id, ChatJob.status == "processing")
+        .values(cancel_requested=True, stage="cancelling", event_seq=ChatJob.event_seq + 1)
+    ).rowcount
+    db.commit()
+    if flagged:
+        return "cancelling"
+    return db.query(ChatJob.status).filter(ChatJob.job_id == job_id).scalar()
+
+
+def queue_metrics(db, user_id: int, window_hours: int = 24) -> dict:
+    """
+    Per priority class, over `user_id`'s jobs: current queue depth, running
+    jobs, the age of the oldest queued job, and queue-wait statistics for
+    jobs claimed within the window.
+    """
+    now = datetime.utcnow()
+    since = now - timedelta(hours=window_hours)
+    metrics = {}
+    for priority_class in PRIORITY_CLASSES:
+        of_class = and_(ChatJob.user_id == user_id, ChatJob.priority_class == priority_class)
+        queued, oldest = (
+            db.query(func.count(ChatJob.job_id), func.min(ChatJob.submitted_at))
+            .filter(of_class, ChatJob.status == "queued")
+            .one()
+        )
+        running = db.query(func.count(ChatJob.job_id)).filter(of_class, ChatJob.status == "processing").scalar()
+        waits = sorted(
+            wait for (wait,) in
+            db.query(ChatJob.queue_wait_ms)
+            .filter(of_class, ChatJob.started_at >= since, ChatJob.queue_wait_ms.isnot(None))
+            .all()
+        )
+
+        def percentile(p):
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else None
+
+        metrics[priority_class] = {
+            "queued": queued,
+            "processing": running,
+            "oldest_queued_ms": int((now - oldest).total_seconds() * 1000) if oldest else None,
+            "claimed": len(waits),
+            "wait_ms_avg": int(sum(waits) / len(waits)) if waits else None,
+            "wait_ms_p50": percentile(0.50),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": waits[-1] if waits else None
+        }
+    return {"window_hours": window_hours, "classes": metrics}
+
+
+# -----------------------------
+# Consumer side (job runners)
+# -----------------------------
+def claim_next_job(worker_id: str):
+    """
+    Atomically moves the next scheduled job to "processing" for this worker.
+
+    Candidates are ordered by the fair-share scheduler (priority class, then
+    per-user share, then age). The claim is a compare-and-set UPDATE guarded
+    by status = 'queued', so concurrent runners (threads or separate
+    processes) never share a job. Works the same on SQLite and Postgres
+    without row locks.
+
+    Returns:
+        ChatJob or None: The claimed job (detached), or None if the queue is empty.
+    """
+    db = SessionLocal()
+    try:
+        queued = (
+            db.query(ChatJob.job_id, ChatJob.user_id, ChatJob.priority_class, ChatJob.submitted_at)
+            .filter(ChatJob.status == "queued")
+            .order_by(ChatJob.submitted_at.asc())
+            .limit(SCHEDULER_WINDOW)
+            .all()
+        )
+        if not queued:
+            return None
+        running_by_user = dict(
+            db.query(ChatJob.user_id, func.count(ChatJob.job_id))
+            .filter(ChatJob.status == "processing")
+            .group_by(ChatJob.user_id)
+            .all()
+        )
+        submitted = {job_id: submitted_at for job_id, _, _, submitted_at in queued}
+
+        now = datetime.utcnow()
+        for job_id in order_candidates(queued, running_by_user, now)[:5]:
+            now = datetime.utcnow()
+            waited = now - (submitted[job_id] or now)
+            claimed = db.execute(
+                update(ChatJob)
+                .where(ChatJob.job_id == job_id, ChatJob.status == "queued")
+                .values(
+                    status="processing",
+                    stage="starting",
+                    event_seq=ChatJob.event_seq + 1,
+                    worker_id=worker_id,
+                    attempts=ChatJob.attempts + 1,
+                    heartbeat_at=now,
+                    started_at=now,
+                    queue_wait_ms=int(waited.total_seconds() * 1000)
+                )
+            ).rowcount
+            db.commit()
+            if claimed == 1:
+                job = get_chat_job(db, job_id)
+                db.expunge(job)
+                return job
+        return None
+    finally:
+        db.close()
+
+
+def copy_upload_to(job_id: str, dest):
+    """Streams a job's stored upload chunks into a writable binary file."""
+    db = SessionLocal()
+    try:
+        chunks = (
+            db.query(ChatUploadChunk.data)
+            .filter(ChatUploadChunk.job_id == job_id)
+            .order_by(ChatUploadChunk.seq.asc())
+            .yield_per(1)
+        )
+        for (data,) in chunks:
+            dest.write(data)
+    finally:
+        db.close()
+
+
+def purge_finished_uploads() -> int:
+    """Deletes upload chunks left behind by jobs that ended without their runner cleaning up."""
+    finished = select(ChatJob.job_id).where(ChatJob.status.in_(("completed", "failed", "cancelled")))
+    db = SessionLocal()
+    try:
+        deleted = db.execute(delete(ChatUploadChunk).where(ChatUploadChunk.job_id.in_(finished))).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+
+def delete_upload(job_id: str):
+    db = SessionLocal()
+    try:
+        db.execute(delete(ChatUploadChunk).where(ChatUploadChunk.job_id == job_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _update_owned(job_id: str, owner: str, *conditions, **values) -> bool:
+    # Only the current owner may write; a job that was re-claimed after a
+    # missed heartbeat silently ignores updates from its previous owner.
+    db = SessionLocal()
+    try:
+        updated = db.execute(
+            update(ChatJob)
+            .where(
+                ChatJob.job_id == job_id,
+                ChatJob.worker_id == owner,
+                ChatJob.status == "processing",
+                *conditions
+            )
+            .values(event_seq=ChatJob.event_seq + 1, **values)
+        ).rowcount
+        db.commit()
+        return updated == 1
+    finally:
+        db.close()
+
+
+def report_progress(job_id: str, worker_id: str, progress: int, stage: str = None, partial: dict = None) -> bool:
+    values = {"progress": progress, "heartbeat_at": datetime.utcnow()}
+    if stage is not None:
+        values["stage"] = stage
+    if partial is not None:
+        values["partial"] = partial
+    # Refused once cancellation is requested, so the "cancelling" stage sticks
+    return _update_owned(job_id, worker_id, ChatJob.cancel_requested.isnot(True), **values)
+
+
+def cancel_requested(job_id: str) -> bool:
+    db = SessionLocal()
+    try:
+        return bool(db.query(ChatJob.cancel_requested).filter(ChatJob.job_id == job_id).scalar())
+    finally:
+        db.close()
+
+
+def heartbeat(job_ids, worker_id: str):
+    if not job_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(ChatJob)
+            .where(
+                ChatJob.job_id.in_(list(job_ids)),
+                ChatJob.worker_id == worker_id,
+                ChatJob.status == "processing"
+            )
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def complete_job(job_id: str, worker_id: str, result: dict) -> bool:
+    return _update_owned(
+        job_id, worker_id,
+        status="completed", stage="done", progress=100, result=result, finished_at=datetime.utcnow()
+    )
+
+
+def fail_job(job_id: str, worker_id: str, error: str) -> bool:
+    return _update_owned(
+        job_id, worker_id,
+        status="failed", error=error, finished_at=datetime.utcnow()
+    )
+
+
+def cancel_job(job_id: str, worker_id: str) -> bool:
+    return _update_owned(
+        job_id, worker_id,
+        status="cancelled", stage="cancelled", finished_at=datetime.utcnow()
+    )
+
+
+def release_job(job_id: str, worker_id: str) -> bool:
+    """Hands a job back to the queue (used on shutdown before it finished)."""
+    if _update_owned(job_id, worker_id, ChatJob.cancel_requested.is_(True),
+                     status="cancelled", stage="cancelled", finished_at=datetime.utcnow()):
+        return True
+    return _update_owned(job_id, worker_id, status="queued", stage=None, worker_id=None, heartbeat_at=None)
+
+
+def requeue_stale_jobs(timeout_seconds: int, max_attempts: int) -> int:
+    """
+    Re-queues jobs whose runner stopped heart-beating (crashed or killed).
+    Jobs that already used up their attempts are failed instead of retried,
+    and jobs with a pending cancellation are cancelled.
+
+    Returns:
+        int: Number of jobs put back on the queue.
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=timeout_seconds)
+    stale = (
+        ChatJob.status == "processing",
+        ChatJob.heartbeat_at < cutoff
+    )
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(ChatJob)
+            .where(*stale, ChatJob.cancel_requested.is_(True))
+            .values(
+                status="cancelled",
+                stage="cancelled",
+                finished_at=datetime.utcnow(),
+                event_seq=ChatJob.event_seq + 1
+            )
+        )
+        db.execute(
+            update(ChatJob)
+            .where(*stale, ChatJob.attempts >= max_attempts)
+            .values(
+                status="failed",
+                error="Job abandoned by its worker too many times",
+                finished_at=datetime.utcnow(),
+                event_seq=ChatJob.event_seq + 1
+            )
+        )
+        requeued = db.execute(
+            update(ChatJob)
+            .where(*stale, ChatJob.attempts < max_attempts)
+            .values(status="queued", stage=None, worker_id=None, heartbeat_at=None, event_seq=ChatJob.event_seq + 1)
+        ).rowcount
+        db.commit()
+        return requeued
+    finally:
+        db.close()
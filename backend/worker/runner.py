@@ -0,0 +1,229 @@
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+from core.config import settings
+from worker import job_queue
+from analysis.chat_analysis import ChatAnalysisError
+from analysis.chat_store import analyze_chat_with_reuse, purge_retired_analyses
+from db.archive import archive_logs
+from worker.drift_monitor import has_changes, run_drift_cycle, format_metrics
+
+
+class JobLost(Exception):
+    """Raised inside a job when another runner has taken ownership of it."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job, between inference chunks, once its owner cancelled it."""
+
+
+class JobRunner:
+    """
+    Claims chat-analysis jobs from the shared `chat_jobs` queue and runs them
+    on a fixed number of threads.
+
+    The same runner backs both execution modes: embedded in the web process
+    (CHAT_WORKER_MODE="inline") and standalone via `python -m worker`.
+    A supervisor thread keeps heartbeats fresh for running jobs and re-queues
+    jobs abandoned by crashed runners; with ARCHIVE_AFTER_DAYS set, another
+    thread moves old logs to cold storage every ARCHIVE_INTERVAL_HOURS, and
+    with `drift_monitor` and DRIFT_MONITOR_INTERVAL set, one raises drift
+    alerts (standalone runners only, unless DRIFT_MONITOR_INLINE).
+    """
+
+    def __init__(self, concurrency: int = None, poll_interval: float = None, worker_id: str = None,
+                 drift_monitor: bool = True):
+        self.concurrency = concurrency or settings.WORKER_CONCURRENCY
+        self.drift_monitor = drift_monitor
+        self.poll_interval = poll_interval or settings.WORKER_POLL_INTERVAL
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._stop = threading.Event()
+        self._threads = []
+        self._active = {}  # job_id -> thread name
+        self._lock = threading.Lock()
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def start(self):
+        for i in range(self.concurrency):
+            t = threading.Thread(target=self._work_loop, name=f"chat-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+        supervisor = threading.Thread(target=self._supervise_loop, name="chat-worker-supervisor", daemon=True)
+        supervisor.start()
+        self._threads.append(supervisor)
+
+        if settings.ARCHIVE_AFTER_DAYS > 0:
+            archiver = threading.Thread(target=self._archive_loop, name="log-archiver", daemon=True)
+            archiver.start()
+            self._threads.append(archiver)
+
+        if self.drift_monitor and settings.DRIFT_MONITOR_INTERVAL > 0:
+            monitor = threading.Thread(target=self._drift_monitor_loop, name="drift-monitor", daemon=True)
+            monitor.start()
+            self._threads.append(monitor)
+        print(f"[worker {self.worker_id}] started with concurrency={self.concurrency}")
+
+    def stop(self, grace: float = None):
+        """
+        Stops claiming new jobs and waits up to `grace` seconds for running
+        jobs to finish. Jobs still running afterwards are released back to
+        the queue so another runner can pick them up.
+        """
+        grace = settings.WORKER_SHUTDOWN_GRACE if grace is None else grace
+        self._stop.set()
+
+        deadline = time.monotonic() + grace
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.monotonic()))
+
+        with self._lock:
+            unfinished = list(self._active)
+        for job_id in unfinished:
+            if job_queue.release_job(job_id, self.worker_id):
+                print(f"[worker {self.worker_id}] released unfinished job {job_id}")
+        print(f"[worker {self.worker_id}] stopped")
+
+    # -----------------------------
+    # Loops
+    # -----------------------------
+    def _work_loop(self):
+        while not self._stop.is_set():
+            try:
+                job = job_queue.claim_next_job(self.worker_id)
+            except Exception as e:
+                print(f"[worker {self.worker_id}] claim failed: {e}")
+                job = None
+
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            with self._lock:
+                self._active[job.job_id] = threading.current_thread().name
+            try:
+                self._execute(job)
+            finally:
+                with self._lock:
+                    self._active.pop(job.job_id, None)
+
+    def _supervise_loop(self):
+        interval = max(1.0, settings.WORKER_HEARTBEAT_TIMEOUT / 3)
+        while not self._stop.wait(interval):
+            try:
+                with self._lock:
+                    running = list(self._active)
+                job_queue.heartbeat(running, self.worker_id)
+
+                requeued = job_queue.requeue_stale_jobs(
+                    settings.WORKER_HEARTBEAT_TIMEOUT, settings.WORKER_MAX_ATTEMPTS
+                )
+                if requeued:
+                    print(f"[worker {self.worker_id}] re-queued {requeued} abandoned job(s)")
+                job_queue.purge_finished_uploads()
+                purge_retired_analyses()
+            except Exception as e:
+                print(f"[worker {self.worker_id}] supervisor error: {e}")
+
+    def _archive_loop(self):
+        # Its own thread: a large first archival run must not delay heartbeats.
+        # Concurrent runners are safe, a part whose rows were already moved rolls back.
+        while True:
+            try:
+                parts = archive_logs()
+                if parts:
+                    print(f"[worker {self.worker_id}] archived {sum(p['row_count'] for p in parts)} "
+                          f"log rows into {len(parts)} file(s)")
+            except Exception as e:
+                print(f"[worker {self.worker_id}] archival error: {e}")
+            if self._stop.wait(settings.ARCHIVE_INTERVAL_HOURS * 3600):
+                return
+
+    def _drift_monitor_loop(self):
+        # Ingest is signalled through the database: every write bumps
+        # drift_states.version, whichever process made it. Writes between
+        # two checks are evaluated together in one cycle.
+        while True:
+            try:
+                if has_changes():
+                    metrics = run_drift_cycle()
+                    if metrics["users_scanned"] or metrics["failed_batches"]:
+                        print(f"[worker {self.worker_id}] drift monitor: {format_metrics(metrics)}")
+            except Exception as e:
+                print(f"[worker {self.worker_id}] drift monitor error: {e}")
+            if self._stop.wait(settings.DRIFT_MONITOR_INTERVAL):
+                return
+
+    # -----------------------------
+    # Job execution
+    # -----------------------------
+    def _execute(self, job):
+        job_id = job.job_id
+        finished = False
+
+        last = {"progress": None, "stage": None}
+
+        def on_progress(progress: int, stage: str = None, partial: dict = None):
+            # Called between inference chunks. Only write when something a
+            # client can see changed, but look for cancellation every time.
+            if progress == last["progress"] and stage == last["stage"]:
+                if job_queue.cancel_requested(job_id):
+                    raise JobCancelled(job_id)
+                return
+            last.update(progress=progress, stage=stage)
+            if not job_queue.report_progress(job_id, self.worker_id, progress, stage=stage, partial=partial):
+                if job_queue.cancel_requested(job_id):
+                    raise JobCancelled(job_id)
+                raise JobLost(job_id)
+
+        try:
+            # Spool the stored upload to a local temp file; zipfile needs a seekable source
+            with tempfile.TemporaryFile(suffix=".zip") as archive:
+                job_queue.copy_upload_to(job_id, archive)
+                archive.seek(0)
+                result = analyze_chat_with_reuse(
+                    job.user_id, job.content_hash, archive, on_progress,
+                    persist_history=bool(job.persist_history)
+                )
+            finished = job_queue.complete_job(job_id, self.worker_id, result)
+        except JobLost:
+            print(f"[worker {self.worker_id}] job {job_id} was taken over, dropping it")
+        except JobCancelled:
+            finished = job_queue.cancel_job(job_id, self.worker_id)
+        except ChatAnalysisError as e:
+            finished = job_queue.fail_job(job_id, self.worker_id, str(e))
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            finished = job_queue.fail_job(job_id, self.worker_id, str(e))
+
+        if finished:
+            job_queue.delete_upload(job_id)
+
+
+# -----------------------------
+# Inline mode (web process)
+# -----------------------------
+_inline_runner = None
+
+
+def start_inline_runner():
+    global _inline_runner
+    if settings.CHAT_WORKER_MODE != "inline" or _inline_runner is not None:
+        return
+    # One inline runner per web worker: the drift monitor stays in the standalone worker
+    _inline_runner = JobRunner(drift_monitor=settings.DRIFT_MONITOR_INLINE)
+    _inline_runner.start()
+
+
+def stop_inline_runner():
+    global _inline_runner
+    if _inline_runner is not None:
+        _inline_runner.stop()
+        _inline_runner = None
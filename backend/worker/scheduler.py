@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from core.config import settings
+
+# Lower rank is served first
+PRIORITY_CLASSES = ("interactive", "bulk")
+
+
+def classify_upload(upload_size: int) -> str:
+    """Small chats are someone waiting on the page; large archives are bulk imports."""
+    if upload_size is not None and upload_size <= settings.CHAT_INTERACTIVE_MAX_BYTES:
+        return "interactive"
+    return "bulk"
+
+
+def order_candidates(queued, running_by_user: dict, now) -> list:
+    """
+    Orders queued jobs for claiming.
+
+    1. Priority class: interactive before bulk. A bulk job that has waited
+       longer than CHAT_BULK_AGING_SECONDS is promoted, so bulk imports are
+       delayed but never starved.
+    2. Fair share: each job's position is the number of jobs its owner
+       already has running plus the number of that owner's jobs queued ahead
+       of it, so users take turns instead of one user's backlog going first.
+    3. Submission time.
+
+    Args:
+        queued: (job_id, user_id, priority_class, submitted_at) rows, oldest first.
+        running_by_user: user_id -> number of jobs currently processing.
+        now: Current UTC time.
+
+    Returns:
+        list: job_ids in claim order.
+    """
+    aging = settings.CHAT_BULK_AGING_SECONDS
+    seen = defaultdict(int)
+    keyed = []
+    for job_id, user_id, priority_class, submitted_at in queued:
+        rank = PRIORITY_CLASSES.index(priority_class) if priority_class in PRIORITY_CLASSES else 0
+        if rank and submitted_at is not None and (now - submitted_at).total_seconds() >= aging:
+            rank = 0
+        share = running_by_user.get(user_id, 0) + seen[user_id]
+        seen[user_id] += 1
+        keyed.append(((rank, share, submitted_at), job_id))
+
+    keyed.sort(key=lambda item: item[0])
+    return [job_id for _, job_id in keyed]
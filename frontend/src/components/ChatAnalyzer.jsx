@@ -19,6 +19,8 @@ const ChatAnalyzer = () => {
     const [progress, setProgress] = useState(0);
     const [results, setResults] = useState(null);
     const [error, setError] = useState(null);
+    const [jobId, setJobId] = useState(null);
+    const [saveToHistory, setSaveToHistory] = useState(false);
 
     const handleFileChange = (e) => {
         if (e.target.files) {
@@ -42,6 +44,9 @@ const ChatAnalyzer = () => {
                 setProgress(100);
             } else if (data.status === 'failed') {
                 throw new Error(data.error || "Analysis failed");
+            } else if (data.status === 'cancelled') {
+                setError("Analysis cancelled");
+                setLoading(false);
             } else {
                 // Continue polling
                 setTimeout(() => pollStatus(jobId), 1000);
@@ -53,6 +58,53 @@ const ChatAnalyzer = () => {
         }
     };
 
+    // Prefer the server-sent progress stream; fall back to polling if it breaks
+    const streamStatus = (jobId) => {
+        const token = localStorage.getItem('token');
+        if (!window.EventSource || !token) {
+            pollStatus(jobId);
+            return;
+        }
+
+        const source = new EventSource(
+            `${API.defaults.baseURL}/analyze/chat/events/${jobId}?token=${encodeURIComponent(token)}`
+        );
+
+        source.addEventListener('progress', (e) => {
+            const data = JSON.parse(e.data);
+            setProgress(data.progress || 10);
+        });
+
+        source.addEventListener('completed', (e) => {
+            const data = JSON.parse(e.data);
+            source.close();
+            setResults(data.result);
+            setLoading(false);
+            setProgress(100);
+        });
+
+        source.addEventListener('failed', (e) => {
+            const data = JSON.parse(e.data);
+            source.close();
+            setError(data.error || "Analysis failed");
+            setLoading(false);
+        });
+
+        source.addEventListener('cancelled', () => {
+            source.close();
+            setError("Analysis cancelled");
+            setLoading(false);
+        });
+
+        source.onerror = () => {
+            // EventSource retries by itself while the stream is healthy;
+            // once it gives up, continue with plain polling.
+            if (source.readyState === EventSource.CLOSED) {
+                pollStatus(jobId);
+            }
+        };
+    };
+
     const handleUpload = async () => {
         if (!file) return;
 
@@ -60,6 +112,7 @@ const ChatAnalyzer = () => {
         setError(null);
         setResults(null);
         setProgress(0);
+        setJobId(null);
 
         const formData = new FormData();
         formData.append('file', file);
@@ -67,14 +120,16 @@ const ChatAnalyzer = () => {
         try {
             // Initiate analysis
             const response = await API.post('/analyze/chat', formData, {
+                params: { persist: saveToHistory },
                 headers: {
                     'Content-Type': 'multipart/form-data',
                 },
             });
 
             const jobId = response.data.job_id;
-            // Start polling
-            pollStatus(jobId);
+            setJobId(jobId);
+            // Follow progress
+            streamStatus(jobId);
 
         } catch (err) {
             console.error(err);
@@ -83,6 +138,17 @@ const ChatAnalyzer = () => {
         }
     };
 
+    const handleCancel = async () => {
+        if (!jobId) return;
+        try {
+            // The stream reports the final "cancelled" state
+            await API.post(`/analyze/chat/cancel/${jobId}`);
+        } catch (err) {
+            console.error(err);
+            setError(err.response?.data?.detail || "Failed to cancel analysis.");
+        }
+    };
+
     const pieData = results ? Object.entries(results.distribution).map(([name, value]) => ({ name, value })) : [];
 
     return (
@@ -140,6 +206,16 @@ const ChatAnalyzer = () => {
             )}
 
             <div style={{ textAlign: 'center', marginBottom: '2rem' }}>
+                <label style={{ display: 'block', marginBottom: '1rem', color: 'var(--text-sub)' }}>
+                    <input
+                        type="checkbox"
+                        checked={saveToHistory}
+                        disabled={loading}
+                        onChange={(e) => setSaveToHistory(e.target.checked)}
+                        style={{ marginRight: '0.5rem' }}
+                    />
+                    Save messages to my emotion history
+                </label>
                 <button
                     className="sentia-btn"
                     disabled={!file || loading}
@@ -148,6 +224,15 @@ const ChatAnalyzer = () => {
                 >
                     {loading ? "Processing..." : "Analyze Conversation"}
                 </button>
+                {loading && jobId && (
+                    <button
+                        className="sentia-btn"
+                        onClick={handleCancel}
+                        style={{ padding: '1rem 2rem', fontSize: '1.1rem', marginLeft: '1rem' }}
+                    >
+                        Cancel
+                    </button>
+                )}
             </div>
 
             {error && (